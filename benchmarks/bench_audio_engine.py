@@ -0,0 +1,88 @@
+"""
+Audio bed benchmark: NumPy engine vs the ffmpeg amix filter graph.
+
+Run from the repo root (needs ffmpeg on PATH and numpy):
+    python benchmarks/bench_audio_engine.py [--minutes 60] [--speech 300]
+
+Generates a music file of the given length and short speech snippets into
+benchmarks/.media/, then renders the same editor bed (music with fades +
+speech clips separated by silences) three ways:
+  amix     - filter graph (graph_compiler.lower_editor_audio), one input per clip
+  cold     - audio_engine.render_bed with an empty PCM cache (includes decoding)
+  warm     - audio_engine.render_bed with all PCM already in memory-mapped .npy files
+"""
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from concat import AudioTrackSpec, SpeechClipSpec, run_graph  # noqa: E402
+from graph_compiler import FilterGraph, lower_editor_audio  # noqa: E402
+import audio_engine  # noqa: E402
+from pcm_cache import PcmCache  # noqa: E402
+
+MEDIA_DIR = ROOT / "benchmarks" / ".media"
+
+
+def _make(path: Path, source: str, seconds: float) -> Path:
+    if not path.exists():
+        MEDIA_DIR.mkdir(parents=True, exist_ok=True)
+        subprocess.run(["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", source,
+                        "-t", str(seconds), "-ac", "2", "-c:a", "aac", str(path)], check=True)
+    return path
+
+
+def make_project(minutes: float, n_speech: int):
+    music = _make(MEDIA_DIR / f"music_{minutes:g}min.m4a", "sine=frequency=330:sample_rate=44100", minutes * 60)
+    speech_files = [_make(MEDIA_DIR / f"speech_{i}.m4a", f"sine=frequency={400 + i * 40}:sample_rate=44100", 8.0)
+                    for i in range(8)]
+    speech = []
+    for i in range(n_speech):
+        speech.append(SpeechClipSpec(path=speech_files[i % len(speech_files)], duration_s=8.0,
+                                     trim_start=0.5, trim_end=0.5))
+        speech.append(SpeechClipSpec(is_silence=True, duration_s=1.5))
+    track = AudioTrackSpec(path=music, volume=0.6, fade_in_s=2.0, fade_out_s=3.0)
+    return track, speech
+
+
+def bench_amix(track, speech, total_duration, out: Path) -> float:
+    t0 = time.perf_counter()
+    graph = FilterGraph()
+    graph.map(lower_editor_audio(graph, track, speech, 1.0, total_duration))
+    run_graph(graph, out, ["-c:a", "pcm_f32le"])
+    return time.perf_counter() - t0
+
+
+def bench_engine(track, speech, total_duration, out: Path, pcm) -> float:
+    t0 = time.perf_counter()
+    audio_engine.render_bed(out, track, speech, 1.0, total_duration, pcm=pcm)
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", type=float, default=60)
+    parser.add_argument("--speech", type=int, default=300)
+    args = parser.parse_args()
+
+    track, speech = make_project(args.minutes, args.speech)
+    total_duration = args.minutes * 60
+    with tempfile.TemporaryDirectory(dir=MEDIA_DIR) as pcm_dir:
+        pcm = PcmCache(cache_dir=Path(pcm_dir), max_bytes=8 * 1024 ** 3)
+        results = [
+            ("amix", bench_amix(track, speech, total_duration, MEDIA_DIR / "bed_amix.wav")),
+            ("cold", bench_engine(track, speech, total_duration, MEDIA_DIR / "bed_cold.wav", pcm)),
+            ("warm", bench_engine(track, speech, total_duration, MEDIA_DIR / "bed_warm.wav", pcm)),
+        ]
+    print(f"{args.minutes:g} min bed, {args.speech} speech clips")
+    for name, seconds in results:
+        print(f"  {name:>5}: {seconds:7.2f} s")
+
+
+if __name__ == "__main__":
+    main()
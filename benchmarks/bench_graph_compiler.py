@@ -0,0 +1,45 @@
+"""
+Microbenchmark: lower + optimize + emit a 1,000-clip timeline.
+
+Run from the repo root:  python benchmarks/bench_graph_compiler.py [clips]
+No media is needed - clip paths don't exist, so nothing is probed.
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from concat import VideoClipSpec, CrossfadeSpec  # noqa: E402
+from graph_compiler import Composition, compile_graph, lower_composition  # noqa: E402
+
+
+def make_composition(n_clips: int) -> Composition:
+    clips = [
+        VideoClipSpec(path=Path(f"/nonexistent/clip_{i:04d}.mp4"), duration_s=8.0,
+                      trim_start=0.5 if i % 2 else 0.0, trim_end=0.25)
+        for i in range(n_clips)
+    ]
+    return Composition(video_clips=clips, crossfade=CrossfadeSpec(duration_s=0.5),
+                       resolution=(1920, 1080), audio_source="none")
+
+
+def bench(n_clips: int, repeats: int = 5) -> None:
+    best = float("inf")
+    for _ in range(repeats):
+        comp = make_composition(n_clips)
+        t0 = time.perf_counter()
+        graph, _ = lower_composition(comp)
+        compiled = compile_graph(graph, Path("out.mp4"), ["-c:v", "libx264"])
+        best = min(best, time.perf_counter() - t0)
+        script_size = compiled.script_path.stat().st_size if compiled.script_path else 0
+        compiled.cleanup()
+    mode = "filter_complex_script" if script_size else "inline"
+    print(f"{n_clips:5d} clips: {best * 1000:8.1f} ms  "
+          f"({len(graph.filters)} filters, {len(graph.inputs)} inputs, {mode}, script {script_size / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10, 100, 1000]
+    for n in sizes:
+        bench(n)
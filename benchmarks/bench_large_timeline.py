@@ -0,0 +1,88 @@
+"""
+Large-timeline benchmark: standard vs batched render over synthetic clips.
+
+Run from the repo root (needs ffmpeg/ffprobe on PATH):
+    python benchmarks/bench_large_timeline.py [--clips 10 100 1000] [--modes standard batched]
+
+Clips are 2 s 320x240 testsrc + sine, generated once into benchmarks/.media/.
+Each render runs in a fresh Python process so the reported peak child RSS
+(largest single ffmpeg) belongs to that render alone.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+MEDIA_DIR = ROOT / "benchmarks" / ".media"
+CLIP_S = 2.0
+RESOLUTION = (640, 360)
+
+
+def make_clips(n: int) -> list[Path]:
+    MEDIA_DIR.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(n):
+        path = MEDIA_DIR / f"clip_{i:04d}.mp4"
+        if not path.exists():
+            subprocess.run([
+                "ffmpeg", "-y", "-v", "error",
+                "-f", "lavfi", "-i", f"testsrc=s=320x240:r=30:d={CLIP_S}",
+                "-f", "lavfi", "-i", f"sine=frequency={220 + i % 50 * 10}:d={CLIP_S}",
+                "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest",
+                str(path),
+            ], check=True)
+        paths.append(path)
+    return paths
+
+
+def run_one(mode: str, n: int) -> dict:
+    from concat import VideoClipSpec, CrossfadeSpec, concat_videos
+    from parallel_render import DEFAULT_BATCH_SIZE, choose_batch_cut_points, split_timeline
+
+    clips = [VideoClipSpec(path=p, duration_s=CLIP_S) for p in make_clips(n)]
+    crossfade = CrossfadeSpec(duration_s=0.25)
+    if mode == "batched":
+        segments = split_timeline(clips, crossfade, choose_batch_cut_points(clips, crossfade, DEFAULT_BATCH_SIZE))
+        max_inputs = max(len(s.clips) for s in segments)
+    else:
+        max_inputs = n
+    out = MEDIA_DIR / f"out_{mode}_{n}.mp4"
+    t0 = time.perf_counter()
+    concat_videos(clips, out, crossfade=crossfade, resolution=RESOLUTION,
+                  audio_source="video", render_mode=mode, workers=1)
+    elapsed = time.perf_counter() - t0
+    peak_kib = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {"mode": mode, "clips": n, "seconds": round(elapsed, 2),
+            "peak_ffmpeg_rss_mib": round(peak_kib / 1024, 1), "max_open_inputs": max_inputs}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--modes", nargs="+", default=["standard", "batched"])
+    parser.add_argument("--run", nargs=2, metavar=("MODE", "N"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_one(args.run[0], int(args.run[1]))))
+        return
+
+    print(f"{'mode':>9} {'clips':>6} {'seconds':>9} {'peak RSS MiB':>13} {'open inputs':>12}")
+    for n in args.clips:
+        for mode in args.modes:
+            p = subprocess.run([sys.executable, __file__, "--run", mode, str(n)], capture_output=True, text=True)
+            if p.returncode != 0:
+                print(f"{mode:>9} {n:>6}   failed: {p.stderr.strip().splitlines()[-1] if p.stderr else '?'}")
+                continue
+            r = json.loads(p.stdout.strip().splitlines()[-1])
+            print(f"{r['mode']:>9} {r['clips']:>6} {r['seconds']:>9} {r['peak_ffmpeg_rss_mib']:>13} {r['max_open_inputs']:>12}")
+
+
+if __name__ == "__main__":
+    main()
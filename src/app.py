@@ -6,19 +6,35 @@ Features:
 - Video Editor: Upload, trim, crossfade, preview, export videos
 - HTML to MP4: Convert HTML presentations to MP4 with per-slide durations
 """
+import json
 import os
-import uuid
-import time
+import re
+import shutil
 import threading
+import time
+import uuid
 from pathlib import Path
+from typing import Optional
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, send_file, url_for
+from flask import Flask, Response, render_template, request, jsonify, send_file, stream_with_context, url_for
 from werkzeug.utils import secure_filename
 
-from concat import VideoClipSpec, CrossfadeSpec, AudioTrackSpec, SpeechClipSpec, concat_videos, ffprobe_duration_seconds
+from concat import VideoClipSpec, CrossfadeSpec, AudioTrackSpec, SpeechClipSpec, concat_videos
+from media_cache import content_hash
+from probe import probe_media, probe_many
+from proxies import proxy_manager
+from render_cache import composition_key, link_output, render_cache
+from hls_preview import PLAYLIST, STREAM_FILE_RE, assemble_mp4, render_hls, stream_duration
+from jobstore import ACTIVE_STATUSES, FINISHED_STATUSES, open_job_store
+from scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE, JobCancelled, scheduler
+from thumbs import DEFAULT_INTERVALS, scrub_intervals, thumb_store
+from intermediates import render_preview_incremental
+from browser_pool import browser_pool
 from html_converter import (
     convert_html_to_mp4,
     ConversionSettings,
+    READY_STRATEGIES,
+    SLIDE_ADDRESSING,
     extract_saved_durations,
     detect_total_slides,
     update_html_durations  # EXP-025 v3
@@ -42,9 +58,20 @@ HTML_DIR.mkdir(exist_ok=True)
 VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm'}
 AUDIO_EXTENSIONS = {'.mp3', '.wav', '.aac', '.m4a', '.flac'}
 
-# Job tracking
-export_jobs = {}
-conversion_jobs = {}
+# Job tracking (SQLite by default, see jobstore.py); recovery starts with the first request
+job_store = open_job_store()
+
+# Segment-parallel export (render_mode "parallel" / "auto")
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', os.cpu_count() or 1))
+EXPORT_SEGMENT_S = float(os.environ.get('EXPORT_SEGMENT_S', 30))
+# Large timelines (render_mode "batched" / "auto"): max clips per ffmpeg process, and
+# processes at once; open inputs stay below EXPORT_BATCH_WORKERS * (EXPORT_BATCH_SIZE + 1)
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 32))
+EXPORT_BATCH_WORKERS = int(os.environ.get('EXPORT_BATCH_WORKERS', 1))
+
+# Previews of timelines at least this long are streamed (HLS) while they render
+PREVIEW_STREAM_MIN_S = float(os.environ.get('PREVIEW_STREAM_MIN_S', 60))
+PREVIEW_STREAM_DIR = PREVIEW_DIR / "hls"
 
 # Default duration for slides without SAVED_DURATIONS
 DEFAULT_SLIDE_DURATION = 5
@@ -87,10 +114,36 @@ def upload_file():
     filepath = UPLOAD_DIR / unique_name
     file.save(filepath)
 
+    # Probe once here; the result is cached for preview/export
     try:
-        duration = ffprobe_duration_seconds(filepath)
+        info = probe_media(filepath)
+        duration = info.duration_s
+        has_audio = info.has_audio
     except Exception:
         duration = 0
+        has_audio = False
+
+    # Cache keys (proxies, renders, peaks, ...) hash the whole file; do it once
+    # now, while the upload is still in the page cache
+    try:
+        content_hash(filepath)
+    except OSError as e:
+        print(f"[WARN] Could not hash upload {filepath}: {e}")
+
+    # Preview proxy and filmstrip sprites are generated in the background;
+    # /preview-full and /thumbs pick them up when ready
+    if file_type == 'video':
+        proxy_manager.submit(filepath)
+        thumb_store.submit(filepath)
+
+    # Decoded PCM (mixing, analysis) and waveform peaks are also built in the background
+    if file_type == 'audio' or has_audio:
+        try:
+            from peaks import peak_store
+        except ImportError as e:
+            print(f"[WARN] Waveform peaks unavailable ({e})")
+        else:
+            peak_store.submit(filepath)
 
     return jsonify({
         'success': True,
@@ -99,6 +152,7 @@ def upload_file():
         'path': str(filepath),
         'type': file_type,
         'duration': round(duration, 2),
+        'has_audio': has_audio,
         'preview_url': url_for('preview_file', filename=unique_name),
         'trimStart': 0,
         'trimEnd': 0,
@@ -114,11 +168,96 @@ def preview_file(filename):
     return send_file(filepath)
 
 
+@app.route('/peaks/<file_id>')
+def get_peaks(file_id):
+    """Serve one level of an uploaded file's waveform peak pyramid (202 while it's being made).
+
+    Body: int8 (min, max) pairs, one per X-Peaks-Samples-Per-Peak frames at
+    X-Peaks-Sample-Rate. Level 0 is the finest; each level halves it.
+    """
+    filepath = UPLOAD_DIR / secure_filename(file_id)
+    if not filepath.exists():
+        return jsonify({'error': 'File not found'}), 404
+    try:
+        from pcm_cache import SAMPLE_RATE
+        from peaks import PEAK_LEVELS, peak_store, samples_per_peak
+    except ImportError as e:
+        return jsonify({'error': f'Waveforms unavailable: {e}'}), 503
+    try:
+        level = int(request.args.get('level', 0))
+        path = peak_store.get_level(filepath, level)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if path is None:
+        error = peak_store.error(filepath)
+        if error:
+            return jsonify({'error': f'No audio: {error}'}), 422
+        peak_store.submit(filepath)
+        return jsonify({'pending': True}), 202
+
+    # Uploads are never modified in place, so a level's bytes never change
+    response = send_file(path, mimetype='application/octet-stream', max_age=86400)
+    response.headers['Cache-Control'] = 'public, max-age=86400, immutable'
+    response.headers['X-Peaks-Level'] = str(level)
+    response.headers['X-Peaks-Levels'] = str(PEAK_LEVELS)
+    response.headers['X-Peaks-Samples-Per-Peak'] = str(samples_per_peak(level))
+    response.headers['X-Peaks-Sample-Rate'] = str(SAMPLE_RATE)
+    return response
+
+
+def _thumb_source(file_id):
+    """Uploaded video or rendered preview by id, and the sprite densities it gets."""
+    name = secure_filename(file_id)
+    if (UPLOAD_DIR / name).is_file():
+        return UPLOAD_DIR / name, DEFAULT_INTERVALS
+    if (PREVIEW_DIR / name).is_file():
+        return PREVIEW_DIR / name, scrub_intervals(probe_media(PREVIEW_DIR / name).duration_s)
+    return None, None
+
+
+@app.route('/thumbs/<file_id>')
+def get_thumbs(file_id):
+    """Sprite index for an uploaded video or a preview (202 while it's being made).
+
+    Tile k of a density shows time k * interval_s; sheets hold columns x rows
+    tiles of tile_width x tile_height, row-major.
+    """
+    source, intervals = _thumb_source(file_id)
+    if source is None:
+        return jsonify({'error': 'File not found'}), 404
+    index = thumb_store.get_index(source, intervals)
+    if index is None:
+        thumb_store.submit(source, intervals)
+        return jsonify({'pending': True}), 202
+
+    densities = [
+        {**d, 'sheet_urls': [url_for('get_thumb_sheet', file_id=file_id, sheet=s) for s in d['sheets']]}
+        for d in index['densities']
+    ]
+    response = jsonify({**index, 'densities': densities})
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+
+@app.route('/thumbs/<file_id>/<sheet>')
+def get_thumb_sheet(file_id, sheet):
+    """Serve one sprite sheet listed in /thumbs/<file_id>."""
+    path = thumb_store.sheet_path(secure_filename(sheet))
+    if path is None:
+        return jsonify({'error': 'Sheet not found'}), 404
+    response = send_file(path, mimetype='image/jpeg', max_age=86400)
+    response.headers['Cache-Control'] = 'public, max-age=86400, immutable'
+    return response
+
+
 @app.route('/preview-full', methods=['POST'])
 def preview_full():
-    """Generate a quick preview of the full composition.
+    """Start a quick preview of the full composition; returns a job handle.
 
     EXP-014: Now allows audio-only preview (no videos required).
+    Previews are per-session jobs: a newer request from the same editor tab
+    cancels that tab's unfinished preview (killing its ffmpeg). Progress and
+    the result arrive on the job event stream or /preview-status/<job_id>.
     """
     data = request.json
     videos = data.get('videos', [])
@@ -135,11 +274,27 @@ def preview_full():
     if not videos and not has_audio_content(audio, speech):
         return jsonify({'error': 'No media (need video or audio)'}), 400
 
+    # Probe every input in one parallel batch (cache hits for uploaded files)
+    media_paths = [Path(v['path']) for v in videos]
+    if audio and audio.get('path'):
+        media_paths.append(Path(audio['path']))
+    media_paths += [Path(s['path']) for s in speech if not s.get('is_silence') and s.get('path')]
+    probed = probe_many(media_paths)
+
     video_clips = []
+    proxies_used = 0
     for v in videos:
+        source = Path(v['path'])
+        duration = float(v.get('duration', 0))
+        if duration == 0 and source in probed:
+            duration = probed[source].duration_s
+        # Render from the low-res proxy when it's ready (same timing as the original)
+        proxy = proxy_manager.get_proxy(source) if source.exists() else None
+        if proxy:
+            proxies_used += 1
         clip = VideoClipSpec(
-            path=Path(v['path']),
-            duration_s=float(v.get('duration', 0)),
+            path=proxy or source,
+            duration_s=duration,
             trim_start=float(v.get('trimStart', 0)),
             trim_end=float(v.get('trimEnd', 0)),
         )
@@ -174,34 +329,206 @@ def preview_full():
 
     crossfade = CrossfadeSpec(duration_s=crossfade_duration, transition=crossfade_transition)
 
-    preview_id = uuid.uuid4().hex[:8]
-    output_path = PREVIEW_DIR / f"preview_{preview_id}.mp4"
+    # Long timelines stream when the page can play it, so playback starts after one segment
+    stream = bool(data.get('stream')) and \
+        stream_duration(video_clips, crossfade, audio_track, speech_clips) >= PREVIEW_STREAM_MIN_S
 
+    # The same composition always maps to the same preview file
     try:
-        # concat_videos now handles audio-only case internally
+        render_key = composition_key(video_clips, crossfade, audio_track, speech_clips, speech_volume,
+                                     (1280, 720), profile='preview-stream' if stream else 'preview')
+    except OSError as e:
+        return jsonify({'error': str(e)}), 500
+    preview_name = f"preview_{render_key[:16]}.mp4"
+    output_path = PREVIEW_DIR / preview_name
+    stream_dir = PREVIEW_STREAM_DIR / render_key[:16]
+    result = {
+        'preview_url': url_for('serve_preview', filename=preview_name),
+        'thumbs_url': url_for('get_thumbs', file_id=preview_name) if video_clips else None,
+        'proxies_used': proxies_used,
+        'intermediate_cache': None,
+        'render_cache': 'hit',
+    }
+    session_id = request_session(data)
+    job_id = uuid.uuid4().hex[:12]
+
+    # An unchanged timeline needs no new render
+    cached = render_cache.lookup(render_key)
+    if cached is None and session_id:
+        running = supersede_previews(session_id, render_key, job_id)
+        if running:
+            return jsonify({'success': True, **preview_status_payload(running)})
+
+    job_store.create(job_id, 'preview', {
+        'status': 'queued',
+        'progress': 0,
+        'message': 'Preview queued...',
+        'render_key': render_key,
+        'session': session_id,
+        'stream_url': url_for('serve_preview_stream', stream_id=render_key[:16], name=PLAYLIST) if stream else None,
+        'codecs': None,
+        'result': None,
+        'error': None,
+    })
+    if cached:
+        finish_preview(job_id, cached, output_path, result)
+        return jsonify({'success': True, **preview_status_payload(job_store.get(job_id))})
+
+    cache_stats = None
+
+    def render_to(out_path, progress):
+        nonlocal cache_stats
+        if stream:
+            # One ultrafast pass straight to HLS; the finished segments are the MP4
+            render_hls(
+                video_clips=video_clips,
+                out_dir=stream_dir,
+                crossfade=crossfade,
+                audio_track=audio_track,
+                speech_clips=speech_clips if speech_clips else None,
+                speech_volume=speech_volume,
+                resolution=(1280, 720),
+                progress_callback=progress,
+                on_start=lambda codecs: job_store.update(job_id, codecs=codecs),
+            )
+            assemble_mp4(stream_dir, out_path)
+            return
+        if video_clips:
+            # Only clips whose source/trim changed are re-normalized
+            cache_stats = render_preview_incremental(
+                video_clips=video_clips,
+                output_path=out_path,
+                crossfade=crossfade,
+                audio_track=audio_track,
+                speech_clips=speech_clips if speech_clips else None,
+                speech_volume=speech_volume,
+                resolution=(1280, 720),
+                progress_callback=progress,
+            )
+            return
+        # concat_videos handles the audio-only case internally
         concat_videos(
             video_clips=video_clips,
-            output_path=output_path,
+            output_path=out_path,
             crossfade=crossfade,
             audio_track=audio_track,
             speech_clips=speech_clips if speech_clips else None,
             speech_volume=speech_volume,
             resolution=(1280, 720),
+            progress_callback=progress,
         )
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+
+    def run():
+        job_store.update(job_id, status='processing', message='Rendering preview...')
+        try:
+            # Joins an identical render already running for another tab
+            rendered, rendered_here = render_cache.render(
+                render_key, render_to, render_progress(job_id, 'Rendering preview'))
+            result['render_cache'] = 'miss' if rendered_here else 'shared'
+            result['intermediate_cache'] = cache_stats.as_dict() if cache_stats else None
+            finish_preview(job_id, rendered, output_path, result)
+        except JobCancelled:
+            # Superseded previews already say so
+            if job_store.get(job_id)['status'] != 'cancelled':
+                job_store.update(job_id, status='cancelled', message='Preview cancelled')
+        except Exception as e:
+            job_store.update(job_id, status='failed', error=str(e), message=f'Preview failed: {str(e)}')
+
+    # Previews share the render slots with exports but jump the queue
+    scheduler.submit('preview', run, job_id=job_id, priority=PRIORITY_INTERACTIVE)
+
+    return jsonify({'success': True, **preview_status_payload(job_store.get(job_id))})
+
+
+def supersede_previews(session_id: str, render_key: str, new_job_id: str) -> Optional[dict]:
+    """Cancel the session's unfinished previews of other timelines.
+
+    Returns the session's unfinished preview of this same timeline, if any,
+    so the caller can hand that job out instead of starting another.
+    """
+    same = None
+    for old in job_store.find(kind='preview', session=session_id):
+        if old['status'] not in ACTIVE_STATUSES:
+            continue
+        if old.get('render_key') == render_key:
+            same = old
+            continue
+        # Recorded first, so the job's own cancel handler keeps this message
+        job_store.update(old['id'], status='cancelled', message='Superseded by a newer preview',
+                         superseded_by=new_job_id)
+        scheduler.cancel(old['id'])
+    return same
+
+
+def finish_preview(job_id: str, rendered: Path, output_path: Path, result: dict):
+    """Publish a rendered preview and complete its job."""
+    if not output_path.exists():
+        link_output(rendered, output_path)
 
     # Get duration of generated preview
     try:
-        duration = ffprobe_duration_seconds(output_path)
+        duration = probe_media(output_path).duration_s
     except Exception:
         duration = 0
 
-    return jsonify({
-        'success': True,
-        'preview_url': url_for('serve_preview', filename=f"preview_{preview_id}.mp4"),
-        'duration': round(duration, 2),
-    })
+    # Hover-scrub sprite for the preview player, made in the background
+    if result['thumbs_url'] and duration > 0:
+        thumb_store.submit(output_path, scrub_intervals(duration))
+    else:
+        result['thumbs_url'] = None
+
+    job_store.update(job_id, status='completed', progress=100, message='Preview ready',
+                     result={**result, 'duration': round(duration, 2)})
+
+
+def preview_status_payload(job: dict) -> dict:
+    """Client-facing status of a preview job (polling and event streams)."""
+    response = {
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'message': job['message'],
+        'queue_position': scheduler.position(job['id']),
+        # Progressive previews can be played from stream_url before they complete
+        'stream_url': job.get('stream_url'),
+        'codecs': job.get('codecs'),
+    }
+
+    if job['status'] == 'completed':
+        response.update(job['result'])
+    elif job['status'] == 'failed':
+        response['error'] = job['error']
+    elif job['status'] == 'cancelled':
+        response['superseded_by'] = job.get('superseded_by')
+
+    return response
+
+
+@app.route('/preview-status/<job_id>')
+def preview_status(job_id):
+    """Get the status of a preview job (polling fallback for /jobs/<id>/events)."""
+    job = job_store.get(job_id)
+    if job is None or job['kind'] != 'preview':
+        return jsonify({'error': 'Job not found', 'status': 'not_found'}), 404
+
+    return jsonify(preview_status_payload(job))
+
+
+@app.route('/preview-stream/<stream_id>/<name>')
+def serve_preview_stream(stream_id, name):
+    """Serve a progressive preview's playlist and segments, also while they are being written."""
+    if not re.fullmatch(r'[0-9a-f]{16}', stream_id) or not STREAM_FILE_RE.match(name):
+        return jsonify({'error': 'Not found'}), 404
+    filepath = PREVIEW_STREAM_DIR / stream_id / name
+    if not filepath.is_file():
+        # Not written yet (or cleaned up); players retry
+        return jsonify({'error': 'Not ready'}), 404
+    if name == PLAYLIST:
+        response = send_file(filepath, mimetype='application/vnd.apple.mpegurl', max_age=0)
+        response.headers['Cache-Control'] = 'no-cache'  # Grows until #EXT-X-ENDLIST
+        return response
+    return send_file(filepath, mimetype='video/mp4')
 
 
 @app.route('/preview-video/<filename>')
@@ -217,104 +544,37 @@ def serve_preview(filename):
 # EXP-013: Export System (updated for EXP-014 audio-only)
 # ============================================================
 
-def run_export(job_id: str, video_clips: list, audio_track, speech_clips: list,
-               crossfade, speech_volume: float, output_path: Path, audio_source: str = "editor"):
-    """Background thread for export processing.
+def export_specs(data: dict) -> dict:
+    """run_export keyword arguments from an /export request body.
 
-    EXP-026: Added audio_source parameter.
+    Also used to re-queue exports recovered from the job store.
     """
-    try:
-        export_jobs[job_id]['status'] = 'processing'
-        export_jobs[job_id]['progress'] = 10
-
-        # Simulate progress stages (FFmpeg doesn't give real-time progress easily)
-        export_jobs[job_id]['message'] = 'Preparing clips...'
-        time.sleep(0.5)
-        export_jobs[job_id]['progress'] = 20
-
-        export_jobs[job_id]['message'] = 'Rendering video...'
-        export_jobs[job_id]['progress'] = 30
-
-        # Actual export - concat_videos handles audio-only case
-        # EXP-026: Pass audio_source to control audio handling
-        concat_videos(
-            video_clips=video_clips,
-            output_path=output_path,
-            crossfade=crossfade,
-            audio_track=audio_track,
-            speech_clips=speech_clips if speech_clips else None,
-            speech_volume=speech_volume,
-            resolution=(1920, 1080),  # Full HD for final export
-            audio_source=audio_source,
-        )
-
-        export_jobs[job_id]['progress'] = 90
-        export_jobs[job_id]['message'] = 'Finalizing...'
-        time.sleep(0.3)
-
-        export_jobs[job_id]['status'] = 'completed'
-        export_jobs[job_id]['progress'] = 100
-        export_jobs[job_id]['message'] = 'Export complete!'
-        export_jobs[job_id]['filename'] = output_path.name
-        export_jobs[job_id]['completed_at'] = datetime.now().isoformat()
-
-    except Exception as e:
-        export_jobs[job_id]['status'] = 'failed'
-        export_jobs[job_id]['error'] = str(e)
-        export_jobs[job_id]['message'] = f'Export failed: {str(e)}'
-
-
-@app.route('/export', methods=['POST'])
-def start_export():
-    """Start a final export job (full quality, background processing).
-
-    EXP-014: Now allows audio-only export (no videos required).
-    EXP-026: Added audio_source parameter for selecting audio source.
-    """
-    data = request.json
-    videos = data.get('videos', [])
     audio = data.get('audio')
-    speech = data.get('speech', [])
-    crossfade_duration = float(data.get('crossfade_duration', 1.0))
-    crossfade_transition = data.get('crossfade_transition', 'fade')
-    speech_volume = float(data.get('speech_volume', 1.0))
     music_volume = float(data.get('music_volume', 0.5))
-    audio_fade_in = float(data.get('audio_fade_in', 1.0))
-    audio_fade_out = float(data.get('audio_fade_out', 2.0))
-    # EXP-026: Audio source selection
-    audio_source = data.get('audio_source', 'editor')  # "video", "editor", or "none"
 
-    # Optional: custom filename
-    custom_filename = data.get('filename', '')
-
-    # EXP-014: Allow audio-only export
-    if not videos and not has_audio_content(audio, speech):
-        return jsonify({'error': 'No media to export (need video or audio)'}), 400
-
-    # Build specs
-    video_clips = []
-    for v in videos:
-        clip = VideoClipSpec(
+    video_clips = [
+        VideoClipSpec(
             path=Path(v['path']),
             duration_s=float(v.get('duration', 0)),
             trim_start=float(v.get('trimStart', 0)),
             trim_end=float(v.get('trimEnd', 0)),
         )
-        video_clips.append(clip)
+        for v in data.get('videos', [])
+    ]
 
     audio_track = None
     if audio and audio.get('path'):
         audio_track = AudioTrackSpec(
             path=Path(audio['path']),
             volume=music_volume,
-            fade_in_s=audio_fade_in,
-            fade_out_s=audio_fade_out,
+            fade_in_s=float(data.get('audio_fade_in', 1.0)),
+            fade_out_s=float(data.get('audio_fade_out', 2.0)),
             trim_start=float(audio.get('trimStart', 0)),
             trim_end=float(audio.get('trimEnd', 0)),
         )
 
     speech_clips = []
-    for s in speech:
+    for s in data.get('speech', []):
         if s.get('is_silence'):
             speech_clips.append(SpeechClipSpec(
                 is_silence=True,
@@ -329,12 +589,160 @@ def start_export():
                 trim_end=float(s.get('trimEnd', 0)),
             ))
 
-    crossfade = CrossfadeSpec(duration_s=crossfade_duration, transition=crossfade_transition)
+    crossfade = CrossfadeSpec(
+        duration_s=float(data.get('crossfade_duration', 1.0)),
+        transition=data.get('crossfade_transition', 'fade'),
+    )
+    speech_volume = float(data.get('speech_volume', 1.0))
+    # EXP-026: Audio source selection
+    audio_source = data.get('audio_source', 'editor')  # "video", "editor", or "none"
+    render_mode = data.get('render_mode', 'auto')  # "auto", "smart", "parallel", "batched" or "standard"
+
+    try:
+        render_key = composition_key(video_clips, crossfade, audio_track, speech_clips, speech_volume,
+                                     (1920, 1080), audio_source, profile=f'export-{render_mode}')
+    except OSError:
+        render_key = None  # Unreadable source: let the render report it
+
+    return {
+        'video_clips': video_clips,
+        'audio_track': audio_track,
+        'speech_clips': speech_clips,
+        'crossfade': crossfade,
+        'speech_volume': speech_volume,
+        'audio_source': audio_source,
+        'render_mode': render_mode,
+        'render_key': render_key,
+    }
+
+
+def render_progress(job_id: str, label: str = 'Rendering video'):
+    """Progress callback that records a render's ffmpeg progress in the job store."""
+    def on_progress(p):
+        # Real progress parsed from ffmpeg -progress output
+        eta = f", ~{int(p.eta_s)}s left" if p.eta_s is not None else ""
+        job_store.update(
+            job_id,
+            progress=round(p.percent, 1),
+            speed=round(p.speed, 2),
+            eta_s=round(p.eta_s, 1) if p.eta_s is not None else None,
+            message=f'{label}... {p.speed:.1f}x realtime{eta}',
+        )
+
+    return on_progress
+
+
+def complete_export(job_id: str, output_path: Path, message: str = 'Export complete!'):
+    job_store.update(
+        job_id,
+        status='completed',
+        progress=100,
+        message=message,
+        filename=output_path.name,
+        completed_at=datetime.now().isoformat(),
+    )
+
+
+def run_export(job_id: str, video_clips: list, audio_track, speech_clips: list,
+               crossfade, speech_volume: float, output_path: Path, audio_source: str = "editor",
+               render_mode: str = "auto", render_key: Optional[str] = None):
+    """Export job, run by the scheduler's export pool.
+
+    EXP-026: Added audio_source parameter.
+    render_mode="auto" stream-copies matching clips, otherwise renders
+    batches of EXPORT_BATCH_SIZE clips on EXPORT_BATCH_WORKERS ffmpeg
+    processes (large timelines), or time segments in parallel on
+    EXPORT_WORKERS ffmpeg processes.
+    With a render_key the result goes through the render cache, so an
+    identical export (finished or still running) is reused.
+    """
+    def render_to(out_path, progress):
+        # Actual export - concat_videos handles audio-only case
+        # EXP-026: Pass audio_source to control audio handling
+        concat_videos(
+            video_clips=video_clips,
+            output_path=out_path,
+            crossfade=crossfade,
+            audio_track=audio_track,
+            speech_clips=speech_clips if speech_clips else None,
+            speech_volume=speech_volume,
+            resolution=(1920, 1080),  # Full HD for final export
+            audio_source=audio_source,
+            render_mode=render_mode,
+            workers=EXPORT_WORKERS,
+            segment_s=EXPORT_SEGMENT_S,
+            batch_size=EXPORT_BATCH_SIZE,
+            batch_workers=EXPORT_BATCH_WORKERS,
+            progress_callback=progress,
+        )
+
+    try:
+        job_store.update(job_id, status='processing', message='Rendering video...')
+
+        if render_key:
+            rendered, _ = render_cache.render(render_key, render_to, render_progress(job_id))
+            link_output(rendered, output_path)
+        else:
+            render_to(output_path, render_progress(job_id))
+
+        complete_export(job_id, output_path)
+
+    except JobCancelled:
+        job_store.update(job_id, status='cancelled', message='Export cancelled')
+    except Exception as e:
+        job_store.update(job_id, status='failed', error=str(e), message=f'Export failed: {str(e)}')
+
+
+def queue_export(job_id: str, data: dict, output_path: Path) -> None:
+    """Queue an export on the scheduler's export pool (bounded, behind interactive previews)."""
+    specs = export_specs(data)
+    # EXP-026: Pass audio_source to run_export
+    scheduler.submit(
+        'export', run_export,
+        job_id, specs['video_clips'], specs['audio_track'], specs['speech_clips'], specs['crossfade'],
+        specs['speech_volume'], output_path, specs['audio_source'], specs['render_mode'], specs['render_key'],
+        job_id=job_id, priority=PRIORITY_BATCH,
+    )
+
+
+def follow_export(job_id: str, data: dict, render_key: str, output_path: Path):
+    """Attach an export to the identical render already in progress (no second ffmpeg).
+
+    Runs on its own thread, not in an export slot. If that render doesn't
+    finish, the export is queued normally.
+    """
+    job_store.update(job_id, status='processing', message='Rendering video (shared with an identical export)...')
+    rendered = render_cache.wait(render_key, render_progress(job_id))
+    job = job_store.get(job_id)
+    if job is None or job['status'] == 'cancelled':
+        return
+    if rendered is None:
+        job_store.update(job_id, status='queued', message='Export queued...', shared_render=False)
+        queue_export(job_id, data, output_path)
+        return
+    link_output(rendered, output_path)
+    complete_export(job_id, output_path)
+
+
+@app.route('/export', methods=['POST'])
+def start_export():
+    """Start a final export job (full quality, background processing).
+
+    EXP-014: Now allows audio-only export (no videos required).
+    EXP-026: Added audio_source parameter for selecting audio source.
+    """
+    data = request.json
+
+    # EXP-014: Allow audio-only export
+    if not data.get('videos') and not has_audio_content(data.get('audio'), data.get('speech', [])):
+        return jsonify({'error': 'No media to export (need video or audio)'}), 400
 
     # Generate job ID and output path
     job_id = uuid.uuid4().hex[:12]
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
 
+    # Optional: custom filename
+    custom_filename = data.get('filename', '')
     if custom_filename:
         safe_name = secure_filename(custom_filename)
         if not safe_name.endswith('.mp4'):
@@ -343,46 +751,54 @@ def start_export():
     else:
         output_filename = f"export_{timestamp}_{job_id}.mp4"
 
-    output_path = EXPORT_DIR / output_filename
-
-    # Initialize job tracking
-    export_jobs[job_id] = {
+    # Initialize job tracking (the payload lets a restarted server re-queue it)
+    job_store.create(job_id, 'export', {
         'status': 'queued',
         'progress': 0,
         'message': 'Export queued...',
+        'output_name': output_filename,
         'filename': None,
         'created_at': datetime.now().isoformat(),
         'completed_at': None,
         'error': None,
-    }
+        'speed': None,
+        'eta_s': None,
+        'session': request_session(data),
+    }, payload=data)
 
-    # Start background thread
-    # EXP-026: Pass audio_source to run_export
-    thread = threading.Thread(
-        target=run_export,
-        args=(job_id, video_clips, audio_track, speech_clips, crossfade, speech_volume, output_path, audio_source)
-    )
-    thread.start()
+    output_path = EXPORT_DIR / output_filename
+    render_key = export_specs(data)['render_key']
+    cached = render_cache.lookup(render_key) if render_key else None
+    if cached:
+        # Unchanged timeline: the earlier export is the result
+        link_output(cached, output_path)
+        complete_export(job_id, output_path, message='Export complete! (unchanged, reused earlier render)')
+    elif render_key and render_cache.in_flight(render_key):
+        job_store.update(job_id, shared_render=True)
+        threading.Thread(target=follow_export, args=(job_id, data, render_key, output_path), daemon=True).start()
+    else:
+        queue_export(job_id, data, output_path)
 
     return jsonify({
         'success': True,
         'job_id': job_id,
         'message': 'Export started',
+        'cached': bool(cached),
+        'queue_position': scheduler.position(job_id),
     })
 
 
-@app.route('/export-status/<job_id>')
-def export_status(job_id):
-    """Get the status of an export job."""
-    if job_id not in export_jobs:
-        return jsonify({'error': 'Job not found', 'status': 'not_found'}), 404
-
-    job = export_jobs[job_id]
+def export_status_payload(job: dict) -> dict:
+    """Client-facing status of an export job (polling and event streams)."""
     response = {
-        'job_id': job_id,
+        'job_id': job['id'],
+        'kind': job['kind'],
         'status': job['status'],
         'progress': job['progress'],
         'message': job['message'],
+        'speed': job.get('speed'),
+        'eta_s': job.get('eta_s'),
+        'queue_position': scheduler.position(job['id']),
     }
 
     if job['status'] == 'completed':
@@ -391,7 +807,120 @@ def export_status(job_id):
     elif job['status'] == 'failed':
         response['error'] = job['error']
 
-    return jsonify(response)
+    return response
+
+
+@app.route('/export-status/<job_id>')
+def export_status(job_id):
+    """Get the status of an export job (polling fallback for /jobs/<id>/events)."""
+    job = job_store.get(job_id)
+    if job is None or job['kind'] != 'export':
+        return jsonify({'error': 'Job not found', 'status': 'not_found'}), 404
+
+    return jsonify(export_status_payload(job))
+
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running export / conversion / preview.
+
+    Queued jobs are dropped; running ones have their ffmpeg (and Chromium)
+    processes killed.
+    """
+    job = job_store.get(job_id)
+    # Exports following an identical render have no scheduler job; they just stop waiting
+    following = job is not None and job.get('shared_render') and job['status'] not in FINISHED_STATUSES
+    if not scheduler.cancel(job_id) and not following:
+        return jsonify({'error': 'Job not found or already finished'}), 404
+    # A queued job never runs, so record the outcome here
+    job = job_store.get(job_id)
+    if job and (job['status'] == 'queued' or following):
+        job_store.update(job_id, status='cancelled', message='Cancelled')
+    return jsonify({'success': True, 'job_id': job_id})
+
+
+# ============================================================
+# Job events (server-sent events; the status endpoints above are the polling fallback)
+# ============================================================
+
+SSE_KEEPALIVE_S = 15.0
+SESSION_ID_MAX_LEN = 64
+
+def request_session(data: dict):
+    """The editor tab's session id from a request body (None if absent or malformed)."""
+    session_id = str(data.get('session') or '')
+    if not session_id or len(session_id) > SESSION_ID_MAX_LEN or not session_id.replace('-', '').isalnum():
+        return None
+    return session_id
+
+
+def sse_message(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def job_event_stream(fetch_jobs, until_finished: bool):
+    """Yield an SSE 'job' event whenever the status of a job returned by fetch_jobs changes.
+
+    Wakes on every job store change in this process (and at least every
+    CHANGE_POLL_S for changes made by other workers), so updates arrive well
+    under a second after they happen. With until_finished, the stream ends
+    once every job has reached a finished status.
+    """
+    sent = {}
+    version = job_store.version
+    last_write = time.monotonic()
+    yield "retry: 2000\n\n"
+    while True:
+        jobs = fetch_jobs()
+        for job in jobs:
+            payload = JOB_STATUS_PAYLOADS[job['kind']](job)
+            if sent.get(job['id']) != payload:
+                sent[job['id']] = payload
+                last_write = time.monotonic()
+                yield sse_message('job', payload)
+        if until_finished and all(job['status'] in FINISHED_STATUSES for job in jobs):
+            yield sse_message('end', {})
+            return
+        if time.monotonic() - last_write >= SSE_KEEPALIVE_S:
+            # Comment line: keeps proxies from timing out and detects closed tabs
+            last_write = time.monotonic()
+            yield ": keepalive\n\n"
+        version = job_store.wait_for_change(version)
+
+
+def event_stream_response(stream) -> Response:
+    return Response(
+        stream_with_context(stream),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Stream status changes of one export / conversion job until it finishes."""
+    job = job_store.get(job_id)
+    if job is None or job['kind'] not in JOB_STATUS_PAYLOADS:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def fetch():
+        current = job_store.get(job_id)
+        return [current] if current else []
+
+    return event_stream_response(job_event_stream(fetch, until_finished=True))
+
+
+@app.route('/jobs/events')
+def session_job_events():
+    """One multiplexed stream per editor tab: status changes of every job started with ?session=<id>."""
+    session_id = request_session(request.args)
+    if session_id is None:
+        return jsonify({'error': 'No valid session provided'}), 400
+
+    def fetch():
+        return [job for job in job_store.find(session=session_id) if job['kind'] in JOB_STATUS_PAYLOADS]
+
+    return event_stream_response(job_event_stream(fetch, until_finished=False))
 
 
 @app.route('/download/<filename>')
@@ -448,7 +977,7 @@ def cleanup_files():
     now = datetime.now()
     removed = {'previews': 0, 'uploads': 0}
 
-    # Clean old previews
+    # Clean old previews (and the segment directories of streamed ones)
     preview_cutoff = now - timedelta(hours=preview_max_age_hours)
     for f in PREVIEW_DIR.glob('*'):
         if f.is_file():
@@ -456,6 +985,9 @@ def cleanup_files():
             if mtime < preview_cutoff:
                 f.unlink()
                 removed['previews'] += 1
+    for d in PREVIEW_STREAM_DIR.glob('*'):
+        if d.is_dir() and datetime.fromtimestamp(d.stat().st_mtime) < preview_cutoff:
+            shutil.rmtree(d, ignore_errors=True)
 
     # Clean old uploads (be careful - only remove if not in use)
     upload_cutoff = now - timedelta(hours=upload_max_age_hours)
@@ -576,7 +1108,7 @@ def upload_html_audio():
     file.save(filepath)
 
     try:
-        duration = ffprobe_duration_seconds(filepath)
+        duration = probe_media(filepath).duration_s
     except Exception:
         duration = 0
 
@@ -589,29 +1121,19 @@ def upload_html_audio():
     })
 
 
-@app.route('/html-to-mp4', methods=['POST'])
-def html_to_mp4():
-    """Start HTML to MP4 conversion with custom durations.
+def conversion_args(data: dict) -> dict:
+    """convert_html_to_mp4 keyword arguments from an /html-to-mp4 request body.
 
-    EXP-021: Added include_audio parameter (default: False).
-    EXP-025: Added external_audio_id parameter for external audio.
+    Raises ValueError for a bad request and FileNotFoundError for missing inputs.
     """
-    data = request.json
     html_id = data.get('html_id')
 
     if not html_id:
-        return jsonify({'error': 'No html_id provided'}), 400
+        raise ValueError('No html_id provided')
 
     html_path = HTML_DIR / secure_filename(html_id)
     if not html_path.exists():
-        return jsonify({'error': 'HTML file not found'}), 404
-
-    width = int(data.get('width', 1920))
-    height = int(data.get('height', 1080))
-    fps = int(data.get('fps', 2))
-    default_seconds = int(data.get('seconds_per_slide', 5))
-    include_audio = data.get('include_audio', False)  # EXP-021: Default off
-    external_audio_id = data.get('external_audio_id')  # EXP-025: External audio
+        raise FileNotFoundError('HTML file not found')
 
     custom_durations = data.get('custom_durations', None)
     if custom_durations:
@@ -619,77 +1141,135 @@ def html_to_mp4():
 
     # EXP-025: Get external audio path if provided
     external_audio_path = None
+    external_audio_id = data.get('external_audio_id')  # EXP-025: External audio
     if external_audio_id:
         external_audio_path = UPLOAD_DIR / secure_filename(external_audio_id)
         if not external_audio_path.exists():
-            return jsonify({'error': 'External audio file not found'}), 404
+            raise FileNotFoundError('External audio file not found')
+
+    ready_strategy = data.get('ready_strategy', 'auto')
+    if ready_strategy not in READY_STRATEGIES:
+        raise ValueError(f'Unknown ready_strategy: {ready_strategy}')
+    slide_addressing = data.get('slide_addressing', 'auto')
+    if slide_addressing not in SLIDE_ADDRESSING:
+        raise ValueError(f'Unknown slide_addressing: {slide_addressing}')
+
+    return {
+        'html_path': html_path,
+        'settings': ConversionSettings(
+            width=int(data.get('width', 1920)),
+            height=int(data.get('height', 1080)),
+            fps=int(data.get('fps', 2)),
+            default_seconds_per_slide=int(data.get('seconds_per_slide', 5)),
+            ready_strategy=ready_strategy,
+            capture_pages=max(1, int(data.get('capture_pages', ConversionSettings.capture_pages))),
+            slide_addressing=slide_addressing
+        ),
+        'custom_durations': custom_durations,
+        'include_audio': data.get('include_audio', False),  # EXP-021: Default off
+        'external_audio_path': external_audio_path,  # EXP-025
+    }
+
+
+def conversion_progress(job_id: str):
+    """Progress callback that records slide capture progress in the job store."""
+    def on_slide(captured, total):
+        # Slides are encoded as they are captured; the rest is the encoder's tail
+        job_store.update(
+            job_id,
+            progress=round(95 * captured / total, 1),
+            message=f'Captured slide {captured}/{total}' if captured < total else 'Finishing encode...',
+        )
+
+    return on_slide
+
+
+def run_conversion(job_id: str, output_path: Path, args: dict):
+    """HTML to MP4 job, run by the scheduler's html2mp4 pool."""
+    job_store.update(job_id, status='processing', message='Opening slides...')
+    try:
+        result = convert_html_to_mp4(
+            args['html_path'],
+            output_path,
+            args['settings'],
+            custom_durations=args['custom_durations'],
+            include_audio=args['include_audio'],  # EXP-021
+            external_audio_path=args['external_audio_path'],  # EXP-025
+            progress_callback=conversion_progress(job_id)
+        )
+        if result.success:
+            job_store.update(job_id, status='completed', progress=100, result={
+                'slides': result.slides,
+                'frames': result.frames,
+                'duration_s': result.duration_s,
+                'size_mb': result.size_mb,
+                'slide_durations': result.slide_durations,
+                'ready_strategy': result.ready_strategy,
+                'ready_timeouts': result.ready_timeouts,
+                'capture_pages': result.capture_pages,
+                'slide_addressing': result.slide_addressing
+            })
+        else:
+            job_store.update(job_id, status='failed', error=result.error)
+    except JobCancelled:
+        job_store.update(job_id, status='cancelled')
+    except Exception as e:
+        import traceback
+        job_store.update(job_id, status='failed', error=f'{str(e)}\n{traceback.format_exc()}')
+
+
+def queue_conversion(job_id: str, data: dict, output_path: Path) -> None:
+    """Queue an HTML to MP4 conversion on the scheduler's html2mp4 pool."""
+    scheduler.submit('html2mp4', run_conversion, job_id, output_path, conversion_args(data),
+                     job_id=job_id, priority=PRIORITY_BATCH)
 
-    settings = ConversionSettings(
-        width=width,
-        height=height,
-        fps=fps,
-        default_seconds_per_slide=default_seconds
-    )
+
+@app.route('/html-to-mp4', methods=['POST'])
+def html_to_mp4():
+    """Start HTML to MP4 conversion with custom durations.
+
+    EXP-021: Added include_audio parameter (default: False).
+    EXP-025: Added external_audio_id parameter for external audio.
+    """
+    data = request.json
+    try:
+        conversion_args(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
 
     output_name = f"html2mp4_{uuid.uuid4().hex[:8]}.mp4"
-    output_path = OUTPUT_DIR / output_name
 
     job_id = uuid.uuid4().hex[:12]
-    conversion_jobs[job_id] = {
-        'status': 'processing',
+    job_store.create(job_id, 'html2mp4', {
+        'status': 'queued',
         'progress': 0,
+        'message': 'Conversion queued...',
         'output_name': output_name,
-        'error': None
-    }
-
-    def run_conversion():
-        try:
-            result = convert_html_to_mp4(
-                html_path,
-                output_path,
-                settings,
-                custom_durations=custom_durations,
-                include_audio=include_audio,  # EXP-021
-                external_audio_path=external_audio_path  # EXP-025
-            )
-            if result.success:
-                conversion_jobs[job_id]['status'] = 'completed'
-                conversion_jobs[job_id]['result'] = {
-                    'slides': result.slides,
-                    'frames': result.frames,
-                    'duration_s': result.duration_s,
-                    'size_mb': result.size_mb,
-                    'slide_durations': result.slide_durations
-                }
-            else:
-                conversion_jobs[job_id]['status'] = 'failed'
-                conversion_jobs[job_id]['error'] = result.error
-        except Exception as e:
-            import traceback
-            conversion_jobs[job_id]['status'] = 'failed'
-            conversion_jobs[job_id]['error'] = f'{str(e)}\n{traceback.format_exc()}'
+        'error': None,
+        'session': request_session(data),
+    }, payload=data)
 
-    thread = threading.Thread(target=run_conversion)
-    thread.start()
+    queue_conversion(job_id, data, OUTPUT_DIR / output_name)
 
     return jsonify({
         'success': True,
         'job_id': job_id,
-        'message': 'Conversion started'
+        'message': 'Conversion started',
+        'queue_position': scheduler.position(job_id),
     })
 
 
-@app.route('/html-to-mp4/status/<job_id>')
-def conversion_status(job_id):
-    """Check conversion job status."""
-    if job_id not in conversion_jobs:
-        return jsonify({'error': 'Job not found'}), 404
-
-    job = conversion_jobs[job_id]
-
+def conversion_status_payload(job: dict) -> dict:
+    """Client-facing status of an HTML to MP4 job (polling and event streams)."""
     response = {
+        'job_id': job['id'],
+        'kind': job['kind'],
         'status': job['status'],
-        'progress': job.get('progress', 0)
+        'progress': job.get('progress', 0),
+        'message': job.get('message'),
+        'queue_position': scheduler.position(job['id']),
     }
 
     if job['status'] == 'completed':
@@ -698,7 +1278,25 @@ def conversion_status(job_id):
     elif job['status'] == 'failed':
         response['error'] = job.get('error', 'Unknown error')
 
-    return jsonify(response)
+    return response
+
+
+# Status payload per job kind, for the job event streams above
+JOB_STATUS_PAYLOADS = {
+    'preview': preview_status_payload,
+    'export': export_status_payload,
+    'html2mp4': conversion_status_payload,
+}
+
+
+@app.route('/html-to-mp4/status/<job_id>')
+def conversion_status(job_id):
+    """Check conversion job status (polling fallback for /jobs/<id>/events)."""
+    job = job_store.get(job_id)
+    if job is None or job['kind'] != 'html2mp4':
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify(conversion_status_payload(job))
 
 
 @app.route('/clear-html', methods=['POST'])
@@ -790,6 +1388,37 @@ def download_html_copy(filename):
     )
 
 
+# Jobs left queued by a previous (crashed or restarted) server are re-queued
+# from their request payload; ones that were mid-render are marked failed
+_requeue = {
+    'export': lambda job: queue_export(job['id'], job['payload'], EXPORT_DIR / job['output_name']),
+    'html2mp4': lambda job: queue_conversion(job['id'], job['payload'], OUTPUT_DIR / job['output_name']),
+}
+_background_started = False
+_background_lock = threading.Lock()
+
+
+@app.before_request
+def start_background_work():
+    """Start background work once, in the process serving requests.
+
+    Recovers orphaned jobs, starts store maintenance and warms the HTML to
+    MP4 browsers. Not done at import: the debug reloader imports this module
+    in a watcher process too, which would re-queue the same jobs and launch
+    browsers that never serve a conversion.
+    """
+    global _background_started
+    if _background_started:
+        return
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    job_store.recover(_requeue)
+    job_store.start_maintenance(_requeue)
+    browser_pool.start()  # Launch the browsers before the first conversion
+
+
 if __name__ == '__main__':
     print("=" * 60)
     print("Video Editor + HTML to MP4")
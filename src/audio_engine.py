@@ -0,0 +1,203 @@
+"""
+NumPy audio engine: renders the editor audio bed (music + speech) outside ffmpeg.
+
+Sources come from the shared decoded-PCM cache (pcm_cache: 44.1 kHz stereo
+float32, memory-mapped), so the bed is plain array math over slices with the
+same semantics as the filter graph (graph_compiler.lower_editor_audio):
+
+- music: trimmed, volume, linear fade-in from 0, linear fade-out ending at
+  min(music length, timeline length)
+- speech: clips and silences back to back from t=0, times speech_volume
+- mix: sum of both (amix normalize=0), as long as the longest track
+
+The bed is written as a float WAV (no clipping before the AAC encoder, same
+as amix; RF64 past 4 GiB), cached by its inputs, and the video ffmpeg only
+muxes it.
+"""
+import hashlib
+import json
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from concat import AudioTrackSpec, SpeechClipSpec
+from media_cache import CacheDir, content_hash
+from pcm_cache import CHANNELS, SAMPLE_RATE, PcmCache, pcm_cache
+
+DEFAULT_BED_DIR = Path(__file__).parent.parent / "cache" / "audio_beds"
+DEFAULT_BED_MAX_BYTES = 4 * 1024 ** 3
+CHUNK_FRAMES = 1 << 18  # ~6 s per mixing step (2 MiB buffer)
+
+
+def _frames(seconds: float) -> int:
+    return max(0, int(round(seconds * SAMPLE_RATE)))
+
+
+# RIFF/data chunk sizes are 32-bit; longer beds (~3.4 h of stereo float32) need RF64
+RIFF_MAX_BYTES = 0xFFFFFFFF
+
+
+def wav_f32_header(frames: int) -> bytes:
+    """Header for a float32 (WAVE_FORMAT_IEEE_FLOAT) WAV of `frames` frames.
+
+    Beds whose sizes don't fit the 32-bit RIFF fields get an RF64 header
+    (EBU Tech 3306): the 32-bit sizes are set to 0xFFFFFFFF and the real
+    64-bit sizes go in a ds64 chunk. ffmpeg reads both.
+    """
+    data_bytes = frames * CHANNELS * 4
+    fmt = b"fmt " + struct.pack("<IHHIIHH", 16, 3, CHANNELS, SAMPLE_RATE,
+                                SAMPLE_RATE * CHANNELS * 4, CHANNELS * 4, 32)
+    if 36 + data_bytes <= RIFF_MAX_BYTES:
+        return (b"RIFF" + struct.pack("<I", 36 + data_bytes) + b"WAVE"
+                + fmt + b"data" + struct.pack("<I", data_bytes))
+    ds64 = b"ds64" + struct.pack("<IQQQI", 28, 72 + data_bytes, data_bytes, frames, 0)
+    return (b"RF64" + struct.pack("<I", RIFF_MAX_BYTES) + b"WAVE" + ds64
+            + fmt + b"data" + struct.pack("<I", RIFF_MAX_BYTES))
+
+
+def _speech_segments(speech_clips: list[SpeechClipSpec], pcm: PcmCache) -> list[tuple[int, Optional[np.ndarray]]]:
+    """(frame count, samples or None for silence) per speech clip, in order."""
+    segments = []
+    for clip in speech_clips:
+        if clip.is_silence:
+            segments.append((_frames(round(clip.duration_s, 3)), None))
+        elif clip.path:
+            source = pcm.get(clip.path)
+            start = _frames(clip.trim_start)
+            samples = source[start:start + _frames(clip.trimmed_duration)]
+            segments.append((len(samples), samples))
+    return segments
+
+
+def render_bed(
+    output_path: Path,
+    audio_track: Optional[AudioTrackSpec],
+    speech_clips: Optional[list[SpeechClipSpec]],
+    speech_volume: float,
+    total_duration: float,
+    pcm: Optional[PcmCache] = None,
+) -> float:
+    """Mix music + speech into a float WAV at output_path; returns its duration.
+
+    The mix is computed CHUNK_FRAMES at a time in one reused buffer and written
+    sequentially, so memory stays flat however long the bed is.
+    """
+    pcm = pcm or pcm_cache
+    music = None
+    music_gain = np.float32(1.0)
+    fade_in = fade_out = fade_end = 0
+    if audio_track:
+        source = pcm.get(audio_track.path)
+        start = _frames(audio_track.trim_start)
+        trimmed_s = len(source) / SAMPLE_RATE - audio_track.trim_start - audio_track.trim_end
+        music = source[start:start + _frames(trimmed_s)]
+        music_gain = np.float32(audio_track.volume)
+        fade_in = _frames(audio_track.fade_in_s)
+        fade_out = _frames(audio_track.fade_out_s)
+        # Fade-out ends at min(music length, timeline length); silence after it
+        fade_end = min(len(music), _frames(total_duration)) if fade_out else len(music)
+    music_len = len(music) if music is not None else 0
+
+    # Speech clips back to back: (timeline start frame, samples)
+    placed = []
+    pos = 0
+    for n, samples in _speech_segments(speech_clips or [], pcm):
+        if samples is not None and n:
+            placed.append((pos, samples))
+        pos += n
+    frames = max(music_len, pos)
+    speech_gain = np.float32(speech_volume)
+
+    buf = np.empty((CHUNK_FRAMES, CHANNELS), dtype=np.float32)
+    next_speech = 0
+    with open(output_path, "wb") as f:
+        f.write(wav_f32_header(frames))
+        for a in range(0, frames, CHUNK_FRAMES):
+            b = min(a + CHUNK_FRAMES, frames)
+            out = buf[:b - a]
+            out.fill(0.0)
+
+            m_end = min(b, fade_end)
+            if music is not None and m_end > a:
+                m = out[:m_end - a]
+                np.multiply(music[a:m_end], music_gain, out=m)
+                if a < fade_in:
+                    k = min(fade_in, m_end)
+                    m[:k - a] *= (np.arange(a, k, dtype=np.float32) / fade_in)[:, None]
+                if fade_out and m_end > fade_end - fade_out:
+                    lo = max(a, fade_end - fade_out)
+                    # Position relative to the fade start: absolute frame numbers overflow float32 precision
+                    ramp = 1.0 - np.arange(lo - (fade_end - fade_out), m_end - (fade_end - fade_out),
+                                           dtype=np.float32) / fade_out
+                    m[lo - a:] *= ramp[:, None]
+
+            # Speech segments are ordered, so only a window of them overlaps a chunk
+            while next_speech < len(placed) and placed[next_speech][0] + len(placed[next_speech][1]) <= a:
+                next_speech += 1
+            i = next_speech
+            while i < len(placed) and placed[i][0] < b:
+                start, samples = placed[i]
+                lo, hi = max(a, start), min(b, start + len(samples))
+                out[lo - a:hi - a] += samples[lo - start:hi - start] * speech_gain
+                i += 1
+
+            f.write(out.tobytes())
+    return frames / SAMPLE_RATE
+
+
+class AudioBedCache:
+    """Rendered beds keyed by everything they depend on."""
+
+    def __init__(self, cache_dir: Path = DEFAULT_BED_DIR, max_bytes: int = DEFAULT_BED_MAX_BYTES):
+        self.cache = CacheDir(cache_dir, max_bytes=max_bytes)
+
+    def _key(self, audio_track, speech_clips, speech_volume, total_duration) -> str:
+        music = None
+        if audio_track:
+            music = [content_hash(audio_track.path), audio_track.volume, audio_track.fade_in_s,
+                     audio_track.fade_out_s, audio_track.trim_start, audio_track.trim_end]
+        speech = [
+            ["silence", round(c.duration_s, 3)] if c.is_silence
+            else [content_hash(c.path), c.trim_start, c.trimmed_duration]
+            for c in speech_clips or [] if c.is_silence or c.path
+        ]
+        data = json.dumps([music, speech, speech_volume, round(total_duration, 3)])
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def bed(
+        self,
+        audio_track: Optional[AudioTrackSpec],
+        speech_clips: Optional[list[SpeechClipSpec]],
+        speech_volume: float,
+        total_duration: float,
+    ) -> Optional[Path]:
+        """The cached bed for these tracks, rendered on a miss. None if there's no editor audio."""
+        if audio_track and not audio_track.path.exists():
+            raise FileNotFoundError(audio_track.path)
+        for clip in speech_clips or []:
+            if not clip.is_silence and clip.path and not clip.path.exists():
+                raise FileNotFoundError(clip.path)
+        if not audio_track and not any(c.is_silence or c.path for c in speech_clips or []):
+            return None
+
+        name = f"bed_{self._key(audio_track, speech_clips, speech_volume, total_duration)}.wav"
+        existing = self.cache.lookup(name)
+        if existing:
+            return existing
+        out_path = self.cache.path_for(name)
+        tmp_path = out_path.with_name(f"{name}.{threading.get_ident()}.tmp")
+        try:
+            render_bed(tmp_path, audio_track, speech_clips, speech_volume, total_duration)
+            os.replace(tmp_path, out_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        self.cache.evict(keep={out_path})
+        return out_path
+
+
+audio_beds = AudioBedCache(max_bytes=int(os.environ.get("AUDIO_BED_CACHE_BYTES", DEFAULT_BED_MAX_BYTES)))
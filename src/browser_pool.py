@@ -0,0 +1,174 @@
+"""
+Warm Chromium browsers for HTML to MP4 conversions.
+
+Starting Playwright and launching Chromium costs seconds, which used to be
+paid by every conversion. BrowserPool keeps browsers running between jobs;
+each job gets a fresh BrowserContext (its own viewport, storage and cache),
+so nothing carries over from one deck to the next.
+
+Playwright's sync API is bound to the thread that started it, so each
+browser lives on its own thread and jobs run there: run(fn) hands
+fn(browser) to a free browser thread and waits for its result. The pool is
+sized to the scheduler's html2mp4 workers, so a conversion never waits for
+a browser.
+
+A browser is checked before every job and relaunched if it has
+disconnected (crashed). It is also replaced after MAX_JOBS jobs, or once
+its processes use more than MAX_RSS_MB, to contain leaks. Replacements are
+launched straight away rather than on the next job.
+"""
+import os
+import queue
+import threading
+from typing import Any, Callable, Optional
+
+from scheduler import JOB_CLASS_WORKERS, bind_job
+
+LAUNCH_ARGS = ['--no-sandbox', '--disable-setuid-sandbox']
+DEFAULT_MAX_JOBS = 20
+DEFAULT_MAX_RSS_MB = 1536
+
+
+def browser_rss_mb(browser) -> float:
+    """Resident memory of all of a browser's processes in MB (0 if unknown, e.g. not Linux)."""
+    try:
+        session = browser.new_browser_cdp_session()
+        try:
+            info = session.send('SystemInfo.getProcessInfo')
+        finally:
+            session.detach()
+    except Exception:
+        return 0.0
+    total_kb = 0
+    for proc in info.get('processInfo', []):
+        try:
+            with open(f"/proc/{proc['id']}/status") as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue  # Exited in the meantime
+    return total_kb / 1024
+
+
+class _Task:
+    def __init__(self, fn: Callable):
+        self.fn = fn
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class _BrowserSlot:
+    """One browser and the Playwright instance that drives it (owned by one thread)."""
+
+    def __init__(self, name: str, max_jobs: int, max_rss_mb: float):
+        self.name = name
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.playwright = None
+        self.browser = None
+        self.jobs = 0
+
+    def acquire(self):
+        """The browser, (re)launched if there is none or it failed its health check."""
+        if self.browser is not None and not self.browser.is_connected():
+            print(f"[WARN] {self.name}: browser disconnected, relaunching")
+            self.close()
+        if self.browser is None:
+            if self.playwright is None:
+                from playwright.sync_api import sync_playwright
+                self.playwright = sync_playwright().start()
+            self.browser = self.playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+            self.jobs = 0
+        return self.browser
+
+    def warm(self) -> None:
+        """Launch the browser ahead of the next job; failures are left for that job to report."""
+        try:
+            self.acquire()
+        except Exception as e:
+            print(f"[WARN] {self.name}: could not launch browser: {e}")
+
+    def release(self) -> None:
+        """Count a finished job and replace the browser if it is due for recycling."""
+        if self.browser is None:
+            return
+        self.jobs += 1
+        reason = None
+        if not self.browser.is_connected():
+            reason = "disconnected"
+        elif self.jobs >= self.max_jobs:
+            reason = f"{self.jobs} jobs"
+        elif self.max_rss_mb > 0:
+            rss = browser_rss_mb(self.browser)
+            if rss > self.max_rss_mb:
+                reason = f"{rss:.0f} MB resident"
+        if reason:
+            print(f"[INFO] {self.name}: recycling browser ({reason})")
+            self.close()
+            self.warm()
+
+    def close(self) -> None:
+        if self.browser is not None:
+            try:
+                self.browser.close()
+            except Exception:
+                pass  # Already gone
+            self.browser = None
+
+
+class BrowserPool:
+    """Long-lived Chromium browsers, each on its own thread, shared by conversion jobs."""
+
+    def __init__(self, size: int, max_jobs: int = DEFAULT_MAX_JOBS, max_rss_mb: float = DEFAULT_MAX_RSS_MB):
+        self.size = max(1, size)
+        self.max_jobs = max(1, max_jobs)
+        self.max_rss_mb = max_rss_mb
+        self._tasks: queue.Queue[_Task] = queue.Queue()
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the browser threads (once); each launches its browser right away."""
+        with self._lock:
+            while len(self._threads) < self.size:
+                name = f"browser-{len(self._threads)}"
+                t = threading.Thread(target=self._worker, args=(name,), daemon=True, name=name)
+                self._threads.append(t)
+                t.start()
+
+    def run(self, fn: Callable[[Any], Any]) -> Any:
+        """Run fn(browser) on a pooled browser's thread; returns its result or raises its error.
+
+        fn runs under the calling job, so tracked() and raise_if_cancelled()
+        work inside it. It should do its work in a new context and close it.
+        """
+        self.start()
+        task = _Task(bind_job(fn))
+        self._tasks.put(task)
+        task.done.wait()
+        if task.error is not None:
+            raise task.error
+        return task.result
+
+    def _worker(self, name: str) -> None:
+        slot = _BrowserSlot(name, self.max_jobs, self.max_rss_mb)
+        slot.warm()
+        while True:
+            task = self._tasks.get()
+            try:
+                task.result = task.fn(slot.acquire())
+            except BaseException as e:
+                task.error = e
+            finally:
+                task.done.set()
+            slot.release()
+
+
+browser_pool = BrowserPool(
+    size=JOB_CLASS_WORKERS["html2mp4"],
+    max_jobs=int(os.environ.get("HTML2MP4_BROWSER_MAX_JOBS", DEFAULT_MAX_JOBS)),
+    max_rss_mb=float(os.environ.get("HTML2MP4_BROWSER_MAX_RSS_MB", DEFAULT_MAX_RSS_MB)),
+)
@@ -4,12 +4,30 @@ EXP-005: Added trim support (in/out points).
 EXP-007: Added dual audio support (speech track + music track).
 EXP-014: Added audio-only support (black video + audio when no video clips).
 EXP-026: Added audio_source parameter for selecting audio source.
+Probing goes through probe.py (one cached ffprobe per file).
+Filter graphs are built and optimized by graph_compiler.py.
 """
+import os
+import shutil
 import subprocess
+import tempfile
 from pathlib import Path
 from dataclasses import dataclass, field
 from typing import Optional
 
+from ffmpeg_progress import ProgressCallback, run_ffmpeg_with_progress
+from graph_compiler import (
+    Composition, FilterGraph, audio_only_duration, compile_graph, lower_audio, lower_composition, timeline_duration,
+)
+from probe import probe_media, probe_many
+from scheduler import tracked
+
+# Upper bound on inputs one ffmpeg process opens in the batched paths
+# (each input is a demuxer + decoder with its own buffers)
+MAX_OPEN_INPUTS = 32
+# Editor audio mix: "numpy" (audio_engine.py) or "ffmpeg" (filter graph)
+AUDIO_ENGINE = os.environ.get("AUDIO_ENGINE", "numpy")
+
 
 @dataclass
 class VideoClipSpec:
@@ -62,32 +80,77 @@ class SpeechClipSpec:
 
 
 def ffprobe_duration_seconds(path: Path) -> float:
-    """Get duration of a media file in seconds."""
-    cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        str(path),
-    ]
-    p = subprocess.run(cmd, capture_output=True, text=True)
-    if p.returncode != 0:
-        raise RuntimeError(f"ffprobe failed for {path}: {p.stderr}")
-    return float(p.stdout.strip())
+    """Get duration of a media file in seconds (cached, see probe.py)."""
+    return probe_media(path).duration_s
 
 
 def ffprobe_has_audio(path: Path) -> bool:
-    """Check if media file has an audio stream."""
-    cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-select_streams", "a:0",
-        "-show_entries", "stream=codec_type",
-        "-of", "csv=p=0",
-        str(path),
-    ]
-    p = subprocess.run(cmd, capture_output=True, text=True)
-    return p.returncode == 0 and "audio" in p.stdout.lower()
+    """Check if media file has an audio stream (cached, see probe.py)."""
+    try:
+        return probe_media(path).has_audio
+    except (FileNotFoundError, RuntimeError, ValueError):
+        return False
+
+
+def _prefetch_probes(
+    video_clips: Optional[list[VideoClipSpec]] = None,
+    audio_track: Optional[AudioTrackSpec] = None,
+    speech_clips: Optional[list[SpeechClipSpec]] = None,
+) -> None:
+    """Warm the probe cache for every input of a composition in one batch."""
+    paths = [c.path for c in video_clips or []]
+    if audio_track:
+        paths.append(audio_track.path)
+    paths += [s.path for s in speech_clips or [] if not s.is_silence and s.path]
+    probe_many(paths)
+
+
+def run_ffmpeg(
+    cmd: list[str],
+    total_duration: Optional[float] = None,
+    progress_callback: Optional[ProgressCallback] = None,
+) -> None:
+    """Run an ffmpeg command, raising RuntimeError with stderr on failure.
+
+    With a progress_callback, ffmpeg's -progress output is parsed and
+    reported against total_duration (see ffmpeg_progress.py).
+    """
+    if progress_callback is not None:
+        run_ffmpeg_with_progress(cmd, total_duration, progress_callback)
+        return
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    with tracked(p):  # Killed if the job running this is cancelled
+        _, stderr = p.communicate()
+    if p.returncode != 0:
+        raise RuntimeError(f"FFmpeg failed: {stderr}")
+
+
+def join_with_concat_demuxer(piece_paths: list[Path], output_path: Path, list_path: Path) -> None:
+    """Losslessly join video-only pieces (same codec settings) via the concat demuxer."""
+    lines = ["ffconcat version 1.0"]
+    for path in piece_paths:
+        escaped = str(Path(path).resolve()).replace("'", "'\\''")
+        lines.append(f"file '{escaped}'")
+    list_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    run_ffmpeg([
+        "ffmpeg", "-y",
+        "-f", "concat", "-safe", "0", "-i", str(list_path),
+        "-map", "0:v", "-c", "copy",
+        "-movflags", "+faststart",
+        str(output_path),
+    ])
+
+
+def run_graph(
+    graph: FilterGraph,
+    output_path: Path,
+    output_args: list[str],
+    total_duration: Optional[float] = None,
+    progress_callback: Optional[ProgressCallback] = None,
+) -> None:
+    """Compile a filter graph (see graph_compiler.py) and run it."""
+    with compile_graph(graph, output_path, output_args) as compiled:
+        run_ffmpeg(compiled.args, total_duration, progress_callback)
 
 
 def concat_audio_only(
@@ -96,144 +159,142 @@ def concat_audio_only(
     speech_clips: Optional[list[SpeechClipSpec]] = None,
     speech_volume: float = 1.0,
     resolution: tuple[int, int] = (1920, 1080),
+    progress_callback: Optional[ProgressCallback] = None,
 ) -> float:
     """Create a video with black background and audio tracks only.
 
     EXP-014: New function to handle audio-only preview/export.
+    progress_callback receives RenderProgress snapshots while ffmpeg runs.
     Returns the total duration of the output.
     """
     if not audio_track and not speech_clips:
         raise ValueError("Need at least one audio source (music or speech)")
 
-    # Calculate total duration from audio sources
-    total_duration = 0.0
-
-    if speech_clips:
-        speech_duration = sum(c.trimmed_duration for c in speech_clips)
-        total_duration = max(total_duration, speech_duration)
-
-    if audio_track:
-        if not audio_track.path.exists():
-            raise FileNotFoundError(audio_track.path)
-        audio_dur = ffprobe_duration_seconds(audio_track.path)
-        trimmed_audio_dur = audio_dur - audio_track.trim_start - audio_track.trim_end
-        total_duration = max(total_duration, trimmed_audio_dur)
+    _prefetch_probes(audio_track=audio_track, speech_clips=speech_clips)
 
+    total_duration = audio_only_duration(audio_track, speech_clips)
     if total_duration <= 0:
         raise ValueError("Total audio duration must be greater than 0")
 
-    width, height = resolution
-
-    cmd = ["ffmpeg", "-y"]
+    comp = Composition(
+        audio_track=audio_track,
+        speech_clips=speech_clips,
+        speech_volume=speech_volume,
+        resolution=resolution,
+    )
+    graph, total_duration = lower_composition(prepare_editor_audio(comp, total_duration))
 
-    # Add black video source
-    cmd += [
-        "-f", "lavfi",
-        "-i", f"color=c=black:s={width}x{height}:r=30:d={total_duration:.3f}",
-    ]
+    run_graph(graph, output_path, [
+        "-c:v", "libx264", "-preset", "medium", "-crf", "23", "-c:a", "aac", "-b:a", "192k", "-shortest",
+        "-movflags", "+faststart",
+    ], total_duration, progress_callback)
 
-    next_input_idx = 1  # 0 is the black video
+    return total_duration
 
-    # Add music track input
-    audio_input_idx = None
-    if audio_track:
-        cmd += ["-i", str(audio_track.path)]
-        audio_input_idx = next_input_idx
-        next_input_idx += 1
-
-    # Add speech clip inputs
-    speech_input_indices = []
-    if speech_clips:
-        for speech_clip in speech_clips:
-            if not speech_clip.is_silence and speech_clip.path:
-                if not speech_clip.path.exists():
-                    raise FileNotFoundError(speech_clip.path)
-                cmd += ["-i", str(speech_clip.path)]
-                speech_input_indices.append(next_input_idx)
-                next_input_idx += 1
-            else:
-                speech_input_indices.append(None)
 
-    filter_parts = []
-    audio_tracks_to_mix = []
+def prepare_editor_audio(comp: Composition, total_duration: float) -> Composition:
+    """Pre-render what the editor mix needs, if the composition uses it.
 
-    # Process music track
-    if audio_track:
-        audio_dur = ffprobe_duration_seconds(audio_track.path)
-        trimmed_audio_dur = audio_dur - audio_track.trim_start - audio_track.trim_end
-
-        music_filter = f"[{audio_input_idx}:a]"
-
-        if audio_track.trim_start > 0 or audio_track.trim_end > 0:
-            music_filter += f"atrim=start={audio_track.trim_start}:duration={trimmed_audio_dur},asetpts=PTS-STARTPTS,"
-
-        if audio_track.volume != 1.0:
-            music_filter += f"volume={audio_track.volume},"
-        if audio_track.fade_in_s > 0:
-            music_filter += f"afade=t=in:st=0:d={audio_track.fade_in_s},"
-        if audio_track.fade_out_s > 0:
-            fade_start = min(trimmed_audio_dur, total_duration) - audio_track.fade_out_s
-            music_filter += f"afade=t=out:st={fade_start:.3f}:d={audio_track.fade_out_s},"
-        music_filter = music_filter.rstrip(",") + "[music]"
-        filter_parts.append(music_filter)
-        audio_tracks_to_mix.append("[music]")
-
-    # Process speech track
-    if speech_clips and len(speech_clips) > 0:
-        speech_filter_parts = []
-        speech_labels = []
-
-        for i, speech_clip in enumerate(speech_clips):
-            if speech_clip.is_silence:
-                dur = speech_clip.duration_s
-                speech_filter_parts.append(
-                    f"anullsrc=r=44100:cl=stereo,atrim=duration={dur:.3f}[sil{i}]"
-                )
-                speech_labels.append(f"[sil{i}]")
-            else:
-                input_idx = speech_input_indices[i]
-                if input_idx is None:
-                    continue
-
-                trimmed_dur = speech_clip.trimmed_duration
-                if speech_clip.trim_start > 0 or speech_clip.trim_end > 0:
-                    speech_filter = f"[{input_idx}:a]atrim=start={speech_clip.trim_start}:duration={trimmed_dur},asetpts=PTS-STARTPTS[sp{i}]"
-                else:
-                    speech_filter = f"[{input_idx}:a]acopy[sp{i}]"
-                speech_filter_parts.append(speech_filter)
-                speech_labels.append(f"[sp{i}]")
-
-        filter_parts.extend(speech_filter_parts)
-
-        if len(speech_labels) == 1:
-            filter_parts.append(f"{speech_labels[0]}acopy[speech_raw]")
-        elif len(speech_labels) > 1:
-            concat_inputs = "".join(speech_labels)
-            filter_parts.append(f"{concat_inputs}concat=n={len(speech_labels)}:v=0:a=1[speech_raw]")
-
-        if speech_labels:
-            if speech_volume != 1.0:
-                filter_parts.append(f"[speech_raw]volume={speech_volume}[speech]")
-            else:
-                filter_parts.append("[speech_raw]acopy[speech]")
-            audio_tracks_to_mix.append("[speech]")
+    With AUDIO_ENGINE="numpy" (default) the whole music + speech bed is mixed
+    by audio_engine.py and muxed as one input; with "ffmpeg" the mix stays in
+    the filter graph and only the speech track is pre-assembled (speech_stem.py).
+    """
+    if comp.audio_source != "editor" or not (comp.audio_track or comp.speech_clips):
+        return comp
+    if AUDIO_ENGINE == "numpy":
+        try:
+            from audio_engine import audio_beds
+        except ImportError as e:
+            print(f"[WARN] NumPy audio engine unavailable ({e}), mixing in ffmpeg")
+        else:
+            comp.audio_bed = audio_beds.bed(comp.audio_track, comp.speech_clips, comp.speech_volume, total_duration)
+            return comp
+    if comp.speech_clips:
+        from speech_stem import speech_stems
+        comp.speech_stem = speech_stems.stem(comp.speech_clips)
+    return comp
 
-    # Mix audio tracks
-    if len(audio_tracks_to_mix) == 1:
-        filter_parts.append(f"{audio_tracks_to_mix[0]}acopy[aout]")
-    elif len(audio_tracks_to_mix) > 1:
-        mix_inputs = "".join(audio_tracks_to_mix)
-        filter_parts.append(f"{mix_inputs}amix=inputs={len(audio_tracks_to_mix)}:normalize=0[aout]")
 
-    cmd += ["-filter_complex", ";".join(filter_parts)]
-    cmd += ["-map", "0:v", "-map", "[aout]"]
-    cmd += ["-c:v", "libx264", "-preset", "medium", "-crf", "23", "-c:a", "aac", "-b:a", "192k", "-shortest", str(output_path)]
+def premix_audio(paths: list[Path], work_dir: Path, max_inputs: int = MAX_OPEN_INPUTS) -> Path:
+    """Sum audio files with at most max_inputs open per ffmpeg; returns the mix.
 
-    p = subprocess.run(cmd, capture_output=True, text=True)
-    if p.returncode != 0:
-        raise RuntimeError(f"FFmpeg failed: {p.stderr}")
+    amix with normalize=0 is a plain sum, so mixing groups and then mixing the
+    group results gives the same audio as one big amix. Intermediate levels are
+    float WAV, so nothing clips in between.
+    """
+    level = list(paths)
+    n = 0
+    while len(level) > 1:
+        next_level = []
+        for i in range(0, len(level), max_inputs):
+            group = level[i:i + max_inputs]
+            if len(group) == 1:
+                next_level.append(group[0])
+                continue
+            graph = FilterGraph()
+            tracks = [graph.add_input(p).stream("a") for p in group]
+            graph.map(graph.add_filter("amix", tracks, "a", [("inputs", len(tracks)), ("normalize", 0)]))
+            out = work_dir / f"premix_{n:05d}.wav"
+            n += 1
+            run_graph(graph, out, ["-c:a", "pcm_f32le"])
+            next_level.append(out)
+        level = next_level
+    return level[0]
+
+
+def mux_audio(
+    video_path: Path,
+    output_path: Path,
+    video_clips: list[VideoClipSpec],
+    total_duration: float,
+    audio_track: Optional[AudioTrackSpec] = None,
+    speech_clips: Optional[list[SpeechClipSpec]] = None,
+    speech_volume: float = 1.0,
+    audio_source: str = "editor",
+) -> None:
+    """Add the composition's audio to an already rendered video-only file.
 
-    return total_duration
+    The video stream is copied, only the audio mix is rendered. Produces the
+    same audio as concat_videos would for the given audio_source; used by the
+    render modes that assemble the picture separately (smart, parallel and
+    batched render). Clip audio from more than MAX_OPEN_INPUTS clips is
+    premixed in groups (premix_audio).
+    """
+    graph = FilterGraph()
+    graph.map(graph.add_input(video_path).stream("v"))
+    comp = Composition(
+        video_clips=video_clips,
+        audio_track=audio_track,
+        speech_clips=speech_clips,
+        speech_volume=speech_volume,
+        audio_source=audio_source,
+    )
+    prepare_editor_audio(comp, total_duration)
+    work_dir = None
+    clip_inputs = []
+    if audio_source != "none":
+        clip_inputs = [graph.add_media_input(c.path) for c in video_clips]
+        uses_clip_audio = audio_source == "video" or not (audio_track or speech_clips)
+        with_audio = [inp.path for inp in clip_inputs if inp.info and inp.info.has_audio]
+        if uses_clip_audio and len(with_audio) > MAX_OPEN_INPUTS:
+            work_dir = Path(tempfile.mkdtemp(prefix="premix_"))
+            premixed = premix_audio([Path(p) for p in with_audio], work_dir)
+            graph = FilterGraph()
+            graph.map(graph.add_input(video_path).stream("v"))
+            clip_inputs = [graph.add_media_input(premixed)]
+    try:
+        audio = lower_audio(graph, comp, clip_inputs, total_duration)
+        output_args = ["-c:v", "copy", "-movflags", "+faststart"]
+        if audio is not None:
+            graph.map(audio)
+            output_args += ["-c:a", "aac", "-b:a", "192k"]
+            # Same -shortest rule as concat_videos (EXP-015)
+            if len(video_clips) <= 1:
+                output_args += ["-shortest"]
+        run_graph(graph, output_path, output_args)
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
 
 
 def concat_videos(
@@ -245,10 +306,17 @@ def concat_videos(
     speech_volume: float = 1.0,  # EXP-012: Speech volume (0-2.0)
     resolution: tuple[int, int] = (1920, 1080),
     audio_source: str = "editor",  # EXP-026: "video", "editor", or "none"
+    render_mode: str = "standard",  # "standard", "smart", "parallel", "batched" or "auto"
+    workers: Optional[int] = None,  # parallel: ffmpeg workers (default: CPU count)
+    segment_s: float = 30.0,  # parallel: target segment length in seconds
+    batch_size: int = MAX_OPEN_INPUTS,  # batched: max clips per ffmpeg process
+    batch_workers: int = 1,  # batched: ffmpeg workers; open inputs <= batch_workers * (batch_size + 1)
+    progress_callback: Optional[ProgressCallback] = None,
 ) -> None:
     """Concatenate videos with crossfade and dual audio (speech + music).
 
-    Supports trim points: clips are trimmed using -ss (start) and -t (duration).
+    Supports trim points: trims become input -ss to the nearest keyframe plus a
+    residual trim where possible (graph_compiler.py).
     EXP-007: Added speech_clips parameter for dual audio mixing.
     EXP-012: Added speech_volume parameter for separate volume control.
     EXP-014: Falls back to audio-only when no video clips.
@@ -256,6 +324,21 @@ def concat_videos(
         - "video": Use audio from video files only (ignore speech/music tracks)
         - "editor": Use speech and music tracks (default, current behavior)
         - "none": No audio output (silent video)
+    render_mode:
+        - "standard": One ffmpeg process re-encodes every frame (default)
+        - "smart": Stream-copy GOP-aligned clip bodies and re-encode only
+          crossfade windows and trim edges (see smart_render.py). Falls back
+          to "standard" when the clips don't match the output format.
+        - "parallel": Render ~segment_s long timeline segments on `workers`
+          ffmpeg processes and join them losslessly (see parallel_render.py)
+        - "batched": Render batches of at most batch_size clips on
+          batch_workers ffmpeg processes and join them losslessly, so open
+          inputs stay bounded for 100s-1000s of clips (see parallel_render.py)
+        - "auto": "smart" if possible, else "batched" for more than batch_size
+          clips, else "parallel" for timelines longer than two segments,
+          else "standard"
+    progress_callback receives RenderProgress snapshots (percent against the
+    output duration, fps, speed, ETA) parsed from ffmpeg -progress output.
     """
     # EXP-014: If no video clips, use audio-only function
     if len(video_clips) == 0:
@@ -266,261 +349,100 @@ def concat_videos(
                 speech_clips=speech_clips,
                 speech_volume=speech_volume,
                 resolution=resolution,
+                progress_callback=progress_callback,
             )
             return
         else:
             raise ValueError("Need at least 1 video clip or audio source")
 
-    # Get durations
+    # Get durations (all inputs probed in one parallel batch, results cached)
+    _prefetch_probes(video_clips, audio_track, speech_clips)
     for clip in video_clips:
         if not clip.path.exists():
             raise FileNotFoundError(clip.path)
         if clip.duration_s == 0:
             clip.duration_s = ffprobe_duration_seconds(clip.path)
 
-    cmd = ["ffmpeg", "-y"]
-
-    # Add inputs (trim is applied via filter_complex, not here)
-    for clip in video_clips:
-        cmd += ["-i", str(clip.path)]
-
-    # Track input indices for audio
-    next_input_idx = len(video_clips)
-
-    # Add music track input
-    audio_input_idx = None
-    if audio_track:
-        if not audio_track.path.exists():
-            raise FileNotFoundError(audio_track.path)
-        cmd += ["-i", str(audio_track.path)]
-        audio_input_idx = next_input_idx
-        next_input_idx += 1
-
-    # Add speech clip inputs (not silence - those are generated)
-    speech_input_indices = []
-    if speech_clips:
-        for speech_clip in speech_clips:
-            if not speech_clip.is_silence and speech_clip.path:
-                if not speech_clip.path.exists():
-                    raise FileNotFoundError(speech_clip.path)
-                cmd += ["-i", str(speech_clip.path)]
-                speech_input_indices.append(next_input_idx)
-                next_input_idx += 1
+    if render_mode in ("smart", "auto"):
+        from smart_render import smart_render_eligibility, smart_render
+        reason = smart_render_eligibility(video_clips, crossfade, resolution)
+        if reason is None:
+            smart_render(
+                video_clips=video_clips,
+                output_path=output_path,
+                crossfade=crossfade,
+                audio_track=audio_track,
+                speech_clips=speech_clips,
+                speech_volume=speech_volume,
+                resolution=resolution,
+                audio_source=audio_source,
+                progress_callback=progress_callback,
+            )
+            return
+        print(f"[INFO] Smart render not possible ({reason})")
+        if render_mode == "auto":
+            xfade_dur = (crossfade.duration_s if crossfade else 1.0) if len(video_clips) > 1 else 0.0
+            timeline_s = sum(c.trimmed_duration for c in video_clips) - xfade_dur * (len(video_clips) - 1)
+            if len(video_clips) > batch_size:
+                render_mode = "batched"
+            elif timeline_s > 2 * segment_s and (workers or os.cpu_count() or 1) > 1:
+                render_mode = "parallel"
             else:
-                speech_input_indices.append(None)  # Silence, no input file
-
-    width, height = resolution
-    filter_parts = []
-
-    if len(video_clips) == 1:
-        clip = video_clips[0]
-        trimmed_dur = clip.trimmed_duration
-
-        # Apply trim via trim filter for single clip
-        trim_filter = f"[0:v]"
-        if clip.trim_start > 0 or clip.trim_end > 0:
-            trim_filter += f"trim=start={clip.trim_start}:duration={trimmed_dur},setpts=PTS-STARTPTS,"
-        trim_filter += (
-            f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
-            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2[vout]"
+                render_mode = "standard"
+
+    if render_mode == "batched":
+        from parallel_render import batched_render
+        batched_render(
+            video_clips=video_clips,
+            output_path=output_path,
+            crossfade=crossfade,
+            audio_track=audio_track,
+            speech_clips=speech_clips,
+            speech_volume=speech_volume,
+            resolution=resolution,
+            audio_source=audio_source,
+            workers=batch_workers,
+            batch_size=batch_size,
+            progress_callback=progress_callback,
         )
-        filter_parts.append(trim_filter)
-        total_duration = trimmed_dur
-    else:
-        xfade_dur = crossfade.duration_s if crossfade else 1.0
-        xfade_type = crossfade.transition if crossfade else "fade"
-
-        # Scale and trim all videos
-        # EXP-015 FIX: Normalize framerate and pixel format for xfade compatibility
-        # Order matters: scale -> fps -> format -> setpts
-        for i, clip in enumerate(video_clips):
-            trimmed_dur = clip.trimmed_duration
-
-            trim_part = ""
-            if clip.trim_start > 0 or clip.trim_end > 0:
-                trim_part = f"trim=start={clip.trim_start}:duration={trimmed_dur},setpts=PTS-STARTPTS,"
-
-            filter_parts.append(
-                f"[{i}:v]{trim_part}scale={width}:{height}:force_original_aspect_ratio=decrease,"
-                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,"
-                f"fps=30,format=yuv420p,setpts=PTS-STARTPTS[v{i}]"
-            )
-
-        # Chain xfades using trimmed durations
-        trimmed_durations = [c.trimmed_duration for c in video_clips]
-
-        if len(video_clips) == 2:
-            offset = trimmed_durations[0] - xfade_dur
-            filter_parts.append(
-                f"[v0][v1]xfade=transition={xfade_type}:duration={xfade_dur}:offset={offset:.3f}[vout]"
-            )
-            total_duration = trimmed_durations[0] + trimmed_durations[1] - xfade_dur
-        else:
-            current_offset = trimmed_durations[0] - xfade_dur
-            prev_label = "v0"
-            for i in range(1, len(video_clips)):
-                out_label = "vout" if i == len(video_clips) - 1 else f"vx{i}"
-                filter_parts.append(
-                    f"[{prev_label}][v{i}]xfade=transition={xfade_type}:"
-                    f"duration={xfade_dur}:offset={current_offset:.3f}[{out_label}]"
-                )
-                current_offset += trimmed_durations[i] - xfade_dur
-                prev_label = out_label
-            total_duration = sum(trimmed_durations) - xfade_dur * (len(video_clips) - 1)
-
-    # Audio handling (EXP-007: dual audio support - speech + music)
-    # EXP-026: audio_source controls which audio to use
-    has_music = audio_track is not None
-    has_speech = speech_clips and len(speech_clips) > 0
-
-    # EXP-026: Handle audio_source="none" - silent video
-    if audio_source == "none":
-        cmd += ["-filter_complex", ";".join(filter_parts)]
-        cmd += ["-map", "[vout]", "-an"]
-        cmd += ["-c:v", "libx264", "-preset", "medium", "-crf", "23", str(output_path)]
-        p = subprocess.run(cmd, capture_output=True, text=True)
-        if p.returncode != 0:
-            raise RuntimeError(f"FFmpeg failed: {p.stderr}")
         return
 
-    # EXP-026: Handle audio_source="video" - use video audio only
-    if audio_source == "video":
-        videos_with_audio = [c for c in video_clips if ffprobe_has_audio(c.path)]
-        if videos_with_audio:
-            audio_filters = [f"[{i}:a]" for i, c in enumerate(video_clips) if ffprobe_has_audio(c.path)]
-            if len(audio_filters) == 1:
-                cmd += ["-filter_complex", ";".join(filter_parts)]
-                cmd += ["-map", "[vout]", "-map", audio_filters[0].strip("[]")]
-            else:
-                audio_merge = "".join(audio_filters) + f"amix=inputs={len(audio_filters)}:normalize=0[aout]"
-                filter_parts.append(audio_merge)
-                cmd += ["-filter_complex", ";".join(filter_parts)]
-                cmd += ["-map", "[vout]", "-map", "[aout]"]
-        else:
-            cmd += ["-filter_complex", ";".join(filter_parts)]
-            cmd += ["-map", "[vout]", "-an"]
-
-        if len(video_clips) > 1:
-            cmd += ["-c:v", "libx264", "-preset", "medium", "-crf", "23", "-c:a", "aac", "-b:a", "192k", str(output_path)]
-        else:
-            cmd += ["-c:v", "libx264", "-preset", "medium", "-crf", "23", "-c:a", "aac", "-b:a", "192k", "-shortest", str(output_path)]
-
-        p = subprocess.run(cmd, capture_output=True, text=True)
-        if p.returncode != 0:
-            raise RuntimeError(f"FFmpeg failed: {p.stderr}")
+    if render_mode == "parallel":
+        from parallel_render import parallel_render
+        parallel_render(
+            video_clips=video_clips,
+            output_path=output_path,
+            crossfade=crossfade,
+            audio_track=audio_track,
+            speech_clips=speech_clips,
+            speech_volume=speech_volume,
+            resolution=resolution,
+            audio_source=audio_source,
+            workers=workers,
+            segment_s=segment_s,
+            progress_callback=progress_callback,
+        )
         return
 
-    # audio_source="editor" (default) - use speech and music tracks
-    if has_music or has_speech:
-        audio_tracks_to_mix = []
-
-        # Process music track
-        if has_music:
-            audio_dur = ffprobe_duration_seconds(audio_track.path)
-            trimmed_audio_dur = audio_dur - audio_track.trim_start - audio_track.trim_end
-
-            music_filter = f"[{audio_input_idx}:a]"
-
-            if audio_track.trim_start > 0 or audio_track.trim_end > 0:
-                music_filter += f"atrim=start={audio_track.trim_start}:duration={trimmed_audio_dur},asetpts=PTS-STARTPTS,"
-
-            if audio_track.volume != 1.0:
-                music_filter += f"volume={audio_track.volume},"
-            if audio_track.fade_in_s > 0:
-                music_filter += f"afade=t=in:st=0:d={audio_track.fade_in_s},"
-            if audio_track.fade_out_s > 0:
-                fade_start = min(trimmed_audio_dur, total_duration) - audio_track.fade_out_s
-                music_filter += f"afade=t=out:st={fade_start:.3f}:d={audio_track.fade_out_s},"
-            music_filter = music_filter.rstrip(",") + "[music]"
-            filter_parts.append(music_filter)
-            audio_tracks_to_mix.append("[music]")
-
-        # Process speech track (concatenate speech clips and silence)
-        if has_speech:
-            speech_filter_parts = []
-            speech_labels = []
-
-            for i, speech_clip in enumerate(speech_clips):
-                if speech_clip.is_silence:
-                    # Generate silence using anullsrc
-                    dur = speech_clip.duration_s
-                    speech_filter_parts.append(
-                        f"anullsrc=r=44100:cl=stereo,atrim=duration={dur:.3f}[sil{i}]"
-                    )
-                    speech_labels.append(f"[sil{i}]")
-                else:
-                    # Speech audio file - use pre-computed input index
-                    input_idx = speech_input_indices[i]
-                    if input_idx is None:
-                        continue  # Should not happen
-
-                    trimmed_dur = speech_clip.trimmed_duration
-                    if speech_clip.trim_start > 0 or speech_clip.trim_end > 0:
-                        # Apply trim
-                        speech_filter = f"[{input_idx}:a]atrim=start={speech_clip.trim_start}:duration={trimmed_dur},asetpts=PTS-STARTPTS[sp{i}]"
-                    else:
-                        # No trim - just copy the audio
-                        speech_filter = f"[{input_idx}:a]acopy[sp{i}]"
-                    speech_filter_parts.append(speech_filter)
-                    speech_labels.append(f"[sp{i}]")
-
-            # Add speech filter parts
-            filter_parts.extend(speech_filter_parts)
-
-            # Concatenate all speech segments
-            if len(speech_labels) == 1:
-                # Just one clip, rename it to speech_raw
-                filter_parts.append(f"{speech_labels[0]}acopy[speech_raw]")
-            else:
-                # Concatenate multiple clips
-                concat_inputs = "".join(speech_labels)
-                filter_parts.append(f"{concat_inputs}concat=n={len(speech_labels)}:v=0:a=1[speech_raw]")
-
-            # EXP-012: Apply speech volume
-            if speech_volume != 1.0:
-                filter_parts.append(f"[speech_raw]volume={speech_volume}[speech]")
-            else:
-                filter_parts.append("[speech_raw]acopy[speech]")
-
-            audio_tracks_to_mix.append("[speech]")
-
-        # Mix audio tracks together
-        if len(audio_tracks_to_mix) == 1:
-            # Only one track, just output it
-            single_track = audio_tracks_to_mix[0].strip("[]")
-            filter_parts.append(f"{audio_tracks_to_mix[0]}acopy[aout]")
-        else:
-            # Mix music and speech together
-            mix_inputs = "".join(audio_tracks_to_mix)
-            filter_parts.append(f"{mix_inputs}amix=inputs={len(audio_tracks_to_mix)}:normalize=0[aout]")
-
-        cmd += ["-filter_complex", ";".join(filter_parts)]
-        cmd += ["-map", "[vout]", "-map", "[aout]"]
-    else:
-        # No external audio tracks, use video audio if available
-        videos_with_audio = [c for c in video_clips if ffprobe_has_audio(c.path)]
-        if videos_with_audio:
-            audio_filters = [f"[{i}:a]" for i, c in enumerate(video_clips) if ffprobe_has_audio(c.path)]
-            if len(audio_filters) == 1:
-                cmd += ["-filter_complex", ";".join(filter_parts)]
-                cmd += ["-map", "[vout]", "-map", audio_filters[0].strip("[]")]
-            else:
-                audio_merge = "".join(audio_filters) + f"amix=inputs={len(audio_filters)}:normalize=0[aout]"
-                filter_parts.append(audio_merge)
-                cmd += ["-filter_complex", ";".join(filter_parts)]
-                cmd += ["-map", "[vout]", "-map", "[aout]"]
-        else:
-            cmd += ["-filter_complex", ";".join(filter_parts)]
-            cmd += ["-map", "[vout]", "-an"]
-
-    # EXP-015 FIX: Don't use -shortest for multi-clip video, as individual clip audio
-    # may be shorter than the concatenated video output
-    if len(video_clips) > 1:
-        cmd += ["-c:v", "libx264", "-preset", "medium", "-crf", "23", "-c:a", "aac", "-b:a", "192k", str(output_path)]
-    else:
-        cmd += ["-c:v", "libx264", "-preset", "medium", "-crf", "23", "-c:a", "aac", "-b:a", "192k", "-shortest", str(output_path)]
-
-
-    p = subprocess.run(cmd, capture_output=True, text=True)
-    if p.returncode != 0:
-        raise RuntimeError(f"FFmpeg failed: {p.stderr}")
+    # Standard render: trims, scaling, xfades and the audio mix in one filter graph
+    # EXP-026: audio_source controls which audio to use
+    comp = Composition(
+        video_clips=video_clips,
+        crossfade=crossfade,
+        audio_track=audio_track,
+        speech_clips=speech_clips,
+        speech_volume=speech_volume,
+        resolution=resolution,
+        audio_source=audio_source,
+    )
+    prepare_editor_audio(comp, timeline_duration(video_clips, crossfade))
+    graph, total_duration = lower_composition(comp)
+    # moov atom up front: players can start before the whole file has downloaded
+    output_args = ["-c:v", "libx264", "-preset", "medium", "-crf", "23", "-movflags", "+faststart"]
+    if any(s.kind == "a" for s in graph.outputs):
+        output_args += ["-c:a", "aac", "-b:a", "192k"]
+        # EXP-015 FIX: Don't use -shortest for multi-clip video, as individual clip audio
+        # may be shorter than the concatenated video output
+        if len(video_clips) == 1:
+            output_args += ["-shortest"]
+    run_graph(graph, output_path, output_args, total_duration, progress_callback)
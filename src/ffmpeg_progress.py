@@ -0,0 +1,155 @@
+"""
+Real ffmpeg progress reporting.
+
+ffmpeg is run with `-progress pipe:1 -nostats`, which prints key=value blocks
+on stdout (out_time_us, fps, speed, ..., progress=continue|end). They are parsed
+as they stream in and turned into RenderProgress snapshots against the known
+output duration.
+"""
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from scheduler import tracked
+
+
+@dataclass
+class RenderProgress:
+    """Progress snapshot for a render."""
+    percent: float = 0.0
+    out_time_s: float = 0.0
+    fps: float = 0.0
+    speed: float = 0.0  # Encode speed, x realtime
+    eta_s: Optional[float] = None
+    done: bool = False
+
+    def as_dict(self) -> dict:
+        return {
+            'progress': round(self.percent, 1),
+            'out_time_s': round(self.out_time_s, 2),
+            'fps': round(self.fps, 1),
+            'speed': round(self.speed, 2),
+            'eta_s': round(self.eta_s, 1) if self.eta_s is not None else None,
+        }
+
+
+ProgressCallback = Callable[[RenderProgress], None]
+
+
+def _parse_float(value: str) -> float:
+    try:
+        return float(value.strip().rstrip("x"))
+    except (ValueError, AttributeError):
+        return 0.0  # "N/A"
+
+
+def make_snapshot(out_time_s: float, total_duration: Optional[float], fps: float, speed: float,
+                  done: bool = False) -> RenderProgress:
+    """Compute percent complete and ETA for a given output position."""
+    percent = 0.0
+    eta_s = None
+    if total_duration and total_duration > 0:
+        # Never report 100% before ffmpeg says it's finished
+        percent = 100.0 if done else min(99.9, max(0.0, out_time_s / total_duration * 100))
+        if speed > 0:
+            eta_s = 0.0 if done else max(0.0, (total_duration - out_time_s) / speed)
+    return RenderProgress(percent=percent, out_time_s=out_time_s, fps=fps, speed=speed, eta_s=eta_s, done=done)
+
+
+def run_ffmpeg_with_progress(
+    cmd: list[str],
+    total_duration: Optional[float],
+    progress_callback: ProgressCallback,
+) -> None:
+    """Run ffmpeg, calling progress_callback for every progress block.
+
+    Raises RuntimeError with stderr on failure (same as concat.run_ffmpeg).
+    """
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats"] + cmd[1:]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1)
+    with tracked(proc):
+        returncode, stderr = _follow_progress(proc, total_duration, progress_callback)
+    if returncode != 0:
+        raise RuntimeError(f"FFmpeg failed: {stderr}")
+
+
+def _follow_progress(proc: subprocess.Popen, total_duration: Optional[float],
+                     progress_callback: ProgressCallback) -> tuple[int, str]:
+    """Parse progress blocks until proc exits; returns (returncode, stderr)."""
+    # Drain stderr on a thread so a chatty ffmpeg can't block on a full pipe
+    stderr_chunks: list[str] = []
+    stderr_thread = threading.Thread(target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)
+    stderr_thread.start()
+
+    block: dict[str, str] = {}
+    for line in proc.stdout:
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            continue
+        block[key] = value
+        if key != "progress":
+            continue
+        out_us = block.get("out_time_us") or block.get("out_time_ms")  # Both are microseconds
+        out_time_s = _parse_float(out_us) / 1_000_000 if out_us else 0.0
+        snapshot = make_snapshot(
+            out_time_s, total_duration,
+            fps=_parse_float(block.get("fps", "0")),
+            speed=_parse_float(block.get("speed", "0")),
+            done=value == "end",
+        )
+        try:
+            progress_callback(snapshot)
+        except Exception as e:
+            print(f"[WARN] Progress callback failed: {e}")
+        block = {}
+
+    returncode = proc.wait()
+    stderr_thread.join()
+    return returncode, "".join(stderr_chunks)
+
+
+class ProgressTracker:
+    """Combines progress of several ffmpeg runs into one overall progress.
+
+    Each run reports under its own key with its output position; the overall
+    position is the sum across keys. Speed is measured on the wall clock,
+    so it's meaningful for runs in sequence and in parallel alike.
+    """
+
+    def __init__(self, total_duration: float, progress_callback: Optional[ProgressCallback]):
+        self.total_duration = total_duration
+        self.progress_callback = progress_callback
+        self._positions: dict = {}
+        self._fps: dict = {}
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def callback_for(self, key, weight: float = 1.0) -> Optional[ProgressCallback]:
+        """Progress callback for one run; its out_time is scaled by weight."""
+        if self.progress_callback is None:
+            return None
+
+        def callback(p: RenderProgress) -> None:
+            self.update(key, p.out_time_s * weight, p.fps)
+        return callback
+
+    def update(self, key, position_s: float, fps: float = 0.0) -> None:
+        if self.progress_callback is None:
+            return
+        with self._lock:
+            self._positions[key] = position_s
+            self._fps[key] = fps
+            done_s = sum(self._positions.values())
+            total_fps = sum(self._fps.values())
+        elapsed = time.monotonic() - self._started
+        speed = done_s / elapsed if elapsed > 0 else 0.0
+        self.progress_callback(make_snapshot(min(done_s, self.total_duration), self.total_duration, total_fps, speed))
+
+    def finish(self) -> None:
+        if self.progress_callback is None:
+            return
+        elapsed = time.monotonic() - self._started
+        speed = self.total_duration / elapsed if elapsed > 0 else 0.0
+        self.progress_callback(make_snapshot(self.total_duration, self.total_duration, 0.0, speed, done=True))
@@ -0,0 +1,657 @@
+"""
+Composition compiler: typed filter-graph IR -> optimized ffmpeg command.
+
+A composition (video clips, music, speech, crossfade, audio_source) is lowered
+to a DAG of Input and FilterNode objects connected by Streams, optimized by a
+few passes, and emitted as an ffmpeg argv. Passes:
+
+- drop_noop_filters: remove acopy/copy/null/anull hops by rewiring consumers
+- seek_inputs: turn a leading trim/atrim on an input that nothing else reads
+  into input-side -ss/-t, so ffmpeg skips instead of decoding and discarding.
+  Video seeks land on the nearest keyframe at or before the in-point (cached
+  keyframe index, see probe.py) and a small residual trim keeps frame accuracy
+- place_fps_conversion: fps/format always run after a downscale (fewer pixels);
+  fps moves ahead of an upscale when it drops frames
+- emit: fuses linear chains and switches to -filter_complex_script once the
+  command would get close to the OS argv limit (32k chars on Windows)
+"""
+import bisect
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional, Union
+
+from probe import probe_media, keyframe_times, MediaInfo
+
+if TYPE_CHECKING:
+    from concat import VideoClipSpec, CrossfadeSpec, AudioTrackSpec, SpeechClipSpec
+
+# Keep well below Windows' 32767-char command line (Linux allows 128k per arg)
+MAX_INLINE_COMMAND_CHARS = 30000
+NOOP_FILTERS = {"acopy", "copy", "null", "anull"}
+OUTPUT_FPS = 30
+# Residuals shorter than this are rounding noise, not a frame to drop
+SEEK_EPSILON_S = 0.001
+KEYFRAME_SCAN_WORKERS = 8
+
+
+# ------------------------------------------------------------
+# IR
+# ------------------------------------------------------------
+
+@dataclass(eq=False)
+class Input:
+    """An ffmpeg input (-i). seek_s / duration_s become -ss / -t before -i."""
+    path: str
+    options: list[str] = field(default_factory=list)  # e.g. ["-f", "lavfi"]
+    seek_s: float = 0.0
+    duration_s: Optional[float] = None
+    info: Optional[MediaInfo] = None  # Probe data, used by passes when known
+    index: int = -1
+
+    def stream(self, kind: str) -> "Stream":
+        return Stream(kind, self)
+
+
+@dataclass(eq=False)
+class FilterNode:
+    """One filter instance. args are (key, value) pairs; key None = positional."""
+    name: str
+    args: list[tuple[Optional[str], Any]]
+    inputs: list["Stream"]
+    kind: str  # "v" or "a" (output media type)
+    hints: dict = field(default_factory=dict)  # Pass metadata, never emitted
+
+    @property
+    def out(self) -> "Stream":
+        return Stream(self.kind, self)
+
+
+@dataclass(frozen=True, eq=False)
+class Stream:
+    """An edge: an input's first v/a stream, or a filter's output."""
+    kind: str
+    source: Union[Input, FilterNode]
+
+    def __eq__(self, other):
+        return isinstance(other, Stream) and self.kind == other.kind and self.source is other.source
+
+    def __hash__(self):
+        return hash((self.kind, id(self.source)))
+
+
+class FilterGraph:
+    """A DAG of inputs and filters plus the streams mapped to the output."""
+
+    def __init__(self):
+        self.inputs: list[Input] = []
+        self.filters: list[FilterNode] = []
+        self.outputs: list[Stream] = []
+
+    def add_input(self, path, options: Optional[list[str]] = None, info: Optional[MediaInfo] = None) -> Input:
+        node = Input(path=str(path), options=list(options or []), info=info, index=len(self.inputs))
+        self.inputs.append(node)
+        return node
+
+    def add_media_input(self, path) -> Input:
+        """Add a file input with its probe info attached (when the file exists)."""
+        return self.add_input(path, info=_probe_if_exists(path))
+
+    def add_filter(self, name: str, inputs: list[Stream], kind: str,
+                   args: Optional[list[tuple[Optional[str], Any]]] = None, **hints) -> Stream:
+        node = FilterNode(name=name, args=list(args or []), inputs=list(inputs), kind=kind, hints=hints)
+        self.filters.append(node)
+        return node.out
+
+    def chain(self, stream: Stream, *filters: tuple) -> Stream:
+        """Apply a linear chain of (name, args) filters to stream."""
+        for name, args in filters:
+            stream = self.add_filter(name, [stream], stream.kind, args)
+        return stream
+
+    def map(self, stream: Stream) -> None:
+        self.outputs.append(stream)
+
+    def consumers(self) -> dict[Stream, list[FilterNode]]:
+        result: dict[Stream, list[FilterNode]] = {}
+        for node in self.filters:
+            for s in node.inputs:
+                result.setdefault(s, []).append(node)
+        return result
+
+    def bypass(self, removed: dict[FilterNode, Stream]) -> None:
+        """Remove filters, rewiring readers of each to the given replacement stream.
+
+        One sweep over the graph, so passes stay linear on 1,000-clip timelines.
+        """
+        if not removed:
+            return
+        by_id = {id(n): s for n, s in removed.items()}
+
+        def resolve(s: Stream) -> Stream:
+            # A replacement can itself be the output of a removed filter
+            while id(s.source) in by_id:
+                s = by_id[id(s.source)]
+            return s
+
+        self.filters = [n for n in self.filters if id(n) not in by_id]
+        for node in self.filters:
+            node.inputs = [resolve(s) for s in node.inputs]
+        self.outputs = [resolve(s) for s in self.outputs]
+
+
+# ------------------------------------------------------------
+# Lowering
+# ------------------------------------------------------------
+
+def _probe_if_exists(path: Path) -> Optional[MediaInfo]:
+    try:
+        return probe_media(path) if Path(path).exists() else None
+    except (RuntimeError, ValueError, OSError):
+        return None
+
+
+def _trim_args(start: float, duration: float) -> list:
+    return [("start", start), ("duration", duration)]
+
+
+def lower_video_timeline(
+    graph: FilterGraph,
+    video_clips: list["VideoClipSpec"],
+    crossfade: Optional["CrossfadeSpec"],
+    resolution: tuple[int, int],
+    normalize: bool = False,
+) -> tuple[Stream, list[Input], float]:
+    """Add the trim/scale/xfade video timeline.
+
+    normalize=True also applies the fps/format normalization to a single clip,
+    so separately rendered pieces can be joined losslessly (multi-clip
+    timelines always normalize, EXP-015).
+    Returns (video stream, clip inputs, total duration).
+    """
+    width, height = resolution
+    clip_inputs = []
+    streams = []
+    normalize = normalize or len(video_clips) > 1
+
+    for clip in video_clips:
+        inp = graph.add_media_input(clip.path)
+        clip_inputs.append(inp)
+        v = inp.stream("v")
+        if clip.trim_start > 0 or clip.trim_end > 0:
+            v = graph.chain(v, ("trim", _trim_args(clip.trim_start, clip.trimmed_duration)),
+                            ("setpts", [(None, "PTS-STARTPTS")]))
+        upscale = bool(inp.info and inp.info.width and inp.info.width < width and inp.info.height < height)
+        v = graph.add_filter("scale", [v], "v", [
+            (None, width), (None, height), ("force_original_aspect_ratio", "decrease"),
+        ], upscale=upscale, source_fps=inp.info.fps if inp.info else 0.0)
+        v = graph.chain(v, ("pad", [(None, width), (None, height), (None, "(ow-iw)/2"), (None, "(oh-ih)/2")]))
+        if normalize:
+            # EXP-015 FIX: Normalize framerate and pixel format for xfade compatibility
+            v = graph.chain(v, ("setsar", [(None, 1)]), ("fps", [(None, OUTPUT_FPS)]),
+                            ("format", [(None, "yuv420p")]), ("setpts", [(None, "PTS-STARTPTS")]))
+        streams.append(v)
+
+    if len(video_clips) == 1:
+        return streams[0], clip_inputs, video_clips[0].trimmed_duration
+
+    xfade_dur = crossfade.duration_s if crossfade else 1.0
+    xfade_type = crossfade.transition if crossfade else "fade"
+    trimmed_durations = [c.trimmed_duration for c in video_clips]
+
+    # Chain xfades using trimmed durations
+    current = streams[0]
+    offset = trimmed_durations[0] - xfade_dur
+    for i in range(1, len(video_clips)):
+        current = graph.add_filter("xfade", [current, streams[i]], "v", [
+            ("transition", xfade_type), ("duration", xfade_dur), ("offset", round(offset, 3)),
+        ])
+        offset += trimmed_durations[i] - xfade_dur
+    return current, clip_inputs, timeline_duration(video_clips, crossfade)
+
+
+def lower_editor_audio(
+    graph: FilterGraph,
+    audio_track: Optional["AudioTrackSpec"],
+    speech_clips: Optional[list["SpeechClipSpec"]],
+    speech_volume: float,
+    total_duration: float,
+    speech_stem: Optional[Path] = None,
+) -> Optional[Stream]:
+    """Add the music + speech mix (EXP-007, EXP-012). Returns None if there's nothing to mix.
+
+    speech_stem, when given, replaces the speech clips with one assembled file.
+    """
+    tracks = []
+
+    # Music track
+    if audio_track:
+        if not audio_track.path.exists():
+            raise FileNotFoundError(audio_track.path)
+        info = probe_media(audio_track.path)
+        trimmed_audio_dur = info.duration_s - audio_track.trim_start - audio_track.trim_end
+        music = graph.add_input(audio_track.path, info=info).stream("a")
+        if audio_track.trim_start > 0 or audio_track.trim_end > 0:
+            music = graph.chain(music, ("atrim", _trim_args(audio_track.trim_start, trimmed_audio_dur)),
+                                ("asetpts", [(None, "PTS-STARTPTS")]))
+        if audio_track.volume != 1.0:
+            music = graph.chain(music, ("volume", [(None, audio_track.volume)]))
+        if audio_track.fade_in_s > 0:
+            music = graph.chain(music, ("afade", [("t", "in"), ("st", 0), ("d", audio_track.fade_in_s)]))
+        if audio_track.fade_out_s > 0:
+            fade_start = min(trimmed_audio_dur, total_duration) - audio_track.fade_out_s
+            music = graph.chain(music, ("afade", [("t", "out"), ("st", round(fade_start, 3)), ("d", audio_track.fade_out_s)]))
+        tracks.append(music)
+
+    # Speech track: the pre-assembled stem (speech_stem.py) as one input, or
+    # speech clips and generated silence concatenated in the graph
+    speech_parts = []
+    if speech_stem is not None:
+        speech_parts.append(graph.add_input(speech_stem).stream("a"))
+    else:
+        for speech_clip in speech_clips or []:
+            if speech_clip.is_silence:
+                silence = graph.add_filter("anullsrc", [], "a", [("r", 44100), ("cl", "stereo")])
+                speech_parts.append(graph.chain(silence, ("atrim", [("duration", round(speech_clip.duration_s, 3))])))
+            elif speech_clip.path:
+                if not speech_clip.path.exists():
+                    raise FileNotFoundError(speech_clip.path)
+                sp = graph.add_input(speech_clip.path).stream("a")
+                if speech_clip.trim_start > 0 or speech_clip.trim_end > 0:
+                    sp = graph.chain(sp, ("atrim", _trim_args(speech_clip.trim_start, speech_clip.trimmed_duration)),
+                                     ("asetpts", [(None, "PTS-STARTPTS")]))
+                speech_parts.append(sp)
+
+    if speech_parts:
+        if len(speech_parts) == 1:
+            speech = speech_parts[0]
+        else:
+            speech = graph.add_filter("concat", speech_parts, "a", [("n", len(speech_parts)), ("v", 0), ("a", 1)])
+        if speech_volume != 1.0:
+            speech = graph.chain(speech, ("volume", [(None, speech_volume)]))
+        tracks.append(speech)
+
+    return _mix(graph, tracks)
+
+
+def _mix(graph: FilterGraph, tracks: list[Stream]) -> Optional[Stream]:
+    if not tracks:
+        return None
+    if len(tracks) == 1:
+        return tracks[0]
+    return graph.add_filter("amix", tracks, "a", [("inputs", len(tracks)), ("normalize", 0)])
+
+
+def lower_video_audio(graph: FilterGraph, clip_inputs: list[Input]) -> Optional[Stream]:
+    """Audio from the video clips themselves (EXP-026 audio_source="video"), mixed."""
+    tracks = [inp.stream("a") for inp in clip_inputs if inp.info and inp.info.has_audio]
+    return _mix(graph, tracks)
+
+
+@dataclass
+class Composition:
+    """Everything concat_videos renders, in one value."""
+    video_clips: list = field(default_factory=list)
+    crossfade: Optional[Any] = None
+    audio_track: Optional[Any] = None
+    speech_clips: Optional[list] = None
+    speech_volume: float = 1.0
+    resolution: tuple[int, int] = (1920, 1080)
+    audio_source: str = "editor"
+    speech_stem: Optional[Path] = None  # Assembled speech track (speech_stem.py)
+    audio_bed: Optional[Path] = None  # Pre-rendered music + speech mix (audio_engine.py)
+
+
+def _lower_editor(graph: FilterGraph, comp: Composition, total_duration: float) -> Optional[Stream]:
+    """The editor mix: the pre-rendered bed as one input, else the filter-graph mix."""
+    if comp.audio_bed is not None:
+        return graph.add_input(comp.audio_bed).stream("a")
+    return lower_editor_audio(graph, comp.audio_track, comp.speech_clips, comp.speech_volume, total_duration,
+                              comp.speech_stem)
+
+
+def timeline_duration(video_clips: list["VideoClipSpec"], crossfade: Optional["CrossfadeSpec"]) -> float:
+    """Output length of a video timeline: trimmed clips minus the crossfade overlaps."""
+    if not video_clips:
+        return 0.0
+    xfade_dur = (crossfade.duration_s if crossfade else 1.0) if len(video_clips) > 1 else 0.0
+    return sum(c.trimmed_duration for c in video_clips) - xfade_dur * (len(video_clips) - 1)
+
+
+def lower_audio(
+    graph: FilterGraph,
+    comp: Composition,
+    clip_inputs: list[Input],
+    total_duration: float,
+) -> Optional[Stream]:
+    """Audio for a composition according to audio_source (EXP-026).
+
+    "editor" mixes music + speech, falling back to the clips' own audio when
+    there are no editor tracks; "video" uses the clips' audio; "none" is silent.
+    """
+    if comp.audio_source == "none":
+        return None
+    audio = None
+    if comp.audio_source == "editor":
+        audio = _lower_editor(graph, comp, total_duration)
+    if audio is None:
+        audio = lower_video_audio(graph, clip_inputs)
+    return audio
+
+
+def lower_composition(comp: Composition) -> tuple[FilterGraph, float]:
+    """Lower a whole composition; returns (graph, total duration).
+
+    Without video clips, a black lavfi source of the audio's length is used (EXP-014).
+    """
+    graph = FilterGraph()
+    if comp.video_clips:
+        video, clip_inputs, total_duration = lower_video_timeline(
+            graph, comp.video_clips, comp.crossfade, comp.resolution
+        )
+        graph.map(video)
+        audio = lower_audio(graph, comp, clip_inputs, total_duration)
+        if audio is not None:
+            graph.map(audio)
+        return graph, total_duration
+
+    total_duration = audio_only_duration(comp.audio_track, comp.speech_clips)
+    width, height = comp.resolution
+    black = graph.add_input(f"color=c=black:s={width}x{height}:r=30:d={total_duration:.3f}", options=["-f", "lavfi"])
+    graph.map(black.stream("v"))
+    graph.map(lower_editor_audio(graph, comp.audio_track, comp.speech_clips, comp.speech_volume, total_duration,
+                                   comp.speech_stem))
+    return graph, total_duration
+
+
+def audio_only_duration(audio_track, speech_clips) -> float:
+    """Length of an audio-only composition: the longer of music and speech."""
+    total_duration = 0.0
+    if speech_clips:
+        total_duration = max(total_duration, sum(c.trimmed_duration for c in speech_clips))
+    if audio_track:
+        if not audio_track.path.exists():
+            raise FileNotFoundError(audio_track.path)
+        audio_dur = probe_media(audio_track.path).duration_s
+        total_duration = max(total_duration, audio_dur - audio_track.trim_start - audio_track.trim_end)
+    return total_duration
+
+
+# ------------------------------------------------------------
+# Optimization passes
+# ------------------------------------------------------------
+
+def drop_noop_filters(graph: FilterGraph) -> FilterGraph:
+    graph.bypass({
+        node: node.inputs[0]
+        for node in graph.filters
+        if node.name in NOOP_FILTERS and len(node.inputs) == 1
+    })
+    return graph
+
+
+def _arg(node: FilterNode, key: str) -> Optional[Any]:
+    for k, v in node.args:
+        if k == key:
+            return v
+    return None
+
+
+def _keyframe_index(path: str) -> list[float]:
+    try:
+        return keyframe_times(Path(path))
+    except (FileNotFoundError, RuntimeError, ValueError, OSError):
+        return []
+
+
+def keyframe_at_or_before(times: list[float], t: float) -> Optional[float]:
+    """Nearest keyframe time <= t in a sorted keyframe index, None if there is none."""
+    i = bisect.bisect_right(times, t + SEEK_EPSILON_S)
+    return max(0.0, times[i - 1]) if i else None
+
+
+def seek_inputs(graph: FilterGraph) -> FilterGraph:
+    """Replace trim/atrim directly on an otherwise unused input by -ss/-t.
+
+    Video inputs seek to the keyframe at or before the in-point, so ffmpeg
+    decodes at most one GOP it doesn't keep, and the trim stays for the
+    residual. Audio (every packet decodable) and files without a keyframe
+    index seek to the in-point itself.
+    """
+    # Seeking affects every stream of the input - only safe if the trim is its sole reader
+    readers: dict[int, int] = {}
+    for node in graph.filters:
+        for s in node.inputs:
+            if isinstance(s.source, Input):
+                readers[id(s.source)] = readers.get(id(s.source), 0) + 1
+    for s in graph.outputs:
+        if isinstance(s.source, Input):
+            readers[id(s.source)] = readers.get(id(s.source), 0) + 1
+
+    candidates = []
+    for node in graph.filters:
+        if node.name not in ("trim", "atrim") or len(node.inputs) != 1:
+            continue
+        inp = node.inputs[0].source
+        if not isinstance(inp, Input) or readers[id(inp)] != 1:
+            continue
+        if inp.options or inp.seek_s or inp.duration_s is not None or _arg(node, "end") is not None:
+            continue
+        candidates.append(node)
+
+    # Keyframe scans are demux passes over whole files - run cache misses in parallel
+    index_paths = sorted({
+        n.inputs[0].source.path for n in candidates
+        if n.name == "trim" and float(_arg(n, "start") or 0.0) > 0
+        and n.inputs[0].source.info and n.inputs[0].source.info.has_video
+    })
+    with ThreadPoolExecutor(max_workers=KEYFRAME_SCAN_WORKERS) as pool:
+        indexes = dict(zip(index_paths, pool.map(_keyframe_index, index_paths)))
+
+    removed = {}
+    for node in candidates:
+        src = node.inputs[0]
+        inp = src.source
+        start = float(_arg(node, "start") or 0.0)
+        duration = _arg(node, "duration")
+
+        keyframe = keyframe_at_or_before(indexes[inp.path], start) if inp.path in indexes else None
+        residual = start - keyframe if keyframe is not None else 0.0
+        inp.seek_s = start - residual
+        if duration is not None:
+            inp.duration_s = residual + float(duration)
+
+        if residual > SEEK_EPSILON_S:
+            node.args = [("start", round(residual, 6))] + (
+                [("duration", duration)] if duration is not None else []
+            )
+        else:
+            removed[node] = src
+    graph.bypass(removed)
+    return graph
+
+
+def place_fps_conversion(graph: FilterGraph) -> FilterGraph:
+    """Run fps after a downscale, but before an upscale when it drops frames.
+
+    Lowering already puts fps/format after scale, which is right for the usual
+    downscale. For small sources that get upscaled at a higher frame rate than
+    the output, dropping frames first means fewer frames to scale. format
+    always stays last (xfade needs identical pixel formats, EXP-015).
+    """
+    consumers = graph.consumers()
+    hoisted: dict[int, FilterNode] = {}  # id(scale) -> fps node moved above it
+    for scale in graph.filters:
+        if scale.name != "scale" or not scale.hints.get("upscale"):
+            continue
+        if scale.hints.get("source_fps", 0) <= OUTPUT_FPS:
+            continue
+        # Walk the linear chain below scale to find its fps node
+        node, prev = scale, None
+        while node.name != "fps":
+            nxt = consumers.get(node.out, [])
+            if len(nxt) != 1 or len(nxt[0].inputs) != 1:
+                break
+            prev, node = node, nxt[0]
+        if node.name != "fps":
+            continue
+        # Unlink fps and re-insert it directly above scale
+        for reader in consumers.get(node.out, []):
+            reader.inputs = [prev.out if s == node.out else s for s in reader.inputs]
+        graph.outputs = [prev.out if s == node.out else s for s in graph.outputs]
+        node.inputs = [scale.inputs[0]]
+        scale.inputs = [node.out]
+        hoisted[id(scale)] = node
+
+    if hoisted:
+        # Keep the filter list topologically ordered
+        moved = {id(n) for n in hoisted.values()}
+        ordered = []
+        for n in graph.filters:
+            if id(n) in moved:
+                continue
+            if id(n) in hoisted:
+                ordered.append(hoisted[id(n)])
+            ordered.append(n)
+        graph.filters = ordered
+    return graph
+
+
+DEFAULT_PASSES = (drop_noop_filters, seek_inputs, place_fps_conversion)
+
+
+def optimize(graph: FilterGraph, passes=DEFAULT_PASSES) -> FilterGraph:
+    for p in passes:
+        graph = p(graph)
+    return graph
+
+
+# ------------------------------------------------------------
+# Emission
+# ------------------------------------------------------------
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, float):
+        text = f"{value:.6f}".rstrip("0").rstrip(".")
+        return text if text not in ("", "-0") else "0"
+    return str(value)
+
+
+def _format_filter(node: FilterNode) -> str:
+    if not node.args:
+        return node.name
+    parts = [_format_value(v) if k is None else f"{k}={_format_value(v)}" for k, v in node.args]
+    return f"{node.name}=" + ":".join(parts)
+
+
+def emit_filtergraph(graph: FilterGraph) -> tuple[str, dict[Stream, str]]:
+    """Emit filter_complex text; linear chains are fused with ','.
+
+    Returns (text, output labels for mapped filter streams).
+    """
+    consumers = graph.consumers()
+    mapped = set(graph.outputs)
+    labels: dict[Stream, str] = {}
+    absorbed: set[int] = set()
+    counter = 0
+
+    def label_for(stream: Stream) -> str:
+        nonlocal counter
+        if isinstance(stream.source, Input):
+            return f"[{stream.source.index}:{stream.kind}]"
+        if stream not in labels:
+            labels[stream] = f"[{stream.kind}{counter}]"
+            counter += 1
+        return labels[stream]
+
+    chains = []
+    for node in graph.filters:
+        if id(node) in absorbed:
+            continue
+        chain = [node]
+        tail = node
+        while tail.out not in mapped:
+            nxt = consumers.get(tail.out, [])
+            if len(nxt) != 1 or len(nxt[0].inputs) != 1:
+                break
+            tail = nxt[0]
+            absorbed.add(id(tail))
+            chain.append(tail)
+        chains.append(chain)
+
+    parts = []
+    for chain in chains:
+        head, tail = chain[0], chain[-1]
+        in_labels = "".join(label_for(s) for s in head.inputs)
+        body = ",".join(_format_filter(n) for n in chain)
+        out_label = label_for(tail.out) if tail.out in consumers or tail.out in mapped else ""
+        parts.append(f"{in_labels}{body}{out_label}")
+
+    return ";".join(parts), {s: labels[s] for s in graph.outputs if s in labels}
+
+
+@dataclass
+class CompiledCommand:
+    """An ffmpeg argv plus the filter script file it may reference."""
+    args: list[str]
+    script_path: Optional[Path] = None
+
+    def cleanup(self) -> None:
+        if self.script_path and self.script_path.exists():
+            self.script_path.unlink()
+
+    def __enter__(self) -> "CompiledCommand":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.cleanup()
+
+
+def compile_graph(
+    graph: FilterGraph,
+    output_path: Path,
+    output_args: list[str],
+    run_passes: bool = True,
+    max_inline_chars: int = MAX_INLINE_COMMAND_CHARS,
+) -> CompiledCommand:
+    """Optimize the graph and emit `ffmpeg -y <inputs> <graph> <maps> <output_args> <output>`."""
+    if run_passes:
+        optimize(graph)
+    # Inputs that no filter or map reads anymore are dropped, the rest renumbered
+    used = {id(s.source) for n in graph.filters for s in n.inputs} | {id(s.source) for s in graph.outputs}
+    graph.inputs = [inp for inp in graph.inputs if id(inp) in used]
+    for i, inp in enumerate(graph.inputs):
+        inp.index = i
+
+    args = ["ffmpeg", "-y"]
+    for inp in graph.inputs:
+        args += inp.options
+        if inp.seek_s:
+            args += ["-ss", _format_value(round(inp.seek_s, 6))]
+        if inp.duration_s is not None:
+            args += ["-t", _format_value(round(inp.duration_s, 6))]
+        args += ["-i", inp.path]
+
+    text, out_labels = emit_filtergraph(graph)
+    maps = []
+    for s in graph.outputs:
+        maps += ["-map", out_labels[s] if s in out_labels else f"{s.source.index}:{s.kind}"]
+    if not any(s.kind == "a" for s in graph.outputs):
+        maps += ["-an"]
+
+    script_path = None
+    if text:
+        inline_len = sum(len(a) + 1 for a in args + maps + output_args) + len(text) + len(str(output_path))
+        if inline_len > max_inline_chars:
+            fd, name = tempfile.mkstemp(prefix="filtergraph_", suffix=".txt")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            script_path = Path(name)
+            args += ["-filter_complex_script", str(script_path)]
+        else:
+            args += ["-filter_complex", text]
+
+    args += maps + list(output_args) + [str(output_path)]
+    return CompiledCommand(args=args, script_path=script_path)
@@ -0,0 +1,135 @@
+"""
+Progressive previews: playable while ffmpeg is still encoding.
+
+The composition is rendered in one pass (no intermediates to build first)
+with ultrafast/zerolatency x264 into an HLS event playlist of SEGMENT_S long
+fragmented-MP4 segments. A keyframe starts every segment, and ffmpeg only
+lists a segment once it is complete, so the editor can start playing after
+the first segment: natively where the browser plays HLS, otherwise by
+appending segments to a MediaSource.
+
+init.mp4 followed by every segment in order is itself a valid (fragmented)
+MP4, so a finished stream is also assembled into an ordinary preview file
+without another encode.
+"""
+import re
+import shutil
+from pathlib import Path
+from typing import Optional
+
+from concat import (
+    VideoClipSpec, CrossfadeSpec, AudioTrackSpec, SpeechClipSpec,
+    run_graph, ffprobe_duration_seconds, prepare_editor_audio, _prefetch_probes,
+)
+from ffmpeg_progress import ProgressCallback
+from graph_compiler import Composition, audio_only_duration, lower_composition, timeline_duration
+
+SEGMENT_S = 2
+PLAYLIST = "index.m3u8"
+INIT_SEGMENT = "init.mp4"
+SEGMENT_PATTERN = "seg_%05d.m4s"
+STREAM_FILE_RE = re.compile(r"^(index\.m3u8|init\.mp4|seg_\d{5}\.m4s)$")
+# RFC 6381 codec strings for what hls_output_args() produces (H.264 Main@3.1, AAC-LC)
+VIDEO_CODEC = "avc1.4d401f"
+AUDIO_CODEC = "mp4a.40.2"
+
+
+def hls_output_args(out_dir: Path, has_audio: bool, shortest: bool) -> list[str]:
+    args = [
+        "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency",
+        "-profile:v", "main", "-level:v", "3.1", "-pix_fmt", "yuv420p",
+        # A keyframe at every segment boundary, so each segment plays on its own
+        "-force_key_frames", f"expr:gte(t,n_forced*{SEGMENT_S})",
+    ]
+    if has_audio:
+        args += ["-c:a", "aac", "-b:a", "128k", "-ac", "2"]
+        if shortest:
+            args += ["-shortest"]
+    args += [
+        "-f", "hls",
+        "-hls_time", str(SEGMENT_S),
+        "-hls_list_size", "0",
+        "-hls_playlist_type", "event",
+        "-hls_segment_type", "fmp4",
+        "-hls_fmp4_init_filename", INIT_SEGMENT,
+        "-hls_segment_filename", str(out_dir / SEGMENT_PATTERN),
+        # Segments are written as .tmp and renamed once complete
+        "-hls_flags", "independent_segments+temp_file",
+    ]
+    return args
+
+
+def stream_duration(video_clips: list[VideoClipSpec], crossfade: Optional[CrossfadeSpec],
+                    audio_track: Optional[AudioTrackSpec], speech_clips: Optional[list[SpeechClipSpec]]) -> float:
+    """Expected length of a preview, to decide whether streaming it is worthwhile (0 if unknown)."""
+    try:
+        if video_clips:
+            return timeline_duration(video_clips, crossfade)
+        return audio_only_duration(audio_track, speech_clips)
+    except (OSError, ValueError):
+        return 0.0
+
+
+def render_hls(
+    video_clips: list[VideoClipSpec],
+    out_dir: Path,
+    crossfade: Optional[CrossfadeSpec] = None,
+    audio_track: Optional[AudioTrackSpec] = None,
+    speech_clips: Optional[list[SpeechClipSpec]] = None,
+    speech_volume: float = 1.0,
+    resolution: tuple[int, int] = (1280, 720),
+    audio_source: str = "editor",
+    progress_callback: Optional[ProgressCallback] = None,
+    on_start=None,
+) -> Path:
+    """Render a composition as a progressive HLS stream in out_dir; returns the playlist.
+
+    on_start(codecs) is called with the stream's codec string just before
+    ffmpeg starts, for players that need it up front (MediaSource).
+    """
+    if not video_clips and not audio_track and not speech_clips:
+        raise ValueError("Need at least 1 video clip or audio source")
+    _prefetch_probes(video_clips, audio_track, speech_clips)
+    for clip in video_clips:
+        if not clip.path.exists():
+            raise FileNotFoundError(clip.path)
+        if clip.duration_s == 0:
+            clip.duration_s = ffprobe_duration_seconds(clip.path)
+
+    comp = Composition(
+        video_clips=video_clips,
+        crossfade=crossfade,
+        audio_track=audio_track,
+        speech_clips=speech_clips,
+        speech_volume=speech_volume,
+        resolution=resolution,
+        audio_source=audio_source,
+    )
+    total = timeline_duration(video_clips, crossfade) if video_clips else audio_only_duration(audio_track, speech_clips)
+    prepare_editor_audio(comp, total)
+    graph, total_duration = lower_composition(comp)
+    has_audio = any(s.kind == "a" for s in graph.outputs)
+    # Same -shortest rule as concat_videos (EXP-015) and concat_audio_only
+    shortest = len(video_clips) <= 1
+
+    # Leftovers of an interrupted render of the same stream would be listed again
+    shutil.rmtree(out_dir, ignore_errors=True)
+    out_dir.mkdir(parents=True)
+    if on_start:
+        on_start(f"{VIDEO_CODEC},{AUDIO_CODEC}" if has_audio else VIDEO_CODEC)
+    playlist = out_dir / PLAYLIST
+    run_graph(graph, playlist, hls_output_args(out_dir, has_audio, shortest), total_duration, progress_callback)
+    return playlist
+
+
+def assemble_mp4(out_dir: Path, output_path: Path) -> Path:
+    """Concatenate a finished stream's init segment and media segments into one MP4."""
+    playlist = (out_dir / PLAYLIST).read_text(encoding="utf-8")
+    if "#EXT-X-ENDLIST" not in playlist:
+        raise RuntimeError(f"Stream in {out_dir} is not finished")
+    segments = [line.strip() for line in playlist.splitlines() if line.strip() and not line.startswith("#")]
+    with open(output_path, "wb") as out:
+        for name in [INIT_SEGMENT] + segments:
+            with open(out_dir / name, "rb") as f:
+                shutil.copyfileobj(f, out)
+    return output_path
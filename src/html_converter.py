@@ -6,14 +6,17 @@ EXP-020 v2: Added SLIDE_CONFIG parsing and audio extraction.
 import os
 import re
 import json
-import shutil
 import subprocess
 import tempfile
+import threading
 import base64
 from pathlib import Path
-from typing import Optional, Dict, Tuple
+from typing import Callable, Optional, Dict, List, Tuple
 from dataclasses import dataclass, field
 
+from browser_pool import browser_pool
+from scheduler import JobCancelled, raise_if_cancelled, tracked
+
 
 @dataclass
 class ConversionSettings:
@@ -24,6 +27,28 @@ class ConversionSettings:
     default_seconds_per_slide: int = 5
     max_slides: int = 50
     crf: int = 18  # Quality (lower = better, 18-23 is good)
+    # How to tell that a slide has rendered: 'auto' (the deck's window.__slideReady
+    # hook if it has one, else probes), 'probes', 'hook' or 'fixed' (the old sleeps)
+    ready_strategy: str = 'auto'
+    # Upper bounds for each readiness probe
+    network_idle_timeout_ms: int = 3000
+    fonts_timeout_ms: int = 2000
+    images_timeout_ms: int = 3000
+    dom_quiet_ms: int = 100  # No DOM mutations for this long counts as rendered
+    dom_quiet_timeout_ms: int = 2000
+    animations_timeout_ms: int = 1500
+    slide_ready_timeout_ms: int = 5000
+    # Pages capturing slides side by side; more than one needs a way to jump
+    # straight to a slide, see slide_addressing. Only their readiness waits
+    # overlap (screenshots are still taken one at a time) and each extra page
+    # is another renderer, so this stays 1 until a benchmark shows a speedup
+    capture_pages: int = 1
+    # How a page goes to a slide: 'auto' (window.goToSlide(i) if the deck has it,
+    # else ArrowRight on a single page), 'function', 'hash' (slide_hash) or 'keys'.
+    # 'hash' reloads the deck for every slide: a correctness fallback for decks
+    # that only read their slide from the URL, not a speedup
+    slide_addressing: str = 'auto'
+    slide_hash: str = '#{index}'  # URL fragment for 'hash' addressing; {index} is 0-based
 
 
 @dataclass
@@ -38,6 +63,10 @@ class ConversionResult:
     output_path: str = ""
     slide_durations: Dict[int, float] = field(default_factory=dict)
     has_audio: bool = False  # EXP-020 v2
+    ready_strategy: str = ""
+    ready_timeouts: Dict[str, int] = field(default_factory=dict)  # probe -> times it hit its bound
+    capture_pages: int = 0
+    slide_addressing: str = ""
 
 
 def extract_slide_config(html_content: str) -> Dict[int, float]:
@@ -277,6 +306,201 @@ def get_audio_duration(audio_path: Path) -> float:
     return 0.0
 
 
+def slide_video_filter(frame_counts: List[int], fps: int) -> str:
+    """
+    Video filter for slides piped in as one image each, with the last one sent twice.
+
+    setpts moves each image to the frame where its slide starts (the extra
+    last image to where the deck ends), fps fills the gaps by repeating
+    images, and trim drops the frame for that extra image. The result is
+    frame-identical to an image sequence with every slide's PNG repeated
+    for its frame count, at fps.
+    """
+    # Image N starts after the frames of slides 0..N-1
+    starts = '+'.join(f'gte(N,{i})*{n}' for i, n in enumerate(frame_counts, start=1))
+    return (f"setpts='({starts})/({fps}*TB)',fps={fps},trim=end_frame={sum(frame_counts)},"
+            'scale=trunc(iw/2)*2:trunc(ih/2)*2')
+
+
+# Hides the deck's own navigation (dots, counter, controls) in the capture
+HIDE_UI_JS = '''() => {
+    const style = document.createElement('style');
+    style.textContent = `
+        div[style*="border-top: 1px solid"] { display: none !important; }
+        div[style*="position: absolute"][style*="top: 8px"][style*="right: 12px"] { display: none !important; }
+        button { display: none !important; }
+    `;
+    document.head.appendChild(style);
+}'''
+
+READY_STRATEGIES = ('auto', 'probes', 'hook', 'fixed')
+SLIDE_ADDRESSING = ('auto', 'function', 'hash', 'keys')
+# What the 'fixed' strategy sleeps after loading, hiding the UI and each ArrowRight
+FIXED_WAITS_MS = {'load': 3000, 'style': 500, 'slide': 800}
+
+# Resolves once the page has settled; returns the names of probes that hit their bound.
+# Every probe ends at its bound, so nothing is left running in the page afterwards.
+READY_PROBE_JS = '''async (opts) => {
+    const timedOut = [];
+    const bounded = (name, ms, start) => new Promise(resolve => {
+        let finished = false;
+        const finish = (late) => {
+            if (finished) return;
+            finished = true;
+            clearTimeout(limit);
+            if (late) timedOut.push(name);
+            resolve();
+        };
+        const limit = setTimeout(() => finish(true), ms);
+        start(() => finish(false), () => finished);
+    });
+    const nextFrame = () => new Promise(r => requestAnimationFrame(() => r()));
+
+    if (opts.hook) {
+        // The deck signals readiness: __slideReady() returns a promise (or
+        // boolean), or __slideReady is a flag it sets to true
+        await bounded('slide-ready', opts.hookTimeout, (done, stopped) => {
+            if (typeof window.__slideReady === 'function') {
+                new Promise(r => r(window.__slideReady())).then(done, done);
+                return;
+            }
+            const poll = () => window.__slideReady === true ? done() : (stopped() || setTimeout(poll, 16));
+            poll();
+        });
+    } else if (opts.probes) {
+        // Re-rendering (e.g. React after a key press) has stopped changing the DOM
+        await bounded('dom-quiet', opts.quietTimeout, (done, stopped) => {
+            const observer = new MutationObserver(() => { clearTimeout(timer); timer = setTimeout(quiet, opts.quietMs); });
+            const quiet = () => { observer.disconnect(); done(); };
+            let timer = setTimeout(quiet, opts.quietMs);
+            observer.observe(document.documentElement, {subtree: true, childList: true, attributes: true, characterData: true});
+            const watch = () => stopped() ? (clearTimeout(timer), observer.disconnect()) : setTimeout(watch, 50);
+            watch();
+        });
+        await bounded('fonts', opts.fontsTimeout, done => {
+            document.fonts.ready.then(done, done);
+        });
+        await bounded('images', opts.imagesTimeout, done => {
+            const pending = Array.from(document.images).filter(img => !img.complete);
+            Promise.all(pending.map(img => new Promise(r => {
+                img.addEventListener('load', r, {once: true});
+                img.addEventListener('error', r, {once: true});
+            }))).then(done);
+        });
+        // Slide transitions; infinite animations never finish and are ignored
+        await bounded('animations', opts.animationsTimeout, done => {
+            const finite = document.getAnimations().filter(a => isFinite(a.effect?.getComputedTiming().endTime));
+            Promise.all(finite.map(a => a.finished.catch(() => null))).then(done);
+        });
+    }
+    // Two frames later the final state has been laid out and painted
+    await nextFrame();
+    await nextFrame();
+    return timedOut;
+}'''
+
+
+def resolve_ready_strategy(page, settings: ConversionSettings) -> str:
+    """The readiness strategy for a loaded page: settings.ready_strategy with 'auto' resolved."""
+    if settings.ready_strategy != 'auto':
+        return settings.ready_strategy
+    has_hook = page.evaluate("() => '__slideReady' in window")
+    return 'hook' if has_hook else 'probes'
+
+
+# Starts READY_PROBE_JS and keeps its promise on the page, so several pages can
+# probe at the same time and be collected afterwards
+START_READY_PROBE_JS = f'''(opts) => {{
+    window.__captureReady = ({READY_PROBE_JS})(opts);
+}}'''
+
+
+def wait_for_ready(pages: list, settings: ConversionSettings, strategy: str, phase: str,
+                   timeouts: Dict[str, int]) -> None:
+    """
+    Wait until every page has rendered after phase: 'load', 'style' (UI hidden) or 'slide'.
+
+    Probes: network idle (load only), a MutationObserver quiet period,
+    document.fonts.ready, pending images, finite animations and a
+    requestAnimationFrame double tick. With the 'hook' strategy the deck's
+    window.__slideReady replaces all but the last. Every probe gives up at
+    its bound from settings; each time one does is counted in timeouts.
+
+    The probes are started in every page before any is collected, so the
+    pages are waited for side by side (about as long as the slowest one).
+    """
+    if strategy == 'fixed':
+        if pages:
+            pages[0].wait_for_timeout(FIXED_WAITS_MS[phase])  # One sleep covers every page
+        return
+
+    if phase == 'load':
+        from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+        for page in pages:
+            try:
+                page.wait_for_load_state('networkidle', timeout=settings.network_idle_timeout_ms)
+            except PlaywrightTimeoutError:
+                timeouts['network-idle'] = timeouts.get('network-idle', 0) + 1
+
+    # A stylesheet change only needs the frames that apply it
+    settle = phase != 'style'
+    opts = {
+        'hook': settle and strategy == 'hook',
+        'probes': settle,
+        'hookTimeout': settings.slide_ready_timeout_ms,
+        'quietMs': settings.dom_quiet_ms,
+        'quietTimeout': settings.dom_quiet_timeout_ms,
+        'fontsTimeout': settings.fonts_timeout_ms,
+        'imagesTimeout': settings.images_timeout_ms,
+        'animationsTimeout': settings.animations_timeout_ms,
+    }
+    for page in pages:
+        page.evaluate(START_READY_PROBE_JS, opts)
+    for page in pages:
+        for name in page.evaluate('() => window.__captureReady'):
+            timeouts[name] = timeouts.get(name, 0) + 1
+
+
+def resolve_slide_addressing(page, settings: ConversionSettings) -> str:
+    """How to go to a slide in a loaded page: settings.slide_addressing with 'auto' resolved."""
+    if settings.slide_addressing != 'auto':
+        return settings.slide_addressing
+    has_function = page.evaluate("() => typeof window.goToSlide === 'function'")
+    return 'function' if has_function else 'keys'
+
+
+def open_deck(page, url: str) -> None:
+    """Load the deck at url in page as a new document, with its own UI hidden."""
+    page.goto(url, wait_until='load', timeout=60000)
+    page.evaluate(HIDE_UI_JS)
+
+
+def go_to_slide(page, settings: ConversionSettings, strategy: str, addressing: str,
+                file_url: str, current: int, target: int) -> str:
+    """
+    Move page from slide current to slide target (forwards only with 'keys').
+
+    A __slideReady flag is cleared first so the deck can set it again.
+    Returns the phase to wait for: 'load' after 'hash' addressing, which
+    loads the page again (slower than stepping; only for decks that need it),
+    else 'slide'.
+    """
+    if strategy == 'hook':
+        page.evaluate("() => { if (typeof window.__slideReady !== 'function') window.__slideReady = false; }")
+    if addressing == 'function':
+        page.evaluate('i => window.goToSlide(i)', target)
+    elif addressing == 'hash':
+        # A new document, not a hash change: decks may only read the hash at load
+        # (and going to a URL that differs only in its hash does not reload)
+        page.goto('about:blank')
+        open_deck(page, file_url + settings.slide_hash.format(index=target))
+        return 'load'
+    else:
+        for _ in range(target - current):
+            page.keyboard.press('ArrowRight')
+    return 'slide'
+
+
 def detect_current_slide(page) -> int:
     """Detect current slide number from the page."""
     try:
@@ -299,7 +523,8 @@ def convert_html_to_mp4(
     settings: Optional[ConversionSettings] = None,
     custom_durations: Optional[Dict[int, int]] = None,
     include_audio: bool = False,  # EXP-021: Default off
-    external_audio_path: Optional[Path] = None  # EXP-025: External audio file
+    external_audio_path: Optional[Path] = None,  # EXP-025: External audio file
+    progress_callback: Optional[Callable[[int, int], None]] = None
 ) -> ConversionResult:
     """
     Convert an HTML file to MP4 video with per-slide durations.
@@ -314,16 +539,22 @@ def convert_html_to_mp4(
                        Default is False (no audio).
         external_audio_path: EXP-025 - Path to external audio file (MP3/WAV).
                              If provided, this takes priority over HTML audio.
+        progress_callback: Called as (slides_captured, total_slides) after
+                           each screenshot is handed to the encoder.
 
     Returns:
         ConversionResult with details
     """
     if settings is None:
         settings = ConversionSettings()
+    if settings.ready_strategy not in READY_STRATEGIES:
+        return ConversionResult(success=False, error=f'Unknown ready_strategy: {settings.ready_strategy}')
+    if settings.slide_addressing not in SLIDE_ADDRESSING:
+        return ConversionResult(success=False, error=f'Unknown slide_addressing: {settings.slide_addressing}')
 
     # Import playwright here to avoid import errors if not installed
     try:
-        from playwright.sync_api import sync_playwright
+        import playwright.sync_api  # noqa: F401 (used by the browser pool)
     except ImportError:
         return ConversionResult(
             success=False,
@@ -380,159 +611,205 @@ def convert_html_to_mp4(
     if total_slides == -1:
         total_slides = settings.max_slides  # Fallback to max
 
-    # Create temp directory for frames
-    frame_dir = tempfile.mkdtemp(prefix='html2mp4_')
-
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-setuid-sandbox']
-            )
-            page = browser.new_page(viewport={
-                'width': settings.width,
-                'height': settings.height
-            })
-
-            # Load HTML file
-            file_url = f'file://{html_path.absolute()}'
-            page.goto(file_url, wait_until='load', timeout=60000)
-            page.wait_for_timeout(3000)  # Wait for React to render
-
-            # Hide UI elements (dots, counter, controls)
-            page.evaluate('''() => {
-                const style = document.createElement('style');
-                style.textContent = `
-                    div[style*="border-top: 1px solid"] { display: none !important; }
-                    div[style*="position: absolute"][style*="top: 8px"][style*="right: 12px"] { display: none !important; }
-                    button { display: none !important; }
-                `;
-                document.head.appendChild(style);
-            }''')
-            page.wait_for_timeout(500)
-
-            frame_index = 0
-            slides_captured = 0
-            actual_durations = {}
-
-            # Capture frames for each slide
-            while slides_captured < total_slides:
-                # Get duration for this slide (use custom or saved durations)
-                duration = durations_to_use.get(slides_captured, settings.default_seconds_per_slide)
-                actual_durations[slides_captured] = duration
-                num_frames = int(duration * settings.fps)  # EXP-020 v2: Convert to int
-
-                print(f"[INFO] Slide {slides_captured + 1}/{total_slides}: {duration}s ({num_frames} frames)")
-
-                # Take screenshot
-                frame_path = Path(frame_dir) / f'frame_{frame_index:05d}.png'
-                page.screenshot(path=str(frame_path), type='png')
-
-                # EXP-020 v4: Removed duplicate detection
-                # The old code stopped if two consecutive slides looked the same (e.g., both black).
-                # This caused the last slide to be skipped in presentations like:
-                #   [black, generated, black] - the final black slide was skipped.
-                # Now we always capture all slides based on total_slides count.
-
-                frame_index += 1
-
-                # Duplicate this frame for duration
-                for _ in range(num_frames - 1):
-                    dup_path = Path(frame_dir) / f'frame_{frame_index:05d}.png'
-                    shutil.copy(frame_path, dup_path)
-                    frame_index += 1
-
-                slides_captured += 1
-
-                # Navigate to next slide
-                if slides_captured < total_slides:
-                    page.keyboard.press('ArrowRight')
-                    page.wait_for_timeout(800)  # Wait for transition
-
-            browser.close()
+    if total_slides < 1:
+        return ConversionResult(
+            success=False,
+            error='No frames captured'
+        )
 
-        if frame_index == 0:
-            return ConversionResult(
-                success=False,
-                error='No frames captured'
-            )
+    # Every slide's frame count is known before capture, so ffmpeg can be
+    # started first and encode each screenshot as it is taken
+    actual_durations = {}
+    frame_counts = []
+    for slide in range(total_slides):
+        # Get duration for this slide (use custom or saved durations)
+        duration = durations_to_use.get(slide, settings.default_seconds_per_slide)
+        actual_durations[slide] = duration
+        # EXP-020 v2: Convert to int; a slide is always shown for at least one frame
+        frame_counts.append(max(1, int(duration * settings.fps)))
+    total_frames = sum(frame_counts)
+
+    slide_input = ['-f', 'image2pipe', '-c:v', 'png', '-framerate', str(settings.fps), '-i', 'pipe:0']
+    video_filter = slide_video_filter(frame_counts, settings.fps)
+
+    # Encode to MP4 with FFmpeg
+    # EXP-025: Include audio, use longest stream duration
+    if audio_temp_path and audio_temp_path.exists():
+        # Get audio duration to check if we need to extend video
+        audio_duration = get_audio_duration(audio_temp_path)
+        video_duration = total_frames / settings.fps
+
+        print(f"[INFO] Video duration: {video_duration:.1f}s, Audio duration: {audio_duration:.1f}s")
+
+        if audio_duration > video_duration:
+            # EXP-025: Audio is longer - use tpad to extend last frame
+            pad_duration = audio_duration - video_duration
+            print(f"[INFO] Extending video by {pad_duration:.1f}s to match audio")
 
-        # Encode to MP4 with FFmpeg
-        # EXP-025: Include audio, use longest stream duration
-        if audio_temp_path and audio_temp_path.exists():
-            # Get audio duration to check if we need to extend video
-            audio_duration = get_audio_duration(audio_temp_path)
-            video_duration = frame_index / settings.fps
-
-            print(f"[INFO] Video duration: {video_duration:.1f}s, Audio duration: {audio_duration:.1f}s")
-
-            if audio_duration > video_duration:
-                # EXP-025: Audio is longer - use tpad to extend last frame
-                pad_duration = audio_duration - video_duration
-                print(f"[INFO] Extending video by {pad_duration:.1f}s to match audio")
-
-                ffmpeg_cmd = [
-                    'ffmpeg', '-y',
-                    '-framerate', str(settings.fps),
-                    '-i', str(Path(frame_dir) / 'frame_%05d.png'),
-                    '-i', str(audio_temp_path),
-                    '-filter_complex',
-                    f'[0:v]scale=trunc(iw/2)*2:trunc(ih/2)*2,tpad=stop_mode=clone:stop_duration={pad_duration}[v]',
-                    '-map', '[v]',
-                    '-map', '1:a:0',
-                    '-c:v', 'libx264',
-                    '-c:a', 'aac',
-                    '-b:a', '192k',
-                    '-pix_fmt', 'yuv420p',
-                    '-preset', 'medium',
-                    '-crf', str(settings.crf),
-                    '-movflags', '+faststart',
-                    '-shortest',  # Now use shortest since we've extended video
-                    str(output_path)
-                ]
-            else:
-                # Video is longer or equal - standard muxing
-                ffmpeg_cmd = [
-                    'ffmpeg', '-y',
-                    '-framerate', str(settings.fps),
-                    '-i', str(Path(frame_dir) / 'frame_%05d.png'),
-                    '-i', str(audio_temp_path),
-                    '-c:v', 'libx264',
-                    '-c:a', 'aac',
-                    '-b:a', '192k',
-                    '-pix_fmt', 'yuv420p',
-                    '-preset', 'medium',
-                    '-crf', str(settings.crf),
-                    '-movflags', '+faststart',
-                    '-vf', 'scale=trunc(iw/2)*2:trunc(ih/2)*2',
-                    '-map', '0:v:0',
-                    '-map', '1:a:0',
-                    str(output_path)
-                ]
-
-            print(f"[INFO] Running FFmpeg with audio (longest stream wins)...")
+            ffmpeg_cmd = [
+                'ffmpeg', '-y',
+                *slide_input,
+                '-i', str(audio_temp_path),
+                '-filter_complex',
+                f'[0:v]{video_filter},tpad=stop_mode=clone:stop_duration={pad_duration}[v]',
+                '-map', '[v]',
+                '-map', '1:a:0',
+                '-c:v', 'libx264',
+                '-c:a', 'aac',
+                '-b:a', '192k',
+                '-pix_fmt', 'yuv420p',
+                '-preset', 'medium',
+                '-crf', str(settings.crf),
+                '-movflags', '+faststart',
+                '-shortest',  # Now use shortest since we've extended video
+                str(output_path)
+            ]
         else:
-            # Without audio: video only
+            # Video is longer or equal - standard muxing
             ffmpeg_cmd = [
                 'ffmpeg', '-y',
-                '-framerate', str(settings.fps),
-                '-i', str(Path(frame_dir) / 'frame_%05d.png'),
+                *slide_input,
+                '-i', str(audio_temp_path),
                 '-c:v', 'libx264',
+                '-c:a', 'aac',
+                '-b:a', '192k',
                 '-pix_fmt', 'yuv420p',
                 '-preset', 'medium',
                 '-crf', str(settings.crf),
                 '-movflags', '+faststart',
-                '-vf', 'scale=trunc(iw/2)*2:trunc(ih/2)*2',
+                '-vf', video_filter,
+                '-map', '0:v:0',
+                '-map', '1:a:0',
                 str(output_path)
             ]
-            print(f"[INFO] Running FFmpeg (no audio)...")
 
-        result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True)
+        print(f"[INFO] Encoding with audio (longest stream wins)...")
+    else:
+        # Without audio: video only
+        ffmpeg_cmd = [
+            'ffmpeg', '-y',
+            *slide_input,
+            '-c:v', 'libx264',
+            '-pix_fmt', 'yuv420p',
+            '-preset', 'medium',
+            '-crf', str(settings.crf),
+            '-movflags', '+faststart',
+            '-vf', video_filter,
+            str(output_path)
+        ]
+        print(f"[INFO] Encoding without audio...")
+
+    ready_timeouts: Dict[str, int] = {}
+    capture_info = {}  # How the deck was captured, for the result
+
+    def capture(browser) -> Tuple[int, int, bytes]:
+        """Capture the deck in a fresh context of a pooled browser, piping it to ffmpeg."""
+        context = browser.new_context(viewport={
+            'width': settings.width,
+            'height': settings.height
+        })
+        try:
+            # Load HTML file
+            file_url = f'file://{html_path.absolute()}'
+
+            def open_page():
+                page = context.new_page()
+                open_deck(page, file_url)
+                return page
+
+            pages = [open_page()]
+            strategy = resolve_ready_strategy(pages[0], settings)
+            addressing = resolve_slide_addressing(pages[0], settings)
+            # Stepping several pages with ArrowRight relies on the deck taking
+            # quick key presses, so that is only done when asked for
+            page_count = settings.capture_pages if addressing != 'keys' or settings.slide_addressing == 'keys' else 1
+            page_count = max(1, min(page_count, total_slides))
+            pages += [open_page() for _ in range(page_count - 1)]
+            capture_info.update(ready_strategy=strategy, slide_addressing=addressing, capture_pages=page_count)
+            print(f"[INFO] Capturing with {page_count} page(s), addressing={addressing}, ready={strategy}")
+
+            wait_for_ready(pages, settings, strategy, 'load', ready_timeouts)  # Wait for React to render
+            wait_for_ready(pages, settings, strategy, 'style', ready_timeouts)
+
+            slides_captured = 0
+
+            # Screenshots go straight to ffmpeg's stdin; nothing is written to disk
+            proc = subprocess.Popen(ffmpeg_cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.PIPE)
+            with tracked(proc):  # Killed if the conversion job is cancelled
+                # stderr is drained on a thread so a chatty encoder can't block the pipe
+                stderr = []
+                drain = threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)
+                drain.start()
+                try:
+                    positions = [0] * len(pages)  # Slide each page is on
+                    while slides_captured < total_slides:
+                        # Page j takes slide slides_captured + j, so screenshots
+                        # come back in slide order and go straight to ffmpeg
+                        batch = list(range(slides_captured, min(slides_captured + len(pages), total_slides)))
+                        moved = []
+                        phase = 'slide'
+                        for page_index, slide in enumerate(batch):
+                            if positions[page_index] != slide:
+                                phase = go_to_slide(pages[page_index], settings, strategy, addressing,
+                                                    file_url, positions[page_index], slide)
+                                positions[page_index] = slide
+                                moved.append(pages[page_index])
+                        # The pages render, and are probed, at the same time
+                        wait_for_ready(moved, settings, strategy, phase, ready_timeouts)  # Wait for transition
+
+                        # Capture one screenshot per slide; with the sync API these
+                        # are taken one after another, only the waits overlap
+                        for page_index, slide in enumerate(batch):
+                            # On cancel, closing the context stops the pages; the browser stays warm
+                            raise_if_cancelled()
+
+                            duration = actual_durations[slide]
+                            num_frames = frame_counts[slide]
+                            print(f"[INFO] Slide {slide + 1}/{total_slides}: {duration}s ({num_frames} frames)")
+
+                            # Take screenshot
+                            png = pages[page_index].screenshot(type='png')
+
+                            # EXP-020 v4: Removed duplicate detection
+                            # The old code stopped if two consecutive slides looked the same (e.g., both black).
+                            # This caused the last slide to be skipped in presentations like:
+                            #   [black, generated, black] - the final black slide was skipped.
+                            # Now we always capture all slides based on total_slides count.
+
+                            # Sent once and held for num_frames by video_filter; the
+                            # last slide is sent twice so its end has a timestamp
+                            proc.stdin.write(png)
+                            if slide == total_slides - 1:
+                                proc.stdin.write(png)
+
+                            slides_captured += 1
+                            if progress_callback:
+                                progress_callback(slides_captured, total_slides)
+
+                    proc.stdin.close()
+                except BrokenPipeError:
+                    pass  # ffmpeg exited early; its stderr is reported below
+                except BaseException:
+                    proc.kill()
+                    proc.wait()
+                    raise
+                proc.wait()
+                drain.join()
+
+            return slides_captured, proc.returncode, b''.join(stderr)
+        finally:
+            context.close()
+
+    try:
+        slides_captured, returncode, stderr = browser_pool.run(capture)
+        if ready_timeouts:
+            print(f"[INFO] Readiness probes that hit their bound: {ready_timeouts}")
 
-        if result.returncode != 0:
+        if returncode != 0:
             return ConversionResult(
                 success=False,
-                error=f'FFmpeg failed: {result.stderr[:500]}'
+                error=f"FFmpeg failed: {stderr.decode('utf-8', 'replace')[:500]}"
             )
 
         # Get output file size and actual duration
@@ -541,24 +818,29 @@ def convert_html_to_mp4(
         # EXP-025: Get actual output duration (might be extended for audio)
         actual_duration = get_audio_duration(output_path)  # Works for video too
         if actual_duration == 0:
-            actual_duration = frame_index / settings.fps  # Fallback
+            actual_duration = total_frames / settings.fps  # Fallback
         duration_s = actual_duration
 
         # EXP-025: Check if audio was included (either external or extracted)
         has_audio = audio_temp_path is not None and audio_temp_path.exists()
-        print(f"[INFO] Done! {slides_captured} slides, {duration_s:.1f}s, {size_mb:.1f} MB, audio={has_audio}")
+        print(f"[INFO] Done! {slides_captured} slides, {duration_s:.1f}s, {size_mb:.1f} MB, audio={has_audio}, "
+              f"pages={capture_info['capture_pages']}, ready={capture_info['ready_strategy']}")
 
         return ConversionResult(
             success=True,
             slides=slides_captured,
-            frames=frame_index,
+            frames=total_frames,
             duration_s=duration_s,
             size_mb=round(size_mb, 2),
             output_path=str(output_path),
             slide_durations=actual_durations,
-            has_audio=has_audio
+            has_audio=has_audio,
+            ready_timeouts=ready_timeouts,
+            **capture_info
         )
 
+    except JobCancelled:
+        raise
     except Exception as e:
         import traceback
         return ConversionResult(
@@ -566,8 +848,7 @@ def convert_html_to_mp4(
             error=f'{str(e)}\n{traceback.format_exc()}'
         )
     finally:
-        # Cleanup temp directory and extracted audio (but NOT external audio)
-        shutil.rmtree(frame_dir, ignore_errors=True)
+        # Cleanup extracted audio (but NOT external audio)
         # EXP-025: Only delete audio if it was extracted from HTML (not external)
         if audio_temp_path and audio_temp_path.exists() and not audio_is_external:
             try:
@@ -0,0 +1,168 @@
+"""
+Incremental preview rendering over cached per-clip intermediates.
+
+Each clip is normalized once into an intermediate that is already trimmed,
+scaled/padded to the preview resolution, 30 fps and yuv420p (near-lossless
+ultrafast H.264, video only). Intermediates are keyed by source content hash +
+trim points + resolution, so changing one trim only re-normalizes that clip.
+The preview itself is then a cheap xfade/concat pass over the intermediates
+(veryfast x264, since it is only watched and then thrown away), with the audio
+taken from the original sources exactly as concat_videos does.
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from concat import (
+    VideoClipSpec, CrossfadeSpec, AudioTrackSpec, SpeechClipSpec,
+    run_graph, ffprobe_duration_seconds, prepare_editor_audio, _prefetch_probes,
+)
+from ffmpeg_progress import ProgressCallback
+from graph_compiler import Composition, FilterGraph, lower_audio, lower_video_timeline
+from media_cache import CacheDir, content_hash
+from scheduler import bind_job
+
+DEFAULT_INTERMEDIATE_DIR = Path(__file__).parent.parent / "cache" / "intermediates"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_MAX_AGE_S = 24 * 3600
+BUILD_WORKERS = 4
+# The final pass only feeds the preview player; the export re-renders from sources
+PREVIEW_PRESET = "veryfast"
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters for one preview render."""
+    hits: int = 0
+    misses: int = 0
+    built: list[int] = field(default_factory=list)  # Indices of re-normalized clips
+
+    def as_dict(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'rebuilt_clips': self.built}
+
+
+class IntermediateCache:
+    """Normalized per-clip intermediates with size + age eviction."""
+
+    def __init__(self, cache_dir: Path = DEFAULT_INTERMEDIATE_DIR,
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_age_s: float = DEFAULT_MAX_AGE_S):
+        self.cache = CacheDir(cache_dir, max_bytes=max_bytes, max_age_s=max_age_s)
+        self.total_hits = 0
+        self.total_misses = 0
+        self._lock = threading.Lock()
+
+    def _name(self, clip: VideoClipSpec, resolution: tuple[int, int]) -> str:
+        key = f"{content_hash(clip.path)}|{clip.trim_start:.3f}|{clip.trimmed_duration:.3f}|{resolution[0]}x{resolution[1]}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest() + ".mp4"
+
+    def _build(self, clip: VideoClipSpec, resolution: tuple[int, int], out_path: Path) -> None:
+        graph = FilterGraph()
+        video, _, _ = lower_video_timeline(graph, [clip], None, resolution, normalize=True)
+        graph.map(video)
+        tmp_path = out_path.with_name(f"{out_path.name}.{threading.get_ident()}.tmp")
+        try:
+            run_graph(graph, tmp_path, [
+                "-c:v", "libx264", "-preset", "ultrafast", "-crf", "10", "-g", "30", "-f", "mp4",
+            ])
+            os.replace(tmp_path, out_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def get_or_build(self, clip: VideoClipSpec, resolution: tuple[int, int]) -> tuple[Path, bool]:
+        """Return (intermediate path, was_cache_hit)."""
+        name = self._name(clip, resolution)
+        existing = self.cache.lookup(name)
+        if existing:
+            with self._lock:
+                self.total_hits += 1
+            return existing, True
+        out_path = self.cache.path_for(name)
+        self._build(clip, resolution, out_path)
+        with self._lock:
+            self.total_misses += 1
+        return out_path, False
+
+    def prepare(self, video_clips: list[VideoClipSpec], resolution: tuple[int, int]) -> tuple[list[Path], CacheStats]:
+        """Get intermediates for all clips, building misses in parallel."""
+        stats = CacheStats()
+        workers = max(1, min(BUILD_WORKERS, len(video_clips)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(bind_job(lambda c: self.get_or_build(c, resolution)), video_clips))
+        paths = []
+        for i, (path, hit) in enumerate(results):
+            paths.append(path)
+            if hit:
+                stats.hits += 1
+            else:
+                stats.misses += 1
+                stats.built.append(i)
+        self.cache.evict(keep=set(paths))
+        return paths, stats
+
+
+intermediate_cache = IntermediateCache(
+    max_bytes=int(os.environ.get("INTERMEDIATE_CACHE_BYTES", DEFAULT_MAX_BYTES)),
+    max_age_s=float(os.environ.get("INTERMEDIATE_CACHE_MAX_AGE_S", DEFAULT_MAX_AGE_S)),
+)
+
+
+def render_preview_incremental(
+    video_clips: list[VideoClipSpec],
+    output_path: Path,
+    crossfade: Optional[CrossfadeSpec] = None,
+    audio_track: Optional[AudioTrackSpec] = None,
+    speech_clips: Optional[list[SpeechClipSpec]] = None,
+    speech_volume: float = 1.0,
+    resolution: tuple[int, int] = (1280, 720),
+    audio_source: str = "editor",
+    cache: Optional[IntermediateCache] = None,
+    progress_callback: Optional[ProgressCallback] = None,
+) -> CacheStats:
+    """Render a preview from cached intermediates; returns the cache stats.
+
+    Same picture as concat_videos for the same arguments (encoded with a faster
+    preset), except that a single clip is also normalized to 30 fps.
+    """
+    if not video_clips:
+        raise ValueError("Incremental preview needs at least one video clip")
+    cache = cache or intermediate_cache
+
+    _prefetch_probes(video_clips, audio_track, speech_clips)
+    for clip in video_clips:
+        if not clip.path.exists():
+            raise FileNotFoundError(clip.path)
+        if clip.duration_s == 0:
+            clip.duration_s = ffprobe_duration_seconds(clip.path)
+
+    paths, stats = cache.prepare(video_clips, resolution)
+    normalized = [VideoClipSpec(path=p, duration_s=c.trimmed_duration) for p, c in zip(paths, video_clips)]
+
+    graph = FilterGraph()
+    video, _, total_duration = lower_video_timeline(graph, normalized, crossfade, resolution)
+    graph.map(video)
+    comp = Composition(
+        video_clips=video_clips,
+        audio_track=audio_track,
+        speech_clips=speech_clips,
+        speech_volume=speech_volume,
+        audio_source=audio_source,
+    )
+    prepare_editor_audio(comp, total_duration)
+    # Intermediates are video only - clip audio is read from the sources
+    clip_inputs = [graph.add_media_input(c.path) for c in video_clips] if audio_source != "none" else []
+    audio = lower_audio(graph, comp, clip_inputs, total_duration)
+
+    output_args = ["-c:v", "libx264", "-preset", PREVIEW_PRESET, "-crf", "23", "-movflags", "+faststart"]
+    if audio is not None:
+        graph.map(audio)
+        output_args += ["-c:a", "aac", "-b:a", "192k"]
+        # Same -shortest rule as concat_videos (EXP-015)
+        if len(video_clips) == 1:
+            output_args += ["-shortest"]
+    run_graph(graph, output_path, output_args, total_duration, progress_callback)
+    return stats
@@ -0,0 +1,310 @@
+"""
+Job records for exports and HTML conversions.
+
+A job is a dict of status fields (status, progress, message, ...) plus the
+request payload it was started from. Two backends share one interface:
+
+- SqliteJobStore (default): one row per job in a WAL-mode SQLite file, so
+  every worker process sees every job and records survive restarts. Updates
+  are read-modify-write in an IMMEDIATE transaction (atomic across
+  processes); status and kind are indexed.
+- MemoryJobStore: an in-process dict, for tests and single-process setups.
+
+Every create/update bumps a change counter; wait_for_change() blocks on it,
+which is what the server-sent event streams in app.py sleep on.
+
+Finished jobs are pruned after a TTL. Each process owns the jobs it runs and
+heartbeats; active jobs whose owner stopped heartbeating (crash, restart)
+are recovered by the next process to look: queued ones are re-queued from
+their payload, running ones are marked failed (their output is partial).
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+
+ACTIVE_STATUSES = ("queued", "processing")
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+DEFAULT_DB_PATH = Path(__file__).parent.parent / "cache" / "jobs.sqlite3"
+DEFAULT_TTL_S = 7 * 24 * 3600
+HEARTBEAT_S = 10.0
+# Updates made by other processes only show up when a waiter re-reads, so
+# wait_for_change() never sleeps longer than this
+CHANGE_POLL_S = 0.5
+STALE_AFTER_S = 3 * HEARTBEAT_S
+INTERRUPTED_ERROR = "Interrupted: the server stopped while this job was running"
+
+RequeueHandler = Callable[[dict], None]
+
+
+class MemoryJobStore:
+    """Jobs in a dict guarded by a lock (this process only)."""
+
+    def __init__(self, ttl_s: float = DEFAULT_TTL_S):
+        self.ttl_s = ttl_s
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._jobs: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self.version = 0
+
+    def _notify(self) -> None:
+        with self._changed:
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait_for_change(self, version: int, timeout: float = CHANGE_POLL_S) -> int:
+        """Block until a job changes after version (or timeout); returns the new version.
+
+        Changes made in this process wake the caller immediately; ones made by
+        other processes are picked up when the caller re-reads after timeout.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout=min(timeout, CHANGE_POLL_S))
+            return self.version
+
+    def create(self, job_id: str, kind: str, fields: dict, payload: Optional[dict] = None) -> dict:
+        record = {**fields, 'id': job_id, 'kind': kind, 'payload': payload,
+                  'status': fields.get('status', 'queued'), 'finished_ts': None}
+        with self._lock:
+            self._jobs[job_id] = record
+        self._notify()
+        return dict(record)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            record = self._jobs.get(job_id)
+            return dict(record) if record else None
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        """Merge fields into the job; returns the updated record (None if unknown)."""
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                return None
+            record.update(fields)
+            if record['status'] in FINISHED_STATUSES and record['finished_ts'] is None:
+                record['finished_ts'] = time.time()
+            record = dict(record)
+        self._notify()
+        return record
+
+    def find(self, kind: Optional[str] = None, status: Optional[str] = None,
+             session: Optional[str] = None) -> list[dict]:
+        """Jobs matching every given filter, oldest first."""
+        with self._lock:
+            return [dict(r) for r in self._jobs.values()
+                    if (kind is None or r['kind'] == kind) and (status is None or r['status'] == status)
+                    and (session is None or r.get('session') == session)]
+
+    def prune(self) -> int:
+        """Drop finished jobs older than the TTL; returns how many."""
+        cutoff = time.time() - self.ttl_s
+        with self._lock:
+            expired = [k for k, r in self._jobs.items() if r['finished_ts'] and r['finished_ts'] < cutoff]
+            for k in expired:
+                del self._jobs[k]
+        return len(expired)
+
+    def recover(self, requeue: dict[str, RequeueHandler]) -> int:
+        """Nothing outlives this process, so there is nothing to recover."""
+        return 0
+
+    def start_maintenance(self, requeue: dict[str, RequeueHandler]) -> None:
+        """Prune finished jobs periodically in a background thread."""
+        def run():
+            while True:
+                time.sleep(HEARTBEAT_S)
+                try:
+                    self.prune()
+                except Exception as e:
+                    print(f"[WARN] Job store maintenance failed: {e}")
+
+        threading.Thread(target=run, daemon=True, name="jobstore-maintenance").start()
+
+
+class SqliteJobStore(MemoryJobStore):
+    """Jobs in a shared SQLite database (WAL), one connection per thread."""
+
+    def __init__(self, path: Path = DEFAULT_DB_PATH, ttl_s: float = DEFAULT_TTL_S):
+        super().__init__(ttl_s)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        # executescript manages its own transaction
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                owner TEXT,
+                session TEXT,
+                data TEXT NOT NULL,
+                payload TEXT,
+                created_ts REAL NOT NULL,
+                updated_ts REAL NOT NULL,
+                finished_ts REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, kind);
+            CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_ts) WHERE finished_ts IS NOT NULL;
+            CREATE TABLE IF NOT EXISTS owners (
+                owner TEXT PRIMARY KEY,
+                heartbeat_ts REAL NOT NULL
+            );
+        """)
+        db = self._connection()
+        if "session" not in {r["name"] for r in db.execute("PRAGMA table_info(jobs)")}:
+            db.execute("ALTER TABLE jobs ADD COLUMN session TEXT")  # Databases from before session streams
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_session ON jobs (session) WHERE session IS NOT NULL")
+        self.heartbeat()
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _tx(self):
+        """An IMMEDIATE transaction: takes the write lock up front, so read-modify-write is atomic."""
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    @staticmethod
+    def _record(row: sqlite3.Row) -> dict:
+        return {
+            **json.loads(row["data"]),
+            'id': row["id"],
+            'kind': row["kind"],
+            'status': row["status"],
+            'payload': json.loads(row["payload"]) if row["payload"] else None,
+            'finished_ts': row["finished_ts"],
+        }
+
+    def create(self, job_id: str, kind: str, fields: dict, payload: Optional[dict] = None) -> dict:
+        fields = dict(fields)
+        status = fields.pop('status', 'queued')
+        now = time.time()
+        with self._tx() as db:
+            db.execute(
+                "INSERT INTO jobs (id, kind, status, owner, session, data, payload, created_ts, updated_ts)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, status, self.owner, fields.get('session'), json.dumps(fields),
+                 json.dumps(payload) if payload is not None else None, now, now),
+            )
+        self._notify()
+        return {**fields, 'id': job_id, 'kind': kind, 'status': status, 'payload': payload, 'finished_ts': None}
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._record(row) if row else None
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        now = time.time()
+        with self._tx() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            data = json.loads(row["data"])
+            status = fields.pop('status', row["status"])
+            data.update(fields)
+            finished_ts = row["finished_ts"]
+            if status in FINISHED_STATUSES and finished_ts is None:
+                finished_ts = now
+            db.execute(
+                "UPDATE jobs SET status = ?, data = ?, updated_ts = ?, finished_ts = ? WHERE id = ?",
+                (status, json.dumps(data), now, finished_ts, job_id),
+            )
+        self._notify()
+        record = self._record(row)
+        record.update(data, status=status, finished_ts=finished_ts)
+        return record
+
+    def find(self, kind: Optional[str] = None, status: Optional[str] = None,
+             session: Optional[str] = None) -> list[dict]:
+        where, args = [], []
+        if status is not None:
+            where.append("status = ?")
+            args.append(status)
+        if kind is not None:
+            where.append("kind = ?")
+            args.append(kind)
+        if session is not None:
+            where.append("session = ?")
+            args.append(session)
+        sql = "SELECT * FROM jobs" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY created_ts"
+        return [self._record(row) for row in self._connection().execute(sql, args)]
+
+    def prune(self) -> int:
+        with self._tx() as db:
+            return db.execute("DELETE FROM jobs WHERE finished_ts < ?", (time.time() - self.ttl_s,)).rowcount
+
+    def heartbeat(self) -> None:
+        with self._tx() as db:
+            db.execute("INSERT OR REPLACE INTO owners (owner, heartbeat_ts) VALUES (?, ?)", (self.owner, time.time()))
+
+    def recover(self, requeue: dict[str, RequeueHandler]) -> int:
+        """Take over active jobs of owners that stopped heartbeating; returns how many."""
+        cutoff = time.time() - STALE_AFTER_S
+        placeholders = ", ".join("?" for _ in ACTIVE_STATUSES)
+        with self._tx() as db:
+            live = {r["owner"] for r in db.execute("SELECT owner FROM owners WHERE heartbeat_ts >= ?", (cutoff,))}
+            live.add(self.owner)
+            orphans = [
+                self._record(row) for row in db.execute(
+                    f"SELECT * FROM jobs WHERE status IN ({placeholders})", ACTIVE_STATUSES)
+                if row["owner"] not in live
+            ]
+            # Claim them inside the same transaction so only one process recovers each job
+            db.executemany("UPDATE jobs SET owner = ? WHERE id = ?", [(self.owner, j['id']) for j in orphans])
+            db.execute("DELETE FROM owners WHERE heartbeat_ts < ?", (cutoff,))
+
+        for job in orphans:
+            handler = requeue.get(job['kind'])
+            if job['status'] == 'queued' and handler and job['payload'] is not None:
+                try:
+                    handler(job)
+                    print(f"[INFO] Re-queued {job['kind']} job {job['id']} after restart")
+                    continue
+                except Exception as e:
+                    print(f"[WARN] Could not re-queue job {job['id']}: {e}")
+            self.update(job['id'], status='failed', error=INTERRUPTED_ERROR, message=INTERRUPTED_ERROR)
+        return len(orphans)
+
+    def start_maintenance(self, requeue: dict[str, RequeueHandler]) -> None:
+        """Heartbeat, recover orphaned jobs and prune finished ones in a background thread."""
+        def run():
+            while True:
+                time.sleep(HEARTBEAT_S)
+                try:
+                    self.heartbeat()
+                    self.recover(requeue)
+                    self.prune()
+                except Exception as e:
+                    print(f"[WARN] Job store maintenance failed: {e}")
+
+        threading.Thread(target=run, daemon=True, name="jobstore-maintenance").start()
+
+
+def open_job_store() -> MemoryJobStore:
+    """The store selected by JOB_STORE ("sqlite", default, or "memory")."""
+    ttl_s = float(os.environ.get("JOB_TTL_S", DEFAULT_TTL_S))
+    if os.environ.get("JOB_STORE", "sqlite") == "memory":
+        return MemoryJobStore(ttl_s=ttl_s)
+    return SqliteJobStore(Path(os.environ.get("JOB_DB_PATH", DEFAULT_DB_PATH)), ttl_s=ttl_s)
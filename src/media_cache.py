@@ -0,0 +1,128 @@
+"""
+Shared helpers for derived-media caches (proxies, intermediates, ...).
+
+- file_fingerprint(): identifies a file by resolved path + size + mtime.
+- content_hash(): identifies a source file by its full content, so the same
+  media uploaded twice (under different unique names) shares derived files,
+  and two different files never do.
+- CacheDir: a directory of derived files with LRU eviction under a disk quota
+  and an optional maximum age. File mtime is used as the "last used" time.
+"""
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+# Files are read in chunks of this size; the whole file is hashed once per
+# fingerprint (uploads hash it right after saving, so later keys are lookups)
+HASH_BLOCK_SIZE = 1024 * 1024
+
+_hash_memo: dict[str, str] = {}
+_hash_lock = threading.Lock()
+
+
+def file_fingerprint(path: Path) -> str:
+    """Cache key for a file: hash of resolved path + size + mtime."""
+    path = Path(path)
+    st = path.stat()
+    key = f"{path.resolve()}|{st.st_size}|{st.st_mtime_ns}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def content_hash(path: Path) -> str:
+    """Return a content hash for path (memoized per path + size + mtime)."""
+    path = Path(path)
+    fingerprint = file_fingerprint(path)
+    with _hash_lock:
+        cached = _hash_memo.get(fingerprint)
+    if cached:
+        return cached
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_BLOCK_SIZE):
+            h.update(chunk)
+    digest = h.hexdigest()[:32]
+
+    with _hash_lock:
+        _hash_memo[fingerprint] = digest
+    return digest
+
+
+class CacheDir:
+    """A directory of cached files, evicted least-recently-used first."""
+
+    def __init__(self, root: Path, max_bytes: Optional[int] = None, max_age_s: Optional[float] = None):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self._lock = threading.Lock()
+
+    def path_for(self, name: str) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        return self.root / name
+
+    def lookup(self, name: str) -> Optional[Path]:
+        """Return the cached file if present, marking it as recently used."""
+        path = self.root / name
+        if not path.exists():
+            return None
+        self.touch(path)
+        return path
+
+    @staticmethod
+    def touch(path: Path) -> None:
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def entries(self) -> list[Path]:
+        if not self.root.exists():
+            return []
+        return [p for p in self.root.iterdir() if p.is_file() and not p.name.endswith(".tmp")]
+
+    def size_bytes(self) -> int:
+        total = 0
+        for p in self.entries():
+            try:
+                total += p.stat().st_size
+            except OSError:
+                pass
+        return total
+
+    def evict(self, keep: Optional[set] = None) -> int:
+        """Remove expired files, then least recently used ones until under quota.
+
+        Files in keep (e.g. ones being read right now) are never removed.
+        Returns the number of removed files.
+        """
+        keep = {Path(p) for p in keep or ()}
+        removed = 0
+        with self._lock:
+            stats = []
+            for p in self.entries():
+                try:
+                    stats.append((p, p.stat()))
+                except OSError:
+                    continue
+            stats.sort(key=lambda item: item[1].st_mtime)  # Oldest use first
+
+            now = time.time()
+            total = sum(st.st_size for _, st in stats)
+            for p, st in stats:
+                if p in keep:
+                    continue
+                expired = self.max_age_s is not None and now - st.st_mtime > self.max_age_s
+                over_quota = self.max_bytes is not None and total > self.max_bytes
+                if not expired and not over_quota:
+                    continue
+                try:
+                    p.unlink()
+                    total -= st.st_size
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
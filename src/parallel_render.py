@@ -0,0 +1,306 @@
+"""
+Segment-parallel export: split the timeline across CPU cores.
+
+The output timeline is cut into segments of roughly segment_s seconds. Cuts are
+only placed inside clip bodies (never inside a crossfade window), so every
+transition is rendered whole by exactly one segment. Each segment is rendered by
+its own ffmpeg process (trims + xfades that fall inside it) with identical
+encoder settings, the segments are joined losslessly with the concat demuxer,
+and the audio mix is rendered once and muxed at the end.
+
+Batched mode (large timelines) cuts every batch_size clips instead of every
+segment_s seconds, so each ffmpeg process opens at most batch_size + 1 inputs
+no matter how many clips the timeline has. Cuts inside clip bodies mean batch
+boundaries never split a transition, and the join is a stream copy, so no
+batch is re-encoded a second time.
+"""
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from concat import (
+    VideoClipSpec, CrossfadeSpec, AudioTrackSpec, SpeechClipSpec,
+    MAX_OPEN_INPUTS, run_graph, mux_audio, join_with_concat_demuxer,
+)
+from ffmpeg_progress import ProgressCallback, ProgressTracker
+from graph_compiler import FilterGraph, lower_video_timeline
+from scheduler import bind_job
+
+DEFAULT_SEGMENT_S = 30.0
+DEFAULT_BATCH_SIZE = MAX_OPEN_INPUTS
+FRAME_S = 1.0 / 30
+# Keep cuts this far away from crossfade windows and clip edges
+CUT_MARGIN_S = 0.5
+
+
+@dataclass
+class TimelineSegment:
+    """A slice [start, end) of the output timeline and the clip parts it renders."""
+    start: float
+    end: float
+    clips: list[VideoClipSpec]
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def _xfade_duration(video_clips: list[VideoClipSpec], crossfade: Optional[CrossfadeSpec]) -> float:
+    return (crossfade.duration_s if crossfade else 1.0) if len(video_clips) > 1 else 0.0
+
+
+def _clip_bodies(
+    video_clips: list[VideoClipSpec],
+    crossfade: Optional[CrossfadeSpec],
+    margin_s: float = CUT_MARGIN_S,
+) -> list[tuple[float, float]]:
+    """Allowed cut range on the output timeline for each clip: (lo, hi), empty if hi <= lo.
+
+    A cut must be inside the clip body, at least margin_s away from any
+    crossfade window.
+    """
+    xfade_dur = _xfade_duration(video_clips, crossfade)
+    trimmed = [c.trimmed_duration for c in video_clips]
+    offsets = _clip_offsets(trimmed, xfade_dur)
+    last = len(video_clips) - 1
+    bodies = []
+    for i, (off, dur) in enumerate(zip(offsets, trimmed)):
+        lo = off + (xfade_dur if i > 0 else 0.0) + margin_s
+        hi = off + dur - (xfade_dur if i < last else 0.0) - margin_s
+        bodies.append((lo, hi))
+    return bodies
+
+
+def _clip_offsets(trimmed: list[float], xfade_dur: float) -> list[float]:
+    """Output-timeline start of each clip."""
+    offsets = []
+    t = 0.0
+    for dur in trimmed:
+        offsets.append(t)
+        t += dur - xfade_dur
+    return offsets
+
+
+def _snap(t: float) -> float:
+    return round(t / FRAME_S) * FRAME_S
+
+
+def choose_cut_points(
+    video_clips: list[VideoClipSpec],
+    crossfade: Optional[CrossfadeSpec],
+    segment_s: float = DEFAULT_SEGMENT_S,
+) -> list[float]:
+    """Pick output-timeline cut points roughly every segment_s seconds.
+
+    A cut is only allowed inside a clip body, at least CUT_MARGIN_S away from
+    any crossfade window; targets that land elsewhere move to the nearest
+    allowed position, and are dropped if there is none before the next target.
+    """
+    xfade_dur = _xfade_duration(video_clips, crossfade)
+    trimmed = [c.trimmed_duration for c in video_clips]
+    total = _clip_offsets(trimmed, xfade_dur)[-1] + trimmed[-1]
+    bodies = [(lo, hi) for lo, hi in _clip_bodies(video_clips, crossfade) if hi > lo]
+
+    cuts = []
+    target = segment_s
+    while target < total - segment_s / 2:
+        best = None
+        for lo, hi in bodies:
+            candidate = min(max(target, lo), hi)
+            if best is None or abs(candidate - target) < abs(best - target):
+                best = candidate
+        if best is None:
+            break
+        best = _snap(best)
+        if (not cuts or best - cuts[-1] >= segment_s / 2) and best < total - FRAME_S:
+            cuts.append(best)
+        target += segment_s
+    return cuts
+
+
+def choose_batch_cut_points(
+    video_clips: list[VideoClipSpec],
+    crossfade: Optional[CrossfadeSpec],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> list[float]:
+    """Cut after every batch_size clips, in the middle of the last clip's body.
+
+    If that clip is too short to cut, earlier clips of the batch are tried, so
+    a segment never holds more than batch_size + 1 clip parts. Short clips are
+    common on large timelines, so cuts only keep a frame clear of crossfades.
+    """
+    bodies = _clip_bodies(video_clips, crossfade, margin_s=FRAME_S)
+    cuts = []
+    last_cut_clip = -1
+    for boundary in range(batch_size, len(video_clips), batch_size):
+        for i in range(boundary - 1, last_cut_clip, -1):
+            lo, hi = bodies[i]
+            if hi > lo:
+                cut = _snap((lo + hi) / 2)
+                if not cuts or cut > cuts[-1]:
+                    cuts.append(cut)
+                    last_cut_clip = i
+                break
+    return cuts
+
+
+def split_timeline(
+    video_clips: list[VideoClipSpec],
+    crossfade: Optional[CrossfadeSpec],
+    cuts: list[float],
+) -> list[TimelineSegment]:
+    """Turn cut points into segments, each with the trimmed clip parts it covers.
+
+    Consecutive parts inside a segment keep the full crossfade between them, so
+    each segment's length is exactly end - start.
+    """
+    xfade_dur = _xfade_duration(video_clips, crossfade)
+    trimmed = [c.trimmed_duration for c in video_clips]
+    offsets = _clip_offsets(trimmed, xfade_dur)
+    total = offsets[-1] + trimmed[-1]
+    bounds = [0.0] + list(cuts) + [total]
+
+    segments = []
+    for seg_start, seg_end in zip(bounds, bounds[1:]):
+        parts = []
+        for clip, off, dur in zip(video_clips, offsets, trimmed):
+            part_start = max(seg_start, off)
+            part_end = min(seg_end, off + dur)
+            if part_end - part_start <= 1e-6:
+                continue
+            parts.append(VideoClipSpec(
+                path=clip.path,
+                duration_s=clip.duration_s,
+                trim_start=clip.trim_start + (part_start - off),
+                trim_end=clip.duration_s - (clip.trim_start + (part_end - off)),
+            ))
+        segments.append(TimelineSegment(seg_start, seg_end, parts))
+    return segments
+
+
+def _render_segment(
+    segment: TimelineSegment,
+    crossfade: Optional[CrossfadeSpec],
+    resolution: tuple[int, int],
+    out_path: Path,
+    threads: int,
+    progress_callback: Optional[ProgressCallback] = None,
+) -> Path:
+    graph = FilterGraph()
+    video, _, _ = lower_video_timeline(graph, segment.clips, crossfade, resolution, normalize=True)
+    graph.map(video)
+    run_graph(graph, out_path, [
+        "-c:v", "libx264", "-preset", "medium", "-crf", "23", "-threads", str(threads), "-f", "mpegts",
+    ], segment.duration, progress_callback)
+    return out_path
+
+
+def render_segments(
+    segments: list[TimelineSegment],
+    video_clips: list[VideoClipSpec],
+    output_path: Path,
+    crossfade: Optional[CrossfadeSpec] = None,
+    audio_track: Optional[AudioTrackSpec] = None,
+    speech_clips: Optional[list[SpeechClipSpec]] = None,
+    speech_volume: float = 1.0,
+    resolution: tuple[int, int] = (1920, 1080),
+    audio_source: str = "editor",
+    workers: int = 1,
+    progress_callback: Optional[ProgressCallback] = None,
+) -> float:
+    """Render segments on `workers` ffmpeg processes, join them and mux the audio.
+
+    x264 threads are split evenly between the workers.
+    Returns the total duration of the output.
+    """
+    total_duration = segments[-1].end
+    threads = max(1, (os.cpu_count() or 1) // min(workers, len(segments)))
+    tracker = ProgressTracker(total_duration, progress_callback)
+    work_dir = Path(tempfile.mkdtemp(prefix="parallel_render_"))
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(bind_job(_render_segment), seg, crossfade, resolution,
+                            work_dir / f"segment_{n:04d}.ts", threads, tracker.callback_for(n))
+                for n, seg in enumerate(segments)
+            ]
+            segment_paths = [f.result() for f in futures]
+
+        video_only = work_dir / "video.mp4"
+        join_with_concat_demuxer(segment_paths, video_only, work_dir / "segments.ffconcat")
+        mux_audio(
+            video_path=video_only,
+            output_path=output_path,
+            video_clips=video_clips,
+            total_duration=total_duration,
+            audio_track=audio_track,
+            speech_clips=speech_clips,
+            speech_volume=speech_volume,
+            audio_source=audio_source,
+        )
+        tracker.finish()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return total_duration
+
+
+def parallel_render(
+    video_clips: list[VideoClipSpec],
+    output_path: Path,
+    crossfade: Optional[CrossfadeSpec] = None,
+    audio_track: Optional[AudioTrackSpec] = None,
+    speech_clips: Optional[list[SpeechClipSpec]] = None,
+    speech_volume: float = 1.0,
+    resolution: tuple[int, int] = (1920, 1080),
+    audio_source: str = "editor",
+    workers: Optional[int] = None,
+    segment_s: float = DEFAULT_SEGMENT_S,
+    progress_callback: Optional[ProgressCallback] = None,
+) -> float:
+    """Render the composition as independently encoded segments in parallel.
+
+    workers defaults to the CPU count. Each worker drives one ffmpeg process.
+    Returns the total duration of the output.
+    """
+    workers = workers or os.cpu_count() or 1
+    cuts = choose_cut_points(video_clips, crossfade, segment_s)
+    segments = split_timeline(video_clips, crossfade, cuts)
+    print(f"[INFO] Parallel render: {len(segments)} segments on {workers} workers")
+    return render_segments(
+        segments, video_clips, output_path, crossfade, audio_track, speech_clips,
+        speech_volume, resolution, audio_source, workers, progress_callback,
+    )
+
+
+def batched_render(
+    video_clips: list[VideoClipSpec],
+    output_path: Path,
+    crossfade: Optional[CrossfadeSpec] = None,
+    audio_track: Optional[AudioTrackSpec] = None,
+    speech_clips: Optional[list[SpeechClipSpec]] = None,
+    speech_volume: float = 1.0,
+    resolution: tuple[int, int] = (1920, 1080),
+    audio_source: str = "editor",
+    workers: Optional[int] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress_callback: Optional[ProgressCallback] = None,
+) -> float:
+    """Render a large timeline in batches of at most batch_size clips.
+
+    Open inputs (decoders) are bounded by workers * (batch_size + 1),
+    independent of the clip count. workers defaults to 1.
+    Returns the total duration of the output.
+    """
+    workers = workers or 1
+    cuts = choose_batch_cut_points(video_clips, crossfade, batch_size)
+    segments = split_timeline(video_clips, crossfade, cuts)
+    print(f"[INFO] Batched render: {len(video_clips)} clips in {len(segments)} batches on {workers} workers")
+    return render_segments(
+        segments, video_clips, output_path, crossfade, audio_track, speech_clips,
+        speech_volume, resolution, audio_source, workers, progress_callback,
+    )
@@ -0,0 +1,152 @@
+"""
+Decoded PCM for every uploaded audio file and video soundtrack.
+
+Each source is decoded once to 44.1 kHz stereo float32 and stored as a .npy
+file named by content hash. Readers open it with np.load(mmap_mode="r"), so
+any time range of any file is an O(1) slice of a memory map (the OS page
+cache does the rest) instead of an ffmpeg subprocess. Mixing, waveforms and
+analysis all share the same decode. Files are evicted least-recently-used
+under a disk quota.
+"""
+import os
+import struct
+import subprocess
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from media_cache import CacheDir, content_hash
+from scheduler import PRIORITY_BATCH, scheduler, tracked
+
+DEFAULT_PCM_DIR = Path(__file__).parent.parent / "cache" / "pcm"
+DEFAULT_MAX_BYTES = 8 * 1024 ** 3  # ~28 h of stereo float32
+SAMPLE_RATE = 44100
+CHANNELS = 2
+NPY_HEADER_LEN = 128  # Fixed, so the header can be written after streaming the samples
+READ_CHUNK_BYTES = 1 << 20
+
+
+def npy_header(frames: int) -> bytes:
+    """.npy v1.0 header for a (frames, CHANNELS) little-endian float32 array."""
+    magic = b"\x93NUMPY\x01\x00"
+    body_len = NPY_HEADER_LEN - len(magic) - 2
+    body = "{'descr': '<f4', 'fortran_order': False, 'shape': (%d, %d), }" % (frames, CHANNELS)
+    return magic + struct.pack("<H", body_len) + (body.ljust(body_len - 1) + "\n").encode("latin1")
+
+
+def decode_to_npy(source: Path, out_path: Path) -> int:
+    """Stream source's first audio stream from ffmpeg into a .npy file; returns frames."""
+    cmd = [
+        "ffmpeg", "-v", "error", "-i", str(source),
+        "-map", "0:a:0", "-vn",
+        "-ac", str(CHANNELS), "-ar", str(SAMPLE_RATE), "-f", "f32le", "pipe:1",
+    ]
+    frame_bytes = CHANNELS * 4
+    with open(out_path, "wb") as f:
+        f.write(b"\0" * NPY_HEADER_LEN)
+        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        with tracked(p):
+            # stderr is drained on a thread so a chatty decoder can't block the pipe
+            stderr = []
+            drain = threading.Thread(target=lambda: stderr.append(p.stderr.read()), daemon=True)
+            drain.start()
+            data_bytes = 0
+            while True:
+                chunk = p.stdout.read(READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                f.write(chunk)
+                data_bytes += len(chunk)
+            p.wait()
+            drain.join()
+        if p.returncode != 0:
+            raise RuntimeError(f"FFmpeg failed: {b''.join(stderr).decode('utf-8', 'replace')}")
+        frames = data_bytes // frame_bytes
+        f.truncate(NPY_HEADER_LEN + frames * frame_bytes)
+        f.seek(0)
+        f.write(npy_header(frames))
+    return frames
+
+
+class PcmCache:
+    """Creates, opens and evicts decoded-PCM .npy files."""
+
+    def __init__(self, cache_dir: Path = DEFAULT_PCM_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache = CacheDir(cache_dir, max_bytes=max_bytes)
+        self._decoding: dict[str, threading.Lock] = {}
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _name(self, source: Path) -> str:
+        return f"{content_hash(source)}.npy"
+
+    def ensure(self, source: Path) -> Path:
+        """Decode source if needed (blocking) and return its .npy path.
+
+        Concurrent callers for the same content wait for one decode instead of
+        starting their own.
+        """
+        source = Path(source)
+        name = self._name(source)
+        existing = self.cache.lookup(name)
+        if existing:
+            return existing
+
+        with self._lock:
+            decode_lock = self._decoding.setdefault(name, threading.Lock())
+        with decode_lock:
+            existing = self.cache.lookup(name)
+            if existing:
+                return existing
+            out_path = self.cache.path_for(name)
+            tmp_path = out_path.with_name(f"{name}.{threading.get_ident()}.tmp")
+            try:
+                decode_to_npy(source, tmp_path)
+                os.replace(tmp_path, out_path)
+            finally:
+                if tmp_path.exists():
+                    tmp_path.unlink()
+                with self._lock:
+                    self._decoding.pop(name, None)
+        self.cache.evict(keep={out_path})
+        return out_path
+
+    def get(self, source: Path) -> np.ndarray:
+        """Source's PCM as a read-only (frames, 2) float32 memory map."""
+        return np.load(self.ensure(source), mmap_mode="r")
+
+    def read(self, source: Path, start_s: float = 0.0, duration_s: Optional[float] = None) -> np.ndarray:
+        """Samples of source from start_s for duration_s (to the end if None)."""
+        pcm = self.get(source)
+        start = max(0, int(round(start_s * SAMPLE_RATE)))
+        if duration_s is None:
+            return pcm[start:]
+        return pcm[start:start + max(0, int(round(duration_s * SAMPLE_RATE)))]
+
+    def submit(self, source: Path) -> None:
+        """Queue the decode of source on the scheduler's media pool."""
+        source = Path(source)
+        try:
+            name = self._name(source)
+        except OSError:
+            return
+        with self._lock:
+            if name in self._pending:
+                return
+            self._pending.add(name)
+
+        def run():
+            try:
+                self.ensure(source)
+            except Exception as e:
+                print(f"[WARN] PCM decode failed for {source}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(name)
+
+        scheduler.submit('media', run, job_id=f"pcm-{name}", priority=PRIORITY_BATCH)
+
+
+pcm_cache = PcmCache(max_bytes=int(os.environ.get("PCM_CACHE_BYTES", DEFAULT_MAX_BYTES)))
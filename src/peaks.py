@@ -0,0 +1,188 @@
+"""
+Waveform peaks for the timeline, as a min/max mip pyramid per source.
+
+Level 0 holds one (min, max) pair per SAMPLES_PER_PEAK frames of the mono
+envelope (both channels), computed in chunks from the decoded PCM cache
+(pcm_cache.py, itself streamed from ffmpeg once). Every next level halves the
+resolution by combining neighbouring pairs, so any zoom can pick the level
+closest to its pixels-per-second and draw it directly.
+
+Each level is stored as raw interleaved int8 pairs [min0, max0, min1, max1,
+...] scaled to +-127, named by content hash, so an hour of audio costs
+~1.2 MB at level 0 and half that for every level above.
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from media_cache import CacheDir, content_hash
+from pcm_cache import PcmCache, pcm_cache
+from scheduler import PRIORITY_BATCH, scheduler
+
+DEFAULT_PEAKS_DIR = Path(__file__).parent.parent / "cache" / "peaks"
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+SAMPLES_PER_PEAK = 256  # Level 0: ~172 peaks per second
+PEAK_LEVELS = 12  # Level 11: ~12 s per peak
+PEAK_SCALE = 127
+CHUNK_PEAKS = 4096
+
+
+def quantize(mins: np.ndarray, maxs: np.ndarray) -> np.ndarray:
+    """Interleave float min/max as int8 pairs, rounding outwards so quiet parts stay visible."""
+    pairs = np.empty((len(mins), 2), dtype=np.int8)
+    pairs[:, 0] = np.floor(np.clip(mins, -1.0, 1.0) * PEAK_SCALE)
+    pairs[:, 1] = np.ceil(np.clip(maxs, -1.0, 1.0) * PEAK_SCALE)
+    return pairs
+
+
+def base_peaks(pcm: np.ndarray) -> np.ndarray:
+    """Level 0 (min, max) int8 pairs for a (frames, channels) float array."""
+    n_peaks = -(-len(pcm) // SAMPLES_PER_PEAK)
+    pairs = np.empty((n_peaks, 2), dtype=np.int8)
+    step = CHUNK_PEAKS * SAMPLES_PER_PEAK
+    for a in range(0, len(pcm), step):
+        block = np.asarray(pcm[a:a + step])
+        full = len(block) // SAMPLES_PER_PEAK
+        mins = np.empty(-(-len(block) // SAMPLES_PER_PEAK), dtype=np.float32)
+        maxs = np.empty_like(mins)
+        if full:
+            body = block[:full * SAMPLES_PER_PEAK].reshape(full, -1)
+            body.min(axis=1, out=mins[:full])
+            body.max(axis=1, out=maxs[:full])
+        if len(block) > full * SAMPLES_PER_PEAK:
+            tail = block[full * SAMPLES_PER_PEAK:]
+            mins[full], maxs[full] = tail.min(), tail.max()
+        first = a // SAMPLES_PER_PEAK
+        pairs[first:first + len(mins)] = quantize(mins, maxs)
+    return pairs
+
+
+def next_level(pairs: np.ndarray) -> np.ndarray:
+    """Halve a level's resolution: each pair covers two pairs of the level below."""
+    if len(pairs) % 2:
+        pairs = np.concatenate([pairs, pairs[-1:]])
+    out = np.empty((len(pairs) // 2, 2), dtype=np.int8)
+    np.minimum(pairs[0::2, 0], pairs[1::2, 0], out=out[:, 0])
+    np.maximum(pairs[0::2, 1], pairs[1::2, 1], out=out[:, 1])
+    return out
+
+
+def samples_per_peak(level: int) -> int:
+    return SAMPLES_PER_PEAK << level
+
+
+class PeakStore:
+    """Creates, finds and evicts peak pyramids."""
+
+    def __init__(self, cache_dir: Path = DEFAULT_PEAKS_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 pcm: Optional[PcmCache] = None):
+        self.cache = CacheDir(cache_dir, max_bytes=max_bytes)
+        self.pcm = pcm or pcm_cache
+        self._building: dict[str, threading.Lock] = {}
+        self._pending: set[str] = set()
+        self._failed: dict[str, str] = {}  # First level name -> error of the last build
+        self._lock = threading.Lock()
+
+    def _names(self, source: Path) -> list[str]:
+        key = content_hash(source)
+        return [f"{key}_{level}.peaks" for level in range(PEAK_LEVELS)]
+
+    def _lookup(self, names: list[str]) -> Optional[list[Path]]:
+        paths = [self.cache.lookup(name) for name in names]
+        return paths if all(paths) else None
+
+    def ensure(self, source: Path) -> list[Path]:
+        """Build source's pyramid if needed (blocking); returns one path per level."""
+        source = Path(source)
+        names = self._names(source)
+        existing = self._lookup(names)
+        if existing:
+            return existing
+
+        with self._lock:
+            build_lock = self._building.setdefault(names[0], threading.Lock())
+        with build_lock:
+            existing = self._lookup(names)
+            if existing:
+                return existing
+            paths = [self.cache.path_for(name) for name in names]
+            try:
+                pairs = base_peaks(self.pcm.get(source))
+                for level, path in enumerate(paths):
+                    if level:
+                        pairs = next_level(pairs)
+                    tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+                    try:
+                        tmp_path.write_bytes(pairs.tobytes())
+                        os.replace(tmp_path, path)
+                    finally:
+                        if tmp_path.exists():
+                            tmp_path.unlink()
+            finally:
+                with self._lock:
+                    self._building.pop(names[0], None)
+        self.cache.evict(keep=set(paths))
+        return paths
+
+    def level_path(self, source: Path, level: int) -> Path:
+        """The file for one level of source's pyramid, built on a miss."""
+        _check_level(level)
+        return self.ensure(source)[level]
+
+    def get_level(self, source: Path, level: int) -> Optional[Path]:
+        """The file for one level if source's pyramid is ready, else None."""
+        _check_level(level)
+        try:
+            paths = self._lookup(self._names(Path(source)))
+        except OSError:
+            return None
+        return paths[level] if paths else None
+
+    def error(self, source: Path) -> Optional[str]:
+        """Why the last build of source's pyramid failed, None if it didn't."""
+        try:
+            name = self._names(Path(source))[0]
+        except OSError:
+            return None
+        with self._lock:
+            return self._failed.get(name)
+
+    def submit(self, source: Path) -> None:
+        """Queue decoding source and building its pyramid on the scheduler's media pool."""
+        source = Path(source)
+        try:
+            name = self._names(source)[0]
+        except OSError:
+            return
+        with self._lock:
+            if name in self._pending:
+                return
+            self._pending.add(name)
+
+        def run():
+            error = None
+            try:
+                self.ensure(source)
+            except Exception as e:
+                error = str(e)
+                print(f"[WARN] Peak generation failed for {source}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(name)
+                    if error is None:
+                        self._failed.pop(name, None)
+                    else:
+                        self._failed[name] = error
+
+        scheduler.submit('media', run, job_id=f"peaks-{name}", priority=PRIORITY_BATCH)
+
+
+def _check_level(level: int) -> None:
+    if not 0 <= level < PEAK_LEVELS:
+        raise ValueError(f"Peak level must be 0-{PEAK_LEVELS - 1}, got {level}")
+
+
+peak_store = PeakStore(max_bytes=int(os.environ.get("PEAKS_CACHE_BYTES", DEFAULT_MAX_BYTES)))
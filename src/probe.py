@@ -0,0 +1,326 @@
+"""
+Cached ffprobe metadata for media files.
+
+Runs one `ffprobe -show_format -show_streams -of json` per file and keeps the
+full result in an in-memory LRU backed by JSON files on disk. Entries are keyed
+by resolved path + size + mtime, so a re-uploaded or modified file is probed again.
+The disk store is evicted least-recently-used under a quota like the other caches.
+A per-file keyframe index (packet-level probe, no decoding) is cached alongside,
+together with whether the stream uses open GOPs.
+"""
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+from media_cache import CacheDir, file_fingerprint
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / "cache" / "probe"
+DEFAULT_MAX_BYTES = 64 * 1024 ** 2
+
+
+def _parse_rate(rate: Optional[str]) -> float:
+    """Parse an ffprobe frame rate like '30000/1001' into frames per second."""
+    if not rate or rate == "0/0":
+        return 0.0
+    if "/" in rate:
+        num, den = rate.split("/", 1)
+        try:
+            return float(num) / float(den) if float(den) else 0.0
+        except ValueError:
+            return 0.0
+    try:
+        return float(rate)
+    except ValueError:
+        return 0.0
+
+
+@dataclass
+class MediaInfo:
+    """Parsed ffprobe result for one file (first video and audio stream)."""
+    path: Path
+    duration_s: float = 0.0
+    start_time_s: float = 0.0  # Container start time; ffmpeg timestamps are relative to it
+    has_video: bool = False
+    has_audio: bool = False
+    video_codec: Optional[str] = None
+    width: int = 0
+    height: int = 0
+    fps: float = 0.0
+    pix_fmt: Optional[str] = None
+    video_profile: Optional[str] = None  # e.g. "High", "Constrained Baseline"
+    video_level: int = 0  # H.264: level_idc, e.g. 40 for 4.0
+    sample_aspect_ratio: Optional[str] = None
+    audio_codec: Optional[str] = None
+    sample_rate: int = 0
+    channels: int = 0
+    raw: dict = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_ffprobe(cls, path: Path, data: dict) -> "MediaInfo":
+        streams = data.get("streams", [])
+        fmt = data.get("format", {})
+        video = next((s for s in streams if s.get("codec_type") == "video"
+                      and not s.get("disposition", {}).get("attached_pic")), None)
+        audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+
+        duration = fmt.get("duration")
+        if duration is None:
+            # Some containers only report per-stream durations
+            stream_durations = [float(s["duration"]) for s in streams if s.get("duration")]
+            duration = max(stream_durations) if stream_durations else 0.0
+
+        try:
+            start_time = float(fmt.get("start_time", 0.0))
+        except (TypeError, ValueError):
+            start_time = 0.0  # "N/A"
+        info = cls(path=Path(path), duration_s=float(duration), start_time_s=start_time, raw=data)
+        if video:
+            info.has_video = True
+            info.video_codec = video.get("codec_name")
+            info.width = int(video.get("width", 0))
+            info.height = int(video.get("height", 0))
+            info.fps = _parse_rate(video.get("avg_frame_rate")) or _parse_rate(video.get("r_frame_rate"))
+            info.pix_fmt = video.get("pix_fmt")
+            info.video_profile = video.get("profile")
+            try:
+                info.video_level = int(video.get("level", 0))
+            except (TypeError, ValueError):
+                info.video_level = 0
+            info.sample_aspect_ratio = video.get("sample_aspect_ratio")
+        if audio:
+            info.has_audio = True
+            info.audio_codec = audio.get("codec_name")
+            info.sample_rate = int(audio.get("sample_rate", 0) or 0)
+            info.channels = int(audio.get("channels", 0) or 0)
+        return info
+
+
+def run_ffprobe(path: Path) -> dict:
+    """Run ffprobe once and return the parsed JSON (format + streams)."""
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_format",
+        "-show_streams",
+        "-of", "json",
+        str(path),
+    ]
+    p = subprocess.run(cmd, capture_output=True, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(f"ffprobe failed for {path}: {p.stderr}")
+    return json.loads(p.stdout or "{}")
+
+
+def run_keyframe_probe(path: Path) -> dict:
+    """Index the keyframes of the first video stream.
+
+    Reads packet headers only, so it costs a demux pass but no decoding.
+    Returns {"keyframes": sorted keyframe timestamps (seconds),
+    "open_gop": True if any packet decoded after a keyframe is shown before
+    it}. Such leading pictures reference the previous GOP, so a copy that
+    starts at that keyframe would not decode cleanly.
+    """
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        str(path),
+    ]
+    p = subprocess.run(cmd, capture_output=True, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(f"ffprobe keyframe scan failed for {path}: {p.stderr}")
+    times = []
+    open_gop = False
+    gop_start = None
+    for line in p.stdout.splitlines():  # Packets come in decode order
+        parts = line.strip().split(",")
+        if len(parts) < 2:
+            continue
+        try:
+            pts = float(parts[0])
+        except ValueError:
+            continue  # pts_time=N/A
+        if "K" in parts[1]:
+            times.append(pts)
+            gop_start = pts
+        elif gop_start is not None and pts < gop_start:
+            open_gop = True
+    return {"keyframes": sorted(times), "open_gop": open_gop}
+
+
+class ProbeCache:
+    """In-memory LRU in front of a JSON-per-file disk store."""
+
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR, max_entries: int = 1024,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache = CacheDir(self.cache_dir, max_bytes=max_bytes)
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, MediaInfo]" = OrderedDict()
+        self._keyframes: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _load(self, disk_path: Path):
+        """Read a disk entry (marking it as recently used), or None if absent."""
+        if self.cache.lookup(disk_path.name) is None:
+            return None
+        return json.loads(disk_path.read_text(encoding="utf-8"))
+
+    def _remember(self, key: str, info: MediaInfo) -> None:
+        with self._lock:
+            self._memory[key] = info
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, path: Path) -> MediaInfo:
+        """Return probe info for path, running ffprobe only on a cache miss."""
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(path)
+        key = file_fingerprint(path)
+
+        with self._lock:
+            info = self._memory.get(key)
+            if info is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return info
+
+        disk_path = self._disk_path(key)
+        try:
+            data = self._load(disk_path)
+            if data is not None:
+                info = MediaInfo.from_ffprobe(path, data)
+                self._remember(key, info)
+                with self._lock:
+                    self.hits += 1
+                return info
+        except (json.JSONDecodeError, OSError, ValueError):
+            pass  # Corrupt or just-evicted entry, probe again
+
+        data = run_ffprobe(path)
+        info = MediaInfo.from_ffprobe(path, data)
+        self._store(disk_path, data)
+        self._remember(key, info)
+        with self._lock:
+            self.misses += 1
+        return info
+
+    def get_keyframe_index(self, path: Path) -> dict:
+        """Return the keyframe index for path, scanning packets only on a cache miss."""
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(path)
+        key = file_fingerprint(path)
+
+        with self._lock:
+            index = self._keyframes.get(key)
+            if index is not None:
+                self._keyframes.move_to_end(key)
+                return index
+
+        disk_path = self.cache_dir / f"{key}.keyframes.json"
+        index = None
+        try:
+            data = self._load(disk_path)
+            if data is not None:
+                index = {"keyframes": [float(t) for t in data["keyframes"]],
+                         "open_gop": bool(data["open_gop"])}
+        except (json.JSONDecodeError, OSError, ValueError, TypeError, KeyError):
+            index = None  # Corrupt or older list-only entry, scan again
+        if index is None:
+            index = run_keyframe_probe(path)
+            self._store(disk_path, index)
+
+        with self._lock:
+            self._keyframes[key] = index
+            while len(self._keyframes) > self.max_entries:
+                self._keyframes.popitem(last=False)
+        return index
+
+    def get_keyframes(self, path: Path) -> list[float]:
+        """Return the keyframe timestamps of path's first video stream."""
+        return self.get_keyframe_index(path)["keyframes"]
+
+    def _store(self, disk_path: Path, data) -> None:
+        # Write to a temp file and rename so concurrent readers never see partial JSON
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = disk_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(tmp_path, disk_path)
+        except OSError as e:
+            print(f"[WARN] Could not write probe cache {disk_path}: {e}")
+            return
+        self.cache.evict(keep={disk_path})
+
+    def get_many(self, paths: Iterable[Path], max_workers: int = 8) -> dict[Path, MediaInfo]:
+        """Probe many files at once on a thread pool.
+
+        Returns a dict of path -> MediaInfo. Files that are missing or that
+        ffprobe cannot read are left out; callers fall back to get() for errors.
+        """
+        unique = list(dict.fromkeys(Path(p) for p in paths))
+        results: dict[Path, MediaInfo] = {}
+        if not unique:
+            return results
+
+        def _probe(p: Path):
+            try:
+                return p, self.get(p)
+            except (FileNotFoundError, RuntimeError, ValueError):
+                return p, None
+
+        workers = max(1, min(max_workers, len(unique)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for p, info in pool.map(_probe, unique):
+                if info is not None:
+                    results[p] = info
+        return results
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._keyframes.clear()
+
+
+# Process-wide cache shared by concat.py and app.py
+probe_cache = ProbeCache(max_bytes=int(os.environ.get("PROBE_CACHE_BYTES", DEFAULT_MAX_BYTES)))
+
+
+def probe_media(path: Path) -> MediaInfo:
+    """Get (cached) probe info for a single file."""
+    return probe_cache.get(path)
+
+
+def probe_many(paths: Iterable[Path], max_workers: int = 8) -> dict[Path, MediaInfo]:
+    """Get (cached) probe info for many files, probing misses in parallel."""
+    return probe_cache.get_many(paths, max_workers=max_workers)
+
+
+def keyframe_times(path: Path) -> list[float]:
+    """Get the (cached) keyframe timestamps of a file's first video stream.
+
+    Times are relative to the container start, like -ss and trim=start.
+    """
+    start = probe_cache.get(path).start_time_s
+    return [t - start for t in probe_cache.get_keyframes(path)]
+
+
+def has_open_gop(path: Path) -> bool:
+    """True if the first video stream has GOPs whose leading pictures reference the previous GOP."""
+    return probe_cache.get_keyframe_index(path)["open_gop"]
@@ -0,0 +1,102 @@
+"""
+Low-resolution proxy media for fast previews.
+
+Every uploaded video gets a 720p (never upscaled), 30 fps, short-GOP H.264
+proxy generated in the background. /preview-full renders from proxies when they
+are ready; /export always uses the originals. Proxies are named by source
+content hash and evicted least-recently-used under a disk quota.
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from concat import run_ffmpeg
+from media_cache import CacheDir, content_hash
+from scheduler import PRIORITY_BATCH, scheduler
+
+DEFAULT_PROXY_DIR = Path(__file__).parent.parent / "cache" / "proxies"
+PROXY_HEIGHT = 720
+PROXY_GOP = 15  # Half-second GOPs keep seeking/trimming cheap
+DEFAULT_QUOTA_BYTES = 5 * 1024 ** 3
+
+
+class ProxyManager:
+    """Creates, finds and evicts proxies."""
+
+    def __init__(self, cache_dir: Path = DEFAULT_PROXY_DIR, height: int = PROXY_HEIGHT,
+                 quota_bytes: int = DEFAULT_QUOTA_BYTES):
+        self.cache = CacheDir(cache_dir, max_bytes=quota_bytes)
+        self.height = height
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _name(self, source: Path) -> str:
+        return f"{content_hash(source)}_{self.height}p.mp4"
+
+    def get_proxy(self, source: Path) -> Optional[Path]:
+        """Return the proxy for source if it's ready, else None."""
+        try:
+            return self.cache.lookup(self._name(Path(source)))
+        except OSError:
+            return None
+
+    def proxy_command(self, source: Path, out_path: Path) -> list[str]:
+        return [
+            "ffmpeg", "-y",
+            "-i", str(source),
+            "-map", "0:v:0", "-map", "0:a:0?",
+            "-vf", f"scale=-2:'min({self.height},ih)',fps=30,format=yuv420p",
+            "-c:v", "libx264", "-preset", "ultrafast", "-crf", "26",
+            "-g", str(PROXY_GOP), "-bf", "0",
+            "-c:a", "aac", "-b:a", "128k",
+            "-movflags", "+faststart",
+            "-f", "mp4", str(out_path),
+        ]
+
+    def ensure_proxy(self, source: Path) -> Path:
+        """Create the proxy for source if needed (blocking) and return its path."""
+        source = Path(source)
+        name = self._name(source)
+        existing = self.cache.lookup(name)
+        if existing:
+            return existing
+
+        out_path = self.cache.path_for(name)
+        tmp_path = out_path.with_name(f"{name}.{threading.get_ident()}.tmp")
+        try:
+            run_ffmpeg(self.proxy_command(source, tmp_path))
+            os.replace(tmp_path, out_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        self.cache.evict(keep={out_path})
+        return out_path
+
+    def submit(self, source: Path) -> None:
+        """Queue proxy generation for source on the scheduler's media pool."""
+        source = Path(source)
+        try:
+            name = self._name(source)
+        except OSError:
+            return
+        with self._lock:
+            if name in self._pending:
+                return
+            self._pending.add(name)
+
+        def run():
+            try:
+                self.ensure_proxy(source)
+            except Exception as e:
+                print(f"[WARN] Proxy generation failed for {source}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(name)
+
+        scheduler.submit('media', run, job_id=f"proxy-{name}", priority=PRIORITY_BATCH)
+
+
+proxy_manager = ProxyManager(
+    quota_bytes=int(os.environ.get("PROXY_QUOTA_BYTES", DEFAULT_QUOTA_BYTES)),
+)
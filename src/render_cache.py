@@ -0,0 +1,201 @@
+"""
+Finished previews and exports, keyed by what was rendered.
+
+composition_key() hashes a canonical serialization of a composition: source
+content hashes (not upload names), trims, crossfade, volumes, fades,
+audio_source, resolution and the render profile. Pressing Preview or Export
+again on an unchanged timeline then finds the earlier output in the cache
+instead of re-rendering it; callers hard-link it to wherever it is served
+from.
+
+Renders are single-flight: while a key is being rendered, other requests for
+the same key wait for that render (receiving its progress) instead of
+starting a second ffmpeg. Entries are evicted least-recently-used under a
+disk quota.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from concat import AudioTrackSpec, CrossfadeSpec, SpeechClipSpec, VideoClipSpec
+from ffmpeg_progress import ProgressCallback
+from media_cache import CacheDir, content_hash
+from scheduler import JobCancelled
+
+DEFAULT_RENDER_DIR = Path(__file__).parent.parent / "cache" / "renders"
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3
+KEY_VERSION = 1  # Bump when rendering changes in ways the key doesn't capture
+
+RenderFn = Callable[[Path, Optional[ProgressCallback]], Any]
+
+
+def _t(seconds: float) -> float:
+    # Millisecond precision: float noise from the editor must not change the key
+    return round(float(seconds), 3)
+
+
+def composition_key(
+    video_clips: list[VideoClipSpec],
+    crossfade: CrossfadeSpec,
+    audio_track: Optional[AudioTrackSpec],
+    speech_clips: list[SpeechClipSpec],
+    speech_volume: float,
+    resolution: tuple[int, int],
+    audio_source: str = "editor",
+    profile: str = "export",
+) -> str:
+    """Hash of everything that determines a render's output.
+
+    Raises OSError if a source file can't be read.
+    """
+    spoken = [s for s in speech_clips if not s.is_silence]
+    doc = {
+        "v": KEY_VERSION,
+        "profile": profile,
+        "resolution": list(resolution),
+        "audio_source": audio_source,
+        "video": [
+            {"src": content_hash(c.path), "duration": _t(c.duration_s),
+             "trim_start": _t(c.trim_start), "trim_end": _t(c.trim_end)}
+            for c in video_clips
+        ],
+        # Transitions only exist between clips
+        "crossfade": ({"duration": _t(crossfade.duration_s), "transition": crossfade.transition}
+                      if len(video_clips) > 1 else None),
+        "audio": None if audio_track is None else {
+            "src": content_hash(audio_track.path), "volume": _t(audio_track.volume),
+            "fade_in": _t(audio_track.fade_in_s), "fade_out": _t(audio_track.fade_out_s),
+            "trim_start": _t(audio_track.trim_start), "trim_end": _t(audio_track.trim_end),
+        },
+        "speech": [
+            {"silence": _t(s.duration_s)} if s.is_silence else
+            {"src": content_hash(s.path), "duration": _t(s.duration_s),
+             "trim_start": _t(s.trim_start), "trim_end": _t(s.trim_end)}
+            for s in speech_clips
+        ],
+        "speech_volume": _t(speech_volume) if spoken else None,
+    }
+    canonical = json.dumps(doc, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def link_output(path: Path, dest: Path) -> Path:
+    """Make dest a copy of path: a hard link where possible, else a real copy."""
+    tmp = dest.with_name(f".{dest.name}.{threading.get_ident()}.tmp")
+    try:
+        os.link(path, tmp)
+    except OSError:
+        shutil.copyfile(path, tmp)
+    os.replace(tmp, dest)
+    return dest
+
+
+class _Flight:
+    """A render in progress and the callers waiting for it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.path: Optional[Path] = None
+        self.error: Optional[BaseException] = None
+        self.listeners: list[ProgressCallback] = []
+        self.lock = threading.Lock()
+
+    def progress(self, p) -> None:
+        with self.lock:
+            listeners = list(self.listeners)
+        for cb in listeners:
+            try:
+                cb(p)
+            except Exception as e:
+                print(f"[WARN] Progress listener failed: {e}")
+
+
+class RenderCache:
+    """Creates, finds and evicts finished renders, one render per key at a time."""
+
+    def __init__(self, cache_dir: Path = DEFAULT_RENDER_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache = CacheDir(cache_dir, max_bytes=max_bytes)
+        self._flights: dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def _name(self, key: str) -> str:
+        return f"{key}.mp4"
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """The finished render for key, or None."""
+        return self.cache.lookup(self._name(key))
+
+    def in_flight(self, key: str) -> bool:
+        with self._lock:
+            return key in self._flights
+
+    def wait(self, key: str, progress_callback: Optional[ProgressCallback] = None) -> Optional[Path]:
+        """Wait for the render of key in progress; its path, or None if there is none or it failed."""
+        with self._lock:
+            flight = self._flights.get(key)
+        if flight is None:
+            return self.lookup(key)
+        if progress_callback:
+            with flight.lock:
+                flight.listeners.append(progress_callback)
+        flight.done.wait()
+        return flight.path
+
+    def render(self, key: str, render_fn: RenderFn,
+               progress_callback: Optional[ProgressCallback] = None) -> tuple[Path, bool]:
+        """Return (path, rendered_here) for key, calling render_fn(out_path, progress) on a miss.
+
+        If the same key is already being rendered, waits for that render
+        (forwarding its progress) instead. If that render is cancelled, this
+        caller renders it itself; other errors are raised to every waiter.
+        """
+        while True:
+            existing = self.lookup(key)
+            if existing:
+                return existing, False
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+            if not leader:
+                path = self.wait(key, progress_callback)
+                if path:
+                    return path, False
+                if flight.error is not None and not isinstance(flight.error, JobCancelled):
+                    raise flight.error
+                continue
+
+            if progress_callback:
+                flight.listeners.append(progress_callback)
+            try:
+                flight.path = self._render(key, render_fn, flight.progress)
+                return flight.path, True
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._flights.pop(key, None)
+                flight.done.set()
+
+    def _render(self, key: str, render_fn: RenderFn, progress: ProgressCallback) -> Path:
+        name = self._name(key)
+        out_path = self.cache.path_for(name)
+        # Rendered in a scratch dir (ignored by eviction), moved in once complete
+        work_dir = Path(tempfile.mkdtemp(dir=self.cache.root, prefix=".build_"))
+        try:
+            render_fn(work_dir / name, progress)
+            os.replace(work_dir / name, out_path)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        self.cache.evict(keep={out_path})
+        return out_path
+
+
+render_cache = RenderCache(max_bytes=int(os.environ.get("RENDER_CACHE_BYTES", DEFAULT_MAX_BYTES)))
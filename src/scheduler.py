@@ -0,0 +1,234 @@
+"""
+Bounded job scheduler for renders and conversions.
+
+Jobs are submitted under a class (preview, export, html2mp4, media). Each
+class has its own worker limit and at most MAX_RUNNING jobs run at once
+overall; when a slot frees up, the queued job with the best (priority,
+submission order) whose class has room starts next. Interactive previews
+therefore overtake queued exports instead of competing with them for the CPU.
+
+Cancellation: child processes started inside a job register themselves via
+tracked() (run_ffmpeg, the progress runner, the HTML converter, ...), so
+cancel() can kill them. Any later attempt to start a process, or an explicit
+raise_if_cancelled() check, raises JobCancelled, which unwinds the job.
+Thread pools inside a job wrap their work in bind_job() so their processes
+are tracked too.
+"""
+import contextvars
+import itertools
+import os
+import subprocess
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+JOB_CLASS_WORKERS = {
+    "preview": int(os.environ.get("JOBS_PREVIEW_WORKERS", 2)),
+    "export": int(os.environ.get("JOBS_EXPORT_WORKERS", 1)),
+    "html2mp4": int(os.environ.get("JOBS_HTML2MP4_WORKERS", 1)),
+    # Derived media generated after uploads (proxies, thumbnails, peaks, ...)
+    "media": int(os.environ.get("JOBS_MEDIA_WORKERS", 1)),
+}
+# Each job already runs multi-threaded encoders; more concurrent jobs than this
+# just slows them all down
+MAX_RUNNING = int(os.environ.get("JOBS_MAX_RUNNING", max(2, (os.cpu_count() or 1) // 4)))
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once it has been cancelled."""
+
+
+@dataclass(eq=False)
+class Job:
+    """A unit of scheduled work and its outcome."""
+    id: str
+    job_class: str
+    fn: Callable[..., Any]
+    args: tuple = ()
+    priority: int = PRIORITY_BATCH
+    seq: int = 0
+    status: str = "queued"  # queued, running, done, failed, cancelled
+    result: Any = None
+    error: Optional[BaseException] = None
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+    _procs: set = field(default_factory=set, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """Block until the job finishes; returns its result or raises its error."""
+        self._done.wait(timeout)
+        if self.status == "cancelled":
+            raise JobCancelled(self.id)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def _kill_processes(self) -> None:
+        with self._lock:
+            procs = list(self._procs)
+        for proc in procs:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+
+
+_current_job: contextvars.ContextVar[Optional[Job]] = contextvars.ContextVar("current_job", default=None)
+
+
+def current_job() -> Optional[Job]:
+    return _current_job.get()
+
+
+def raise_if_cancelled() -> None:
+    """Raise JobCancelled if the job running in this context was cancelled."""
+    job = _current_job.get()
+    if job is not None and job.cancelled:
+        raise JobCancelled(job.id)
+
+
+@contextmanager
+def tracked(proc: subprocess.Popen):
+    """Register proc with the current job (if any) so cancel() can kill it.
+
+    If the job was cancelled by the time proc exits, JobCancelled is raised
+    on leaving the block, so callers don't report the kill as a failure.
+    """
+    job = _current_job.get()
+    if job is None:
+        yield proc
+        return
+    with job._lock:
+        job._procs.add(proc)
+    try:
+        if job.cancelled:
+            proc.kill()
+        yield proc
+    finally:
+        with job._lock:
+            job._procs.discard(proc)
+    raise_if_cancelled()
+
+
+def bind_job(fn: Callable) -> Callable:
+    """Wrap fn to run under the current job from other threads (e.g. a ThreadPoolExecutor)."""
+    job = _current_job.get()
+
+    def run(*args, **kwargs):
+        token = _current_job.set(job)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_job.reset(token)
+
+    return run
+
+
+class Scheduler:
+    """Priority queue of jobs with per-class and global concurrency limits."""
+
+    def __init__(self, class_workers: Optional[dict] = None, max_running: int = MAX_RUNNING):
+        self.class_workers = dict(class_workers or JOB_CLASS_WORKERS)
+        self.max_running = max(1, max_running)
+        self._jobs: dict[str, Job] = {}
+        self._queued: list[Job] = []
+        self._running: dict[str, int] = {name: 0 for name in self.class_workers}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads: list[threading.Thread] = []
+
+    def submit(self, job_class: str, fn: Callable, *args, job_id: str,
+               priority: int = PRIORITY_BATCH) -> Job:
+        """Queue fn(*args) under job_class; returns the Job handle."""
+        if job_class not in self.class_workers:
+            raise ValueError(f"Unknown job class: {job_class}")
+        job = Job(id=job_id, job_class=job_class, fn=fn, args=args, priority=priority, seq=next(self._seq))
+        with self._cond:
+            self._jobs[job_id] = job
+            self._queued.append(job)
+            while len(self._threads) < self.max_running:
+                t = threading.Thread(target=self._worker, daemon=True, name=f"scheduler-{len(self._threads)}")
+                self._threads.append(t)
+                t.start()
+            self._cond.notify_all()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based place among queued jobs of the same class, None if not queued."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != "queued":
+                return None
+            ahead = [j for j in self._queued if j.job_class == job.job_class
+                     and (j.priority, j.seq) < (job.priority, job.seq)]
+            return len(ahead) + 1
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; False if it isn't known or already finished."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in ("queued", "running"):
+                return False
+            job._cancel.set()
+            if job.status == "queued":
+                self._queued.remove(job)
+                self._finish(job, "cancelled")
+                return True
+        job._kill_processes()
+        return True
+
+    def _finish(self, job: Job, status: str) -> None:
+        # Caller holds self._cond
+        job.status = status
+        self._jobs.pop(job.id, None)
+        job._done.set()
+
+    def _next_job(self) -> Optional[Job]:
+        if sum(self._running.values()) >= self.max_running:
+            return None
+        eligible = [j for j in self._queued if self._running[j.job_class] < self.class_workers[j.job_class]]
+        return min(eligible, key=lambda j: (j.priority, j.seq), default=None)
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+                self._queued.remove(job)
+                self._running[job.job_class] += 1
+                job.status = "running"
+
+            token = _current_job.set(job)
+            try:
+                job.result = job.fn(*job.args)
+                status = "cancelled" if job.cancelled else "done"
+            except JobCancelled:
+                status = "cancelled"
+            except Exception as e:
+                job.error = e
+                status = "cancelled" if job.cancelled else "failed"
+            finally:
+                _current_job.reset(token)
+
+            with self._cond:
+                self._running[job.job_class] -= 1
+                self._finish(job, status)
+                self._cond.notify_all()
+
+
+scheduler = Scheduler()
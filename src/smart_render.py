@@ -0,0 +1,289 @@
+"""
+Smart rendering: stream-copy untouched clip bodies, re-encode only where needed.
+
+When every clip already matches the output (H.264 with one shared profile and
+level, closed GOPs, same resolution, 30 fps, yuv420p, square pixels), most
+frames don't have to be decoded at all. Each clip is split into pieces:
+
+    [lead]   re-encoded: trim-in point up to the first keyframe of the body
+    [body]   stream-copied: keyframe to keyframe (whole GOPs)
+    [tail]   re-encoded: last body keyframe up to the crossfade / trim-out point
+    [xfade]  re-encoded: tail of clip i blended with head of clip i+1
+
+The pieces are written as MPEG-TS (in-band SPS/PPS, so copied and re-encoded
+GOPs can be mixed) and joined with the concat demuxer. Re-encoded pieces use
+the sources' profile and level, so the joined stream keeps a single one of
+each. Audio is rendered once by concat.mux_audio on top of the joined picture.
+"""
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from concat import (
+    VideoClipSpec, CrossfadeSpec, AudioTrackSpec, SpeechClipSpec,
+    run_ffmpeg, mux_audio, join_with_concat_demuxer,
+)
+from ffmpeg_progress import ProgressCallback, ProgressTracker
+from probe import probe_media, keyframe_times, has_open_gop
+
+OUTPUT_FPS = 30.0
+OUTPUT_CODEC = "h264"
+OUTPUT_PIX_FMT = "yuv420p"
+
+# ffprobe H.264 profile name -> libx264 -profile:v. x264's baseline is
+# constrained baseline, which plain Baseline decoders accept too.
+X264_PROFILES = {
+    "Constrained Baseline": "baseline",
+    "Baseline": "baseline",
+    "Main": "main",
+    "High": "high",
+}
+
+# Shorter copy spans aren't worth the extra concat pieces
+MIN_COPY_S = 1.0
+EPSILON = 0.001
+
+
+@dataclass
+class RenderPiece:
+    """One piece of the smart-rendered timeline (times are source seconds)."""
+    kind: str  # "copy", "encode" or "xfade"
+    clip_index: int
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def smart_render_eligibility(
+    video_clips: list[VideoClipSpec],
+    crossfade: Optional[CrossfadeSpec],
+    resolution: tuple[int, int],
+) -> Optional[str]:
+    """Return None if the clips can be smart-rendered, otherwise the reason why not."""
+    width, height = resolution
+    xfade_dur = _xfade_duration(video_clips, crossfade)
+    first_profile = None
+    for i, clip in enumerate(video_clips):
+        try:
+            info = probe_media(clip.path)
+        except (FileNotFoundError, RuntimeError) as e:
+            return f"clip {i}: {e}"
+        if info.video_codec != OUTPUT_CODEC:
+            return f"clip {i}: codec {info.video_codec} != {OUTPUT_CODEC}"
+        if info.video_profile not in X264_PROFILES:
+            return f"clip {i}: unsupported H.264 profile {info.video_profile}"
+        if info.video_level <= 0:
+            return f"clip {i}: unknown H.264 level"
+        profile = (X264_PROFILES[info.video_profile], info.video_level)
+        if first_profile is None:
+            first_profile = profile
+        elif profile != first_profile:
+            return (f"clip {i}: profile/level {info.video_profile} {_level_name(info.video_level)}"
+                    f" differs from clip 0")
+        if (info.width, info.height) != (width, height):
+            return f"clip {i}: {info.width}x{info.height} != {width}x{height}"
+        if abs(info.fps - OUTPUT_FPS) > 0.01:
+            return f"clip {i}: {info.fps:.3f} fps != {OUTPUT_FPS:g}"
+        if info.pix_fmt != OUTPUT_PIX_FMT:
+            return f"clip {i}: pix_fmt {info.pix_fmt} != {OUTPUT_PIX_FMT}"
+        if info.sample_aspect_ratio not in (None, "1:1", "0:1"):
+            return f"clip {i}: non-square pixels ({info.sample_aspect_ratio})"
+        # Each clip must be long enough for its incoming and outgoing crossfade
+        transitions = (1 if i > 0 else 0) + (1 if i < len(video_clips) - 1 else 0)
+        if clip.trimmed_duration <= xfade_dur * transitions:
+            return f"clip {i}: shorter than its crossfades"
+        try:
+            if has_open_gop(clip.path):
+                return f"clip {i}: open GOPs (leading frames reference the previous GOP)"
+        except (FileNotFoundError, RuntimeError) as e:
+            return f"clip {i}: {e}"
+    return None
+
+
+def _level_name(level_idc: int) -> str:
+    # ffprobe reports level_idc (e.g. 31); x264 takes "3.1"
+    if level_idc == 9:
+        return "1b"
+    return f"{level_idc // 10}.{level_idc % 10}"
+
+
+def source_profile(video_clips: list[VideoClipSpec]) -> tuple[str, str]:
+    """Return the (x264 profile, level) shared by eligible clips."""
+    info = probe_media(video_clips[0].path)
+    return X264_PROFILES[info.video_profile], _level_name(info.video_level)
+
+
+def _xfade_duration(video_clips: list[VideoClipSpec], crossfade: Optional[CrossfadeSpec]) -> float:
+    # Same default as concat_videos: 1s fade when clips > 1 and no spec given
+    if len(video_clips) < 2:
+        return 0.0
+    return crossfade.duration_s if crossfade else 1.0
+
+
+def plan_pieces(
+    video_clips: list[VideoClipSpec],
+    crossfade: Optional[CrossfadeSpec],
+    keyframes: list[list[float]],
+) -> list[RenderPiece]:
+    """Split the timeline into copy / encode / xfade pieces.
+
+    keyframes[i] holds the keyframe timestamps of video_clips[i].
+    For xfade pieces, start/end are the outgoing clip's tail window.
+    """
+    xfade_dur = _xfade_duration(video_clips, crossfade)
+    pieces = []
+    last = len(video_clips) - 1
+
+    for i, clip in enumerate(video_clips):
+        clip_start = clip.trim_start
+        clip_end = clip.trim_start + clip.trimmed_duration
+        body_start = clip_start + (xfade_dur if i > 0 else 0.0)
+        body_end = clip_end - (xfade_dur if i < last else 0.0)
+
+        inside = [t for t in keyframes[i] if body_start - EPSILON <= t <= body_end + EPSILON]
+        if len(inside) >= 2 and inside[-1] - inside[0] >= MIN_COPY_S:
+            copy_start, copy_end = inside[0], inside[-1]
+            if copy_start - body_start > EPSILON:
+                pieces.append(RenderPiece("encode", i, body_start, copy_start))
+            pieces.append(RenderPiece("copy", i, copy_start, copy_end))
+            if body_end - copy_end > EPSILON:
+                pieces.append(RenderPiece("encode", i, copy_end, body_end))
+        elif body_end - body_start > EPSILON:
+            pieces.append(RenderPiece("encode", i, body_start, body_end))
+
+        if i < last and xfade_dur > 0:
+            pieces.append(RenderPiece("xfade", i, body_end, clip_end))
+
+    return pieces
+
+
+def _encode_args(out_path: Path, profile: Optional[tuple[str, str]] = None) -> list[str]:
+    profile_args = ["-profile:v", profile[0], "-level", profile[1]] if profile else []
+    return [
+        "-c:v", "libx264", "-preset", "medium", "-crf", "23", *profile_args,
+        "-pix_fmt", OUTPUT_PIX_FMT, "-r", f"{OUTPUT_FPS:g}",
+        "-an", "-f", "mpegts", str(out_path),
+    ]
+
+
+def _normalize_filter(width: int, height: int) -> str:
+    # Same normalization as concat_videos (EXP-015 FIX) so pieces match copied GOPs
+    return (
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,"
+        f"fps={OUTPUT_FPS:g},format={OUTPUT_PIX_FMT},setpts=PTS-STARTPTS"
+    )
+
+
+def piece_command(
+    piece: RenderPiece,
+    video_clips: list[VideoClipSpec],
+    crossfade: Optional[CrossfadeSpec],
+    resolution: tuple[int, int],
+    out_path: Path,
+    profile: Optional[tuple[str, str]] = None,
+) -> list[str]:
+    """Build the ffmpeg command that writes one piece as MPEG-TS.
+
+    profile is the (x264 profile, level) for re-encoded pieces, normally
+    source_profile(); None leaves both to libx264.
+    """
+    width, height = resolution
+    clip = video_clips[piece.clip_index]
+
+    if piece.kind == "copy":
+        # Seek a hair past the keyframe so ffmpeg lands exactly on it, and stop
+        # half a frame before the next copied keyframe
+        duration = piece.duration - 0.5 / OUTPUT_FPS
+        return [
+            "ffmpeg", "-y",
+            "-ss", f"{piece.start + EPSILON:.6f}", "-i", str(clip.path),
+            "-t", f"{duration:.6f}",
+            "-map", "0:v:0", "-c", "copy", "-an",
+            "-avoid_negative_ts", "make_zero",
+            "-f", "mpegts", str(out_path),
+        ]
+
+    if piece.kind == "encode":
+        return [
+            "ffmpeg", "-y",
+            "-ss", f"{piece.start:.6f}", "-i", str(clip.path),
+            "-t", f"{piece.duration:.6f}",
+            "-map", "0:v:0",
+            "-vf", _normalize_filter(width, height),
+        ] + _encode_args(out_path, profile)
+
+    # xfade: tail of this clip into head of the next one
+    next_clip = video_clips[piece.clip_index + 1]
+    xfade_dur = piece.duration
+    xfade_type = crossfade.transition if crossfade else "fade"
+    norm = _normalize_filter(width, height)
+    return [
+        "ffmpeg", "-y",
+        "-ss", f"{piece.start:.6f}", "-t", f"{xfade_dur:.6f}", "-i", str(clip.path),
+        "-ss", f"{next_clip.trim_start:.6f}", "-t", f"{xfade_dur:.6f}", "-i", str(next_clip.path),
+        "-filter_complex",
+        f"[0:v]{norm}[a];[1:v]{norm}[b];"
+        f"[a][b]xfade=transition={xfade_type}:duration={xfade_dur}:offset=0[vout]",
+        "-map", "[vout]",
+    ] + _encode_args(out_path, profile)
+
+
+def smart_render(
+    video_clips: list[VideoClipSpec],
+    output_path: Path,
+    crossfade: Optional[CrossfadeSpec] = None,
+    audio_track: Optional[AudioTrackSpec] = None,
+    speech_clips: Optional[list[SpeechClipSpec]] = None,
+    speech_volume: float = 1.0,
+    resolution: tuple[int, int] = (1920, 1080),
+    audio_source: str = "editor",
+    progress_callback: Optional[ProgressCallback] = None,
+) -> float:
+    """Render the composition with stream copy wherever possible.
+
+    Callers must check smart_render_eligibility() first (concat_videos does).
+    Returns the total duration of the output.
+    """
+    keyframes = [keyframe_times(c.path) for c in video_clips]
+    pieces = plan_pieces(video_clips, crossfade, keyframes)
+    profile = source_profile(video_clips)
+    xfade_dur = _xfade_duration(video_clips, crossfade)
+    total_duration = sum(c.trimmed_duration for c in video_clips) - xfade_dur * (len(video_clips) - 1)
+
+    copied = sum(p.duration for p in pieces if p.kind == "copy")
+    print(f"[INFO] Smart render: {len(pieces)} pieces, {copied:.1f}s of {total_duration:.1f}s stream-copied")
+
+    tracker = ProgressTracker(total_duration, progress_callback)
+    work_dir = Path(tempfile.mkdtemp(prefix="smart_render_"))
+    try:
+        piece_paths = []
+        for n, piece in enumerate(pieces):
+            piece_path = work_dir / f"piece_{n:05d}.ts"
+            run_ffmpeg(piece_command(piece, video_clips, crossfade, resolution, piece_path, profile),
+                       piece.duration, tracker.callback_for(n))
+            tracker.update(n, piece.duration)
+            piece_paths.append(piece_path)
+
+        video_only = work_dir / "video.mp4"
+        join_with_concat_demuxer(piece_paths, video_only, work_dir / "pieces.ffconcat")
+        mux_audio(
+            video_path=video_only,
+            output_path=output_path,
+            video_clips=video_clips,
+            total_duration=total_duration,
+            audio_track=audio_track,
+            speech_clips=speech_clips,
+            speech_volume=speech_volume,
+            audio_source=audio_source,
+        )
+        tracker.finish()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return total_duration
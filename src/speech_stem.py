@@ -0,0 +1,142 @@
+"""
+Speech track assembly as its own stage.
+
+Each speech source is normalized once to 44.1 kHz stereo PCM WAV (cached by
+content hash). The track is then described as an ffconcat list with
+inpoint/outpoint per clip and duration entries over a shared silence file,
+and rendered by one ffmpeg with a single input (the concat demuxer opens one
+file at a time). The resulting stem is cached by the list itself, so the main
+mix reads speech as one input however many snippets the project has.
+"""
+import hashlib
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from concat import SpeechClipSpec, run_ffmpeg, run_graph
+from graph_compiler import FilterGraph
+from media_cache import CacheDir, content_hash
+from scheduler import bind_job
+
+DEFAULT_SPEECH_DIR = Path(__file__).parent.parent / "cache" / "speech"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+SAMPLE_RATE = 44100  # Same as the anullsrc silence the filter graph used
+NORMALIZE_WORKERS = 4
+
+
+def _quote(path: Path) -> str:
+    return "'" + str(Path(path).resolve()).replace("'", "'\\''") + "'"
+
+
+class SpeechStemBuilder:
+    """Builds and caches normalized speech sources and assembled speech stems."""
+
+    def __init__(self, cache_dir: Path = DEFAULT_SPEECH_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache = CacheDir(cache_dir, max_bytes=max_bytes)
+
+    def _build(self, name: str, cmd_for) -> Path:
+        """Create cache entry `name` with cmd_for(tmp_path) unless it exists."""
+        existing = self.cache.lookup(name)
+        if existing:
+            return existing
+        out_path = self.cache.path_for(name)
+        tmp_path = out_path.with_name(f"{name}.{threading.get_ident()}.tmp")
+        try:
+            cmd_for(tmp_path)
+            os.replace(tmp_path, out_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        return out_path
+
+    def normalized(self, source: Path) -> Path:
+        """Source audio as 44.1 kHz stereo 16-bit WAV (every packet is a sync point)."""
+        return self._build(f"norm_{content_hash(source)}.wav", lambda tmp: run_ffmpeg([
+            "ffmpeg", "-y", "-i", str(source),
+            "-vn", "-ac", "2", "-ar", str(SAMPLE_RATE), "-c:a", "pcm_s16le",
+            "-f", "wav", str(tmp),
+        ]))
+
+    def silence(self, duration_s: float) -> Path:
+        """A silent WAV at least duration_s long (whole seconds, shared by all gaps)."""
+        seconds = max(1, math.ceil(duration_s))
+        return self._build(f"silence_{seconds}s.wav", lambda tmp: run_ffmpeg([
+            "ffmpeg", "-y", "-f", "lavfi", "-i", f"anullsrc=r={SAMPLE_RATE}:cl=stereo",
+            "-t", str(seconds), "-c:a", "pcm_s16le", "-f", "wav", str(tmp),
+        ]))
+
+    def concat_list(self, speech_clips: list[SpeechClipSpec]) -> tuple[str, float]:
+        """ffconcat text for the speech track and its total duration."""
+        sources = sorted({c.path for c in speech_clips if not c.is_silence and c.path})
+        with ThreadPoolExecutor(max_workers=max(1, min(NORMALIZE_WORKERS, len(sources)))) as pool:
+            normalized = dict(zip(sources, pool.map(bind_job(self.normalized), sources)))
+        gaps = [c.duration_s for c in speech_clips if c.is_silence and c.duration_s > 0]
+        silence = self.silence(max(gaps)) if gaps else None
+
+        lines = ["ffconcat version 1.0"]
+        total = 0.0
+        for clip in speech_clips:
+            if clip.is_silence:
+                if clip.duration_s <= 0:
+                    continue
+                dur = round(clip.duration_s, 3)
+                lines += [f"file {_quote(silence)}", "inpoint 0", f"outpoint {dur}", f"duration {dur}"]
+            elif clip.path:
+                dur = clip.trimmed_duration
+                if dur <= 0:
+                    continue
+                lines += [
+                    f"file {_quote(normalized[clip.path])}",
+                    f"inpoint {clip.trim_start}",
+                    f"outpoint {clip.trim_start + dur}",
+                    f"duration {dur}",
+                ]
+            else:
+                continue
+            total += dur
+        return "\n".join(lines) + "\n", total
+
+    def stem(self, speech_clips: list[SpeechClipSpec]) -> Optional[Path]:
+        """The assembled speech track as one WAV, or None if there's nothing to play."""
+        for clip in speech_clips:
+            if not clip.is_silence and clip.path and not clip.path.exists():
+                raise FileNotFoundError(clip.path)
+        text, total = self.concat_list(speech_clips)
+        if total <= 0:
+            return None
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+        def render(tmp: Path) -> None:
+            list_path = tmp.with_name(f"{tmp.stem}.ffconcat.tmp")
+            list_path.write_text(text, encoding="utf-8")
+            try:
+                graph = FilterGraph()
+                speech = graph.add_input(list_path, options=[
+                    "-f", "concat", "-safe", "0", "-segment_time_metadata", "1",
+                ]).stream("a")
+                # Drop samples outside each inpoint/outpoint, then pad/trim to the
+                # list's timestamps so packet-granular cuts never drift
+                speech = graph.chain(
+                    speech,
+                    ("aselect", [(None, "concatdec_select")]),
+                    ("aresample", [("async", 1), ("min_hard_comp", 0.001), ("first_pts", 0)]),
+                )
+                graph.map(speech)
+                run_graph(graph, tmp, ["-t", f"{total:.3f}", "-c:a", "pcm_s16le", "-f", "wav"])
+            finally:
+                if list_path.exists():
+                    list_path.unlink()
+
+        path = self._build(f"stem_{key}.wav", render)
+        self.cache.evict(keep={path} | {self.cache.path_for(n) for n in (
+            f"norm_{content_hash(c.path)}.wav" for c in speech_clips if not c.is_silence and c.path
+        )})
+        return path
+
+
+speech_stems = SpeechStemBuilder(
+    max_bytes=int(os.environ.get("SPEECH_CACHE_BYTES", DEFAULT_MAX_BYTES)),
+)
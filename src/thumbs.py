@@ -0,0 +1,192 @@
+"""
+Filmstrip thumbnails as sprite sheets, in one decode pass per video.
+
+One ffmpeg run splits the video into a branch per density
+(fps=1/N,scale,pad,tile), each writing JPEG sheets of COLUMNS x ROWS fixed-size
+(letterboxed) tiles. Tile k of a density shows time k * N, so the frame for
+time t is tile floor(t / N) -- see tile_at(). A JSON index next to the sheets
+records the grid and sheet names. Everything is named by content hash and
+evicted least-recently-used under a disk quota.
+
+Uploads get DEFAULT_INTERVALS for the timeline; rendered previews get a single
+density from scrub_intervals() for hover-scrubbing.
+"""
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+from concat import run_ffmpeg
+from media_cache import CacheDir, content_hash
+from probe import probe_media
+from scheduler import PRIORITY_BATCH, scheduler
+
+DEFAULT_THUMBS_DIR = Path(__file__).parent.parent / "cache" / "thumbs"
+DEFAULT_MAX_BYTES = 1024 ** 3
+DEFAULT_INTERVALS = (2, 8, 32)  # Seconds per tile
+TILE_WIDTH = 160
+TILE_HEIGHT = 90
+COLUMNS = 10
+ROWS = 10
+JPEG_QUALITY = 5  # mjpeg -q:v, 2 (best) - 31
+SCRUB_TILES = 200  # Target tile count for a preview's hover-scrub sprite
+
+
+def scrub_intervals(duration_s: float) -> tuple:
+    """The single density for a preview's scrub sprite: ~SCRUB_TILES tiles, at most one per second."""
+    return (max(1.0, math.ceil(duration_s / SCRUB_TILES * 2) / 2),)
+
+
+def _tag(interval: float) -> str:
+    return f"{interval:g}s"
+
+
+def tile_at(index: dict, interval: float, t: float) -> tuple[str, int, int]:
+    """(sheet name, column, row) of the tile showing time t at one density."""
+    density = next(d for d in index["densities"] if d["interval_s"] == interval)
+    k = min(max(0, int(t // interval)), density["count"] - 1)
+    per_sheet = index["columns"] * index["rows"]
+    sheet, cell = divmod(k, per_sheet)
+    return density["sheets"][sheet], cell % index["columns"], cell // index["columns"]
+
+
+class ThumbStore:
+    """Creates, finds and evicts sprite sheets and their indexes."""
+
+    def __init__(self, cache_dir: Path = DEFAULT_THUMBS_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache = CacheDir(cache_dir, max_bytes=max_bytes)
+        self._building: dict[str, threading.Lock] = {}
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _index_name(self, source: Path, intervals: tuple) -> str:
+        return f"{content_hash(source)}_{'_'.join(_tag(i) for i in intervals)}.json"
+
+    def _lookup(self, index_name: str) -> Optional[dict]:
+        """The index if it and all its sheets are cached (marking them used)."""
+        path = self.cache.lookup(index_name)
+        if not path:
+            return None
+        try:
+            index = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        sheets = [s for d in index["densities"] for s in d["sheets"]]
+        if not all(self.cache.lookup(s) for s in sheets):
+            return None
+        return index
+
+    def get_index(self, source: Path, intervals: tuple = DEFAULT_INTERVALS) -> Optional[dict]:
+        """Return the index for source if its sprites are ready, else None."""
+        try:
+            return self._lookup(self._index_name(Path(source), intervals))
+        except OSError:
+            return None
+
+    def sheet_path(self, name: str) -> Optional[Path]:
+        """A cached sheet by name (as listed in an index)."""
+        if not name.endswith(".jpg") or Path(name).name != name:
+            return None
+        return self.cache.lookup(name)
+
+    def sprite_command(self, source: Path, intervals: tuple, out_dir: Path, prefix: str) -> list[str]:
+        branches = [f"s{i}" for i in range(len(intervals))]
+        graph = [f"[0:v:0]split={len(intervals)}" + "".join(f"[{b}]" for b in branches)]
+        cmd_outputs = []
+        for b, interval in zip(branches, intervals):
+            graph.append(
+                f"[{b}]fps=1/{interval:g},"
+                f"scale={TILE_WIDTH}:{TILE_HEIGHT}:force_original_aspect_ratio=decrease,"
+                f"pad={TILE_WIDTH}:{TILE_HEIGHT}:(ow-iw)/2:(oh-ih)/2,setsar=1,"
+                f"tile={COLUMNS}x{ROWS}[o{b}]"
+            )
+            cmd_outputs += [
+                "-map", f"[o{b}]", "-c:v", "mjpeg", "-q:v", str(JPEG_QUALITY), "-f", "image2",
+                str(out_dir / f"{prefix}_{_tag(interval)}_%03d.jpg"),
+            ]
+        return ["ffmpeg", "-y", "-i", str(source),
+                "-filter_complex", ";".join(graph), *cmd_outputs]
+
+    def ensure(self, source: Path, intervals: tuple = DEFAULT_INTERVALS) -> dict:
+        """Render source's sprites if needed (blocking) and return the index."""
+        source = Path(source)
+        index_name = self._index_name(source, intervals)
+        existing = self._lookup(index_name)
+        if existing:
+            return existing
+
+        with self._lock:
+            build_lock = self._building.setdefault(index_name, threading.Lock())
+        with build_lock:
+            existing = self._lookup(index_name)
+            if existing:
+                return existing
+            prefix = index_name[:-len(".json")]
+            duration = probe_media(source).duration_s
+            self.cache.path_for(index_name)  # Creates the cache dir
+            # Sheets are written to a scratch dir (ignored by eviction) and moved in
+            # only once ffmpeg succeeded, index last
+            work_dir = Path(tempfile.mkdtemp(dir=self.cache.root, prefix=".build_"))
+            try:
+                run_ffmpeg(self.sprite_command(source, intervals, work_dir, prefix))
+                densities = []
+                for interval in intervals:
+                    sheets = sorted(p.name for p in work_dir.glob(f"{prefix}_{_tag(interval)}_*.jpg"))
+                    if not sheets:
+                        raise RuntimeError(f"No thumbnails produced for {source}")
+                    per_sheet = COLUMNS * ROWS
+                    count = min(len(sheets) * per_sheet,
+                                max((len(sheets) - 1) * per_sheet + 1, int(duration // interval) + 1))
+                    densities.append({"interval_s": interval, "count": count, "sheets": sheets})
+                for p in work_dir.iterdir():
+                    os.replace(p, self.cache.path_for(p.name))
+                index = {
+                    "duration_s": duration,
+                    "tile_width": TILE_WIDTH,
+                    "tile_height": TILE_HEIGHT,
+                    "columns": COLUMNS,
+                    "rows": ROWS,
+                    "densities": densities,
+                }
+                index_path = self.cache.path_for(index_name)
+                tmp_path = index_path.with_name(f"{index_name}.{threading.get_ident()}.tmp")
+                tmp_path.write_text(json.dumps(index), encoding="utf-8")
+                os.replace(tmp_path, index_path)
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+                with self._lock:
+                    self._building.pop(index_name, None)
+        keep = {index_path} | {self.cache.path_for(s) for d in densities for s in d["sheets"]}
+        self.cache.evict(keep=keep)
+        return index
+
+    def submit(self, source: Path, intervals: tuple = DEFAULT_INTERVALS) -> None:
+        """Queue rendering source's sprites on the scheduler's media pool."""
+        source = Path(source)
+        try:
+            index_name = self._index_name(source, intervals)
+        except OSError:
+            return
+        with self._lock:
+            if index_name in self._pending:
+                return
+            self._pending.add(index_name)
+
+        def run():
+            try:
+                self.ensure(source, intervals)
+            except Exception as e:
+                print(f"[WARN] Thumbnail generation failed for {source}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(index_name)
+
+        job_id = f"thumbs-{index_name[:-len('.json')]}"
+        scheduler.submit('media', run, job_id=job_id, priority=PRIORITY_BATCH)
+
+
+thumb_store = ThumbStore(max_bytes=int(os.environ.get("THUMBS_CACHE_BYTES", DEFAULT_MAX_BYTES)))
@@ -0,0 +1,136 @@
+"""Optimization passes of the filter-graph compiler."""
+from pathlib import Path
+
+import graph_compiler
+from graph_compiler import (
+    FilterGraph, compile_graph, drop_noop_filters, keyframe_at_or_before,
+    place_fps_conversion, seek_inputs,
+)
+from probe import MediaInfo
+
+
+def video_input(graph, path="/media/clip.mp4"):
+    return graph.add_input(path, info=MediaInfo(path=Path(path), has_video=True))
+
+
+def test_drop_noop_filters_rewires_readers_and_outputs():
+    graph = FilterGraph()
+    inp = graph.add_input("/media/a.mp4")
+    v = graph.chain(inp.stream("v"), ("null", []), ("scale", [(None, 1280), (None, 720)]), ("copy", []))
+    a = graph.chain(inp.stream("a"), ("anull", []))
+    graph.map(v)
+    graph.map(a)
+
+    drop_noop_filters(graph)
+
+    assert [n.name for n in graph.filters] == ["scale"]
+    scale = graph.filters[0]
+    assert scale.inputs == [inp.stream("v")]
+    assert graph.outputs == [scale.out, inp.stream("a")]
+
+
+def test_seek_inputs_moves_audio_trim_to_the_input():
+    graph = FilterGraph()
+    inp = graph.add_input("/media/music.mp3")
+    graph.map(graph.chain(inp.stream("a"), ("atrim", [("start", 5.0), ("duration", 3.0)])))
+
+    seek_inputs(graph)
+
+    assert (inp.seek_s, inp.duration_s) == (5.0, 3.0)
+    assert graph.filters == []
+    assert graph.outputs == [inp.stream("a")]
+
+
+def test_seek_inputs_lands_video_on_keyframe_and_keeps_residual(monkeypatch):
+    monkeypatch.setattr(graph_compiler, "_keyframe_index", lambda path: [0.0, 4.0, 8.0])
+    graph = FilterGraph()
+    inp = video_input(graph)
+    graph.map(graph.chain(inp.stream("v"), ("trim", [("start", 5.25), ("duration", 2.0)])))
+
+    seek_inputs(graph)
+
+    assert inp.seek_s == 4.0
+    assert inp.duration_s == 3.25
+    assert graph.filters[0].args == [("start", 1.25), ("duration", 2.0)]
+
+
+def test_seek_inputs_drops_trim_that_starts_on_a_keyframe(monkeypatch):
+    monkeypatch.setattr(graph_compiler, "_keyframe_index", lambda path: [0.0, 4.0, 8.0])
+    graph = FilterGraph()
+    inp = video_input(graph)
+    graph.map(graph.chain(inp.stream("v"), ("trim", [("start", 8.0)])))
+
+    seek_inputs(graph)
+
+    assert (inp.seek_s, inp.duration_s) == (8.0, None)
+    assert graph.filters == []
+
+
+def test_seek_inputs_leaves_shared_inputs_alone():
+    graph = FilterGraph()
+    inp = graph.add_input("/media/a.mp4")
+    graph.map(graph.chain(inp.stream("v"), ("trim", [("start", 2.0)])))
+    graph.map(inp.stream("a"))  # Seeking would cut the audio too
+
+    seek_inputs(graph)
+
+    assert inp.seek_s == 0.0
+    assert [n.name for n in graph.filters] == ["trim"]
+
+
+def test_keyframe_at_or_before():
+    times = [0.0, 2.0, 4.0]
+    assert keyframe_at_or_before(times, 3.9) == 2.0
+    assert keyframe_at_or_before(times, 3.9995) == 4.0  # Within SEEK_EPSILON_S
+    assert keyframe_at_or_before([1.0], 0.5) is None
+
+
+def upscaled_chain(graph, source_fps):
+    inp = graph.add_input("/media/small.mp4")
+    scale = graph.add_filter("scale", [inp.stream("v")], "v", [(None, 1920), (None, 1080)],
+                             upscale=True, source_fps=source_fps)
+    out = graph.chain(scale, ("fps", [(None, 30)]), ("format", [(None, "yuv420p")]))
+    graph.map(out)
+    return inp
+
+
+def test_place_fps_conversion_drops_frames_before_an_upscale():
+    graph = FilterGraph()
+    inp = upscaled_chain(graph, source_fps=60)
+
+    place_fps_conversion(graph)
+
+    fps, scale, fmt = graph.filters
+    assert [n.name for n in graph.filters] == ["fps", "scale", "format"]
+    assert fps.inputs == [inp.stream("v")]
+    assert scale.inputs == [fps.out]
+    assert fmt.inputs == [scale.out]
+    assert graph.outputs == [fmt.out]
+
+
+def test_place_fps_conversion_keeps_order_when_no_frames_are_dropped():
+    graph = FilterGraph()
+    upscaled_chain(graph, source_fps=30)
+
+    place_fps_conversion(graph)
+
+    assert [n.name for n in graph.filters] == ["scale", "fps", "format"]
+
+
+def test_compile_graph_fuses_chains_and_seeks_inputs():
+    graph = FilterGraph()
+    unused = graph.add_input("/media/unused.mp4")
+    inp = graph.add_input("/media/music.mp3")
+    a = graph.chain(inp.stream("a"), ("anull", []), ("atrim", [("start", 1.5)]),
+                    ("volume", [(None, 0.5)]), ("afade", [("t", "in"), ("d", 2.0)]))
+    graph.map(a)
+
+    cmd = compile_graph(graph, Path("out.m4a"), ["-c:a", "aac"])
+
+    assert unused not in graph.inputs
+    assert cmd.args == [
+        "ffmpeg", "-y", "-ss", "1.5", "-i", "/media/music.mp3",
+        "-filter_complex", "[0:a]volume=0.5,afade=t=in:d=2[a0]",
+        "-map", "[a0]", "-c:a", "aac", "out.m4a",
+    ]
+    assert cmd.script_path is None
@@ -0,0 +1,82 @@
+"""slide_video_filter against the image-sequence encode it replaced."""
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from html_converter import slide_video_filter
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+
+# Odd size, so the even-dimension scale both paths end with does some work
+SLIDE_SIZE = "161x91"
+
+
+def make_slides(tmp_path: Path, count: int) -> list[bytes]:
+    """count distinct PNGs (successive testsrc frames)."""
+    subprocess.run([
+        "ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", f"testsrc=size={SLIDE_SIZE}:rate=1",
+        "-frames:v", str(count), str(tmp_path / "slide_%02d.png"),
+    ], check=True)
+    return [(tmp_path / f"slide_{i:02d}.png").read_bytes() for i in range(1, count + 1)]
+
+
+def frame_hashes(stdout: bytes) -> list[tuple[int, str]]:
+    """(pts, md5) per decoded frame from -f framemd5 output."""
+    frames = []
+    for line in stdout.decode().splitlines():
+        if line.startswith("#"):
+            continue
+        fields = [f.strip() for f in line.split(",")]
+        frames.append((int(fields[2]), fields[5]))
+    return frames
+
+
+def old_image_sequence(tmp_path: Path, slides: list[bytes], frame_counts: list[int], fps: int):
+    """Every slide's PNG copied once per frame, read as an image2 sequence."""
+    seq_dir = tmp_path / "sequence"
+    seq_dir.mkdir()
+    index = 0
+    for png, count in zip(slides, frame_counts):
+        for _ in range(count):
+            (seq_dir / f"frame_{index:05d}.png").write_bytes(png)
+            index += 1
+    p = subprocess.run([
+        "ffmpeg", "-v", "error", "-framerate", str(fps), "-i", str(seq_dir / "frame_%05d.png"),
+        "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2", "-f", "framemd5", "-",
+    ], capture_output=True, check=True)
+    return frame_hashes(p.stdout)
+
+
+def piped_slides(slides: list[bytes], frame_counts: list[int], fps: int):
+    """One PNG per slide on stdin (the last sent twice), as convert_html_to_mp4 does."""
+    p = subprocess.run([
+        "ffmpeg", "-v", "error", "-f", "image2pipe", "-c:v", "png", "-framerate", str(fps), "-i", "pipe:0",
+        "-vf", slide_video_filter(frame_counts, fps), "-f", "framemd5", "-",
+    ], input=b"".join(slides) + slides[-1], capture_output=True, check=True)
+    return frame_hashes(p.stdout)
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("frame_counts, fps", [
+    ([3, 1, 5], 10),
+    ([1], 30),
+    ([1, 1, 1, 1], 30),
+    ([45, 2, 30], 30),
+])
+def test_piped_slides_match_image_sequence(tmp_path, frame_counts, fps):
+    slides = make_slides(tmp_path, len(frame_counts))
+
+    expected = old_image_sequence(tmp_path, slides, frame_counts, fps)
+    actual = piped_slides(slides, frame_counts, fps)
+
+    assert len(expected) == sum(frame_counts)
+    assert actual == expected
+
+
+def test_filter_holds_each_slide_for_its_frame_count():
+    assert slide_video_filter([3, 1, 5], 10) == (
+        "setpts='(gte(N,1)*3+gte(N,2)*1+gte(N,3)*5)/(10*TB)',fps=10,trim=end_frame=9,"
+        "scale=trunc(iw/2)*2:trunc(ih/2)*2"
+    )
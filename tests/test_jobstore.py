@@ -0,0 +1,76 @@
+"""SqliteJobStore.recover: taking over jobs of a process that stopped heartbeating."""
+import sqlite3
+import time
+
+import jobstore
+from jobstore import INTERRUPTED_ERROR, SqliteJobStore
+
+
+def make_stale(db_path, owner):
+    """Pretend owner's process died: its last heartbeat is long past."""
+    db = sqlite3.connect(db_path)
+    db.execute("UPDATE owners SET heartbeat_ts = ? WHERE owner = ?",
+               (time.time() - 2 * jobstore.STALE_AFTER_S, owner))
+    db.commit()
+    db.close()
+
+
+def test_recover_requeues_queued_jobs_and_fails_running_ones(tmp_path):
+    db_path = tmp_path / "jobs.sqlite3"
+    dead = SqliteJobStore(db_path)
+    dead.create("queued-export", "export", {"status": "queued"}, payload={"clips": []})
+    dead.create("running-export", "export", {"status": "processing"}, payload={"clips": []})
+    dead.create("queued-other", "other", {"status": "queued"}, payload={})
+    dead.create("queued-no-payload", "export", {"status": "queued"})
+    dead.create("done", "export", {"status": "completed"}, payload={})
+    make_stale(db_path, dead.owner)
+
+    requeued = []
+    store = SqliteJobStore(db_path)
+    assert store.recover({"export": lambda job: requeued.append(job["id"])}) == 4
+
+    assert requeued == ["queued-export"]
+    assert store.get("queued-export")["status"] == "queued"
+    for job_id in ("running-export", "queued-other", "queued-no-payload"):
+        job = store.get(job_id)
+        assert job["status"] == "failed"
+        assert job["error"] == INTERRUPTED_ERROR
+    assert store.get("done")["status"] == "completed"
+
+
+def test_recovered_jobs_are_claimed_once(tmp_path):
+    db_path = tmp_path / "jobs.sqlite3"
+    dead = SqliteJobStore(db_path)
+    dead.create("job", "export", {"status": "queued"}, payload={})
+    make_stale(db_path, dead.owner)
+
+    first, second = SqliteJobStore(db_path), SqliteJobStore(db_path)
+    requeued = []
+    handlers = {"export": lambda job: requeued.append(job["id"])}
+    assert first.recover(handlers) == 1
+    assert second.recover(handlers) == 0  # first owns it now and is alive
+    assert requeued == ["job"]
+
+
+def test_jobs_of_live_owners_are_left_alone(tmp_path):
+    db_path = tmp_path / "jobs.sqlite3"
+    alive = SqliteJobStore(db_path)
+    alive.create("job", "export", {"status": "processing"}, payload={})
+
+    store = SqliteJobStore(db_path)
+    assert store.recover({"export": lambda job: None}) == 0
+    assert store.get("job")["status"] == "processing"
+
+
+def test_failing_requeue_marks_the_job_failed(tmp_path):
+    db_path = tmp_path / "jobs.sqlite3"
+    dead = SqliteJobStore(db_path)
+    dead.create("job", "export", {"status": "queued"}, payload={})
+    make_stale(db_path, dead.owner)
+
+    def broken(job):
+        raise ValueError("bad payload")
+
+    store = SqliteJobStore(db_path)
+    assert store.recover({"export": broken}) == 1
+    assert store.get("job")["status"] == "failed"
@@ -0,0 +1,67 @@
+"""plan_pieces: how a timeline splits into copy / encode / xfade pieces."""
+from pathlib import Path
+
+import pytest
+
+from concat import CrossfadeSpec, VideoClipSpec
+from smart_render import RenderPiece, plan_pieces
+
+
+def clip(duration_s, trim_start=0.0, trim_end=0.0):
+    return VideoClipSpec(path=Path("/nonexistent.mp4"), duration_s=duration_s,
+                         trim_start=trim_start, trim_end=trim_end)
+
+
+def test_single_clip_copies_whole_gops_and_encodes_the_rest():
+    pieces = plan_pieces([clip(10.0)], None, [[0.0, 2.0, 4.0, 6.0, 8.0]])
+    assert pieces == [
+        RenderPiece("copy", 0, 0.0, 8.0),
+        RenderPiece("encode", 0, 8.0, 10.0),
+    ]
+
+
+def test_trim_in_point_between_keyframes_gets_a_lead_piece():
+    pieces = plan_pieces([clip(10.0, trim_start=1.5, trim_end=1.0)], None, [[0.0, 2.0, 4.0, 6.0, 8.0]])
+    assert pieces == [
+        RenderPiece("encode", 0, 1.5, 2.0),
+        RenderPiece("copy", 0, 2.0, 8.0),
+        RenderPiece("encode", 0, 8.0, 9.0),
+    ]
+
+
+def test_crossfades_are_cut_out_of_the_clip_bodies():
+    clips = [clip(10.0), clip(10.0, trim_start=0.5)]
+    keyframes = [[0.0, 3.0, 6.0, 9.0], [0.0, 2.0, 4.0, 6.0, 8.0]]
+    pieces = plan_pieces(clips, CrossfadeSpec(duration_s=1.0), keyframes)
+    assert pieces == [
+        RenderPiece("copy", 0, 0.0, 9.0),
+        RenderPiece("xfade", 0, 9.0, 10.0),
+        # Clip 1's body starts after the incoming crossfade (0.5 + 1.0)
+        RenderPiece("encode", 1, 1.5, 2.0),
+        RenderPiece("copy", 1, 2.0, 8.0),
+        RenderPiece("encode", 1, 8.0, 10.0),
+    ]
+
+
+def test_missing_crossfade_spec_defaults_to_one_second():
+    pieces = plan_pieces([clip(5.0), clip(5.0)], None, [[], []])
+    assert [p for p in pieces if p.kind == "xfade"] == [RenderPiece("xfade", 0, 4.0, 5.0)]
+
+
+def test_short_copy_spans_are_encoded_instead():
+    # Keyframes 0.5 s apart are below MIN_COPY_S, so the body is one encode
+    pieces = plan_pieces([clip(5.0)], None, [[0.0, 0.5]])
+    assert pieces == [RenderPiece("encode", 0, 0.0, 5.0)]
+
+
+def test_pieces_cover_the_timeline_without_gaps():
+    clips = [clip(12.0, trim_start=0.7), clip(9.0, trim_end=0.3), clip(15.0, trim_start=2.2)]
+    keyframes = [[float(t) for t in range(0, 16, 2)]] * 3
+    pieces = plan_pieces(clips, CrossfadeSpec(duration_s=0.5), keyframes)
+    for i, c in enumerate(clips):
+        own = [p for p in pieces if p.clip_index == i]
+        start = c.trim_start + (0.5 if i > 0 else 0.0)
+        assert own[0].start == pytest.approx(start)
+        for a, b in zip(own, own[1:]):
+            assert a.end == pytest.approx(b.start)
+        assert own[-1].end == pytest.approx(c.trim_start + c.trimmed_duration)